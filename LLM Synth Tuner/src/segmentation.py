@@ -4,52 +4,59 @@ import fitz
 import logging
 import json
 import os
-from typing import Dict, List, Tuple
+from typing import Dict, List
 from tqdm import tqdm
+from src.utils import TocMatcher
 
 logging.basicConfig(filename='segmentation.log', level=logging.DEBUG,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
 MAX_SEGMENT_TOKENS = 512  # Adjust based on your RAG system's requirements
 
+# Extension of images stored with each PDF filter; the rest are extracted as PNG
+IMAGE_FILTER_EXTENSIONS = {"DCTDecode": "jpeg", "JPXDecode": "jpx", "JBIG2Decode": "jb2"}
+
 def load_structure(structure_json_path: str) -> Dict:
     with open(structure_json_path, 'r') as f:
         return json.load(f)
 
-def create_patterns(structure: Dict) -> List[Tuple[str, re.Pattern]]:
-    patterns = []
-    for section in structure.get('structure', []):
-        patterns.append((section, re.compile(rf"^\s*{re.escape(section)}[\s:]*$", re.IGNORECASE | re.MULTILINE)))
-    
+def create_patterns(structure: Dict) -> TocMatcher:
+    titles = list(structure.get('structure', []))
+
     toc = structure.get('toc', {})
     for section, subsections in toc.items():
-        patterns.append((section, re.compile(rf"^\s*{re.escape(section)}[\s:]*$", re.IGNORECASE | re.MULTILINE)))
+        titles.append(section)
         if isinstance(subsections, dict):
-            for subsection in subsections:
-                patterns.append((subsection, re.compile(rf"^\s*{re.escape(subsection)}[\s:]*$", re.IGNORECASE | re.MULTILINE)))
-    
-    return patterns
+            titles.extend(subsections)
+
+    return TocMatcher(titles)
 
 def extract_images(pdf_path: str) -> List[Dict]:
+    """Collect image metadata per page without decoding any image; repeated xrefs are read once."""
     images = []
+    sizes = {}
     try:
         with fitz.open(pdf_path) as pdf_document:
             for page_num in range(pdf_document.page_count):
                 page = pdf_document[page_num]
                 for img in page.get_images(full=True):
-                    xref = img[0]
-                    base_image = pdf_document.extract_image(xref)
+                    xref, width, height, image_filter = img[0], img[2], img[3], img[8]
+                    if xref not in sizes:
+                        kind, length = pdf_document.xref_get_key(xref, "Length")
+                        sizes[xref] = int(length) if kind == "int" else 0
                     images.append({
                         "page": page_num,
-                        "type": base_image["ext"],
-                        "size": len(base_image["image"]),
-                        "content": base_image["image"]
+                        "xref": xref,
+                        "type": IMAGE_FILTER_EXTENSIONS.get(image_filter, "png"),
+                        "size": sizes[xref],
+                        "width": width,
+                        "height": height
                     })
     except Exception as e:
         logging.error(f"Error extracting images from PDF: {e}")
     return images
 
-def segment_pdf(pdf_path: str, patterns: List[Tuple[str, re.Pattern]], structure: Dict) -> List[Dict]:
+def segment_pdf(pdf_path: str, patterns: TocMatcher, structure: Dict) -> List[Dict]:
     segments = []
     current_title = "Introduction"
     current_segment = []
@@ -66,22 +73,18 @@ def segment_pdf(pdf_path: str, patterns: List[Tuple[str, re.Pattern]], structure
 
                 lines = text.split('\n')
                 for line in lines:
-                    matched = False
-                    for title, pattern in patterns:
-                        if pattern.match(line):
-                            if current_segment:
-                                segments.append({
-                                    "title": current_title,
-                                    "content": " ".join(current_segment),
-                                    "tokens": current_tokens
-                                })
-                            current_title = title
-                            current_segment = []
-                            current_tokens = 0
-                            matched = True
-                            break
-
-                    if not matched:
+                    title = patterns.match(line)
+                    if title:
+                        if current_segment:
+                            segments.append({
+                                "title": current_title,
+                                "content": " ".join(current_segment),
+                                "tokens": current_tokens
+                            })
+                        current_title = title
+                        current_segment = []
+                        current_tokens = 0
+                    else:
                         current_segment.append(line)
                         current_tokens += len(line.split())
 
@@ -101,7 +104,8 @@ def segment_pdf(pdf_path: str, patterns: List[Tuple[str, re.Pattern]], structure
                         "title": f"Image in {current_title}",
                         "content": f"[Image: {img['type']} format, size: {img['size']} bytes]",
                         "tokens": 20,  # Arbitrary token count for images
-                        "image": img["content"]
+                        "image": {"page": img["page"], "xref": img["xref"],
+                                  "width": img["width"], "height": img["height"]}
                     })
                     image_index += 1
 
@@ -1,9 +1,11 @@
 import re
 import fitz
+import asyncio
 import logging
 import json
 import os
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 from tqdm import tqdm
 
@@ -16,12 +18,13 @@ def load_openai_client():
     if not api_key:
         logging.error("OpenAI API key not found.")
         return None
-    return OpenAI(api_key=api_key)
+    return AsyncOpenAI(api_key=api_key)
 
 def extract_text_and_images(pdf_path, start_page=0, num_pages=10):
-    content = {"text": "", "images": []}
+    content = {"text": "", "images": [], "outline": []}
     try:
         with fitz.open(pdf_path) as pdf_document:
+            content["outline"] = pdf_document.get_toc()
             for page_num in range(start_page, min(start_page + num_pages, pdf_document.page_count)):
                 page = pdf_document[page_num]
                 content["text"] += page.get_text("text") + "\n"
@@ -88,16 +91,40 @@ async def extract_structure_llm(client, content):
         logging.error(f"Error during LLM structure extraction: {e}")
         return None
 
-async def main_async(pdf_path, output_file):
-    client = load_openai_client()
-    if not client:
-        return
+def outline_to_toc(outline):
+    """Nest get_toc() entries into a title dictionary, like the LLM's 'toc' field."""
+    toc = {}
+    parents = [toc]
+    for level, title, _page in (entry[:3] for entry in outline):
+        title = title.strip()
+        if not title:
+            continue
+        del parents[level:]
+        node = parents[-1].setdefault(title, {})
+        parents.append(node)
+    return toc
 
-    content = extract_text_and_images(pdf_path)
-    document_structure = detect_document_structure(content)
-    
-    structure_data = await extract_structure_llm(client, content)
+async def resolve_structure(client, content, semaphore=None, min_outline_entries=2):
+    """Use the embedded outline when the PDF has one, otherwise ask the LLM.
+
+    The result's 'toc_source' records which one answered.
+    """
+    if len(content.get("outline", [])) >= min_outline_entries:
+        toc = outline_to_toc(content["outline"])
+        logging.info("Structure taken from the embedded outline, no LLM call needed.")
+        return {"document_type": "unknown", "structure": list(toc), "toc": toc,
+                "notable_features": [], "toc_source": "outline"}
 
+    if semaphore is None:
+        structure_data = await extract_structure_llm(client, content)
+    else:
+        async with semaphore:
+            structure_data = await extract_structure_llm(client, content)
+    if structure_data:
+        structure_data["toc_source"] = "llm"
+    return structure_data
+
+def save_structure(structure_data, document_structure, output_file):
     if structure_data:
         structure_data["detected_structure"] = document_structure
         with open(output_file, 'w') as f:
@@ -106,8 +133,49 @@ async def main_async(pdf_path, output_file):
     else:
         logging.error("Structure extraction failed or incomplete.")
 
+async def main_async(pdf_path, output_file):
+    client = load_openai_client()
+    if not client:
+        return
+
+    async with client:
+        content = extract_text_and_images(pdf_path)
+        document_structure = detect_document_structure(content)
+        structure_data = await resolve_structure(client, content)
+    save_structure(structure_data, document_structure, output_file)
+
+async def main_batch_async(pdf_paths, output_dir, max_concurrency=8):
+    """Extract the structure of several PDFs, overlapping up to max_concurrency LLM requests.
+
+    Page samples are read in a thread pool; PDFs with an embedded outline need no
+    LLM request. Each result is saved as
+    <output_dir>/<name>_structure.json. Returns the structures keyed by PDF path.
+    """
+    client = load_openai_client()
+    if not client:
+        return {}
+
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor() as executor:
+        contents = await asyncio.gather(*(
+            loop.run_in_executor(executor, extract_text_and_images, pdf_path) for pdf_path in pdf_paths
+        ))
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async with client:
+        structures = await asyncio.gather(*(resolve_structure(client, content, semaphore) for content in contents))
+
+    os.makedirs(output_dir, exist_ok=True)
+    results = {}
+    for pdf_path, content, structure_data in tqdm(zip(pdf_paths, contents, structures), total=len(pdf_paths),
+                                                  desc="Saving structures"):
+        name = os.path.splitext(os.path.basename(pdf_path))[0]
+        save_structure(structure_data, detect_document_structure(content),
+                       os.path.join(output_dir, f"{name}_structure.json"))
+        results[pdf_path] = structure_data
+    return results
+
 if __name__ == "__main__":
-    import asyncio
     pdf_path = "path/to/your/document.pdf"
     output_file = "path/to/document_structure.json"
     asyncio.run(main_async(pdf_path, output_file))
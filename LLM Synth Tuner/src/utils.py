@@ -0,0 +1,34 @@
+import string
+from typing import Dict, Iterable, Optional
+
+# Characters the heading patterns tolerate after a title: whitespace and colons
+_TRAILING_HEADING_CHARS = string.whitespace + ":"
+
+
+class TocMatcher:
+    """Matches lines against every TOC title with one dictionary lookup per line.
+
+    Equivalent to trying each case-insensitive ``^\\s*title[\\s:]*$`` pattern in turn:
+    leading whitespace and trailing whitespace/colons are ignored, and when several
+    titles normalize to the same key the first one wins.
+    """
+
+    def __init__(self, titles: Iterable[str]):
+        self._lookup: Dict[str, str] = {}
+        for title in titles:
+            self._lookup.setdefault(self.normalize(title), title)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Reduce a line or title to its lookup key."""
+        return text.lstrip().rstrip(_TRAILING_HEADING_CHARS).lower()
+
+    def match(self, line: str) -> Optional[str]:
+        """Return the TOC title the line is a heading for, or None."""
+        return self._lookup.get(self.normalize(line))
+
+    def __iter__(self):
+        return iter(self._lookup.values())
+
+    def __len__(self) -> int:
+        return len(self._lookup)
@@ -4,8 +4,9 @@ import logging
 import json
 import os
 import yaml
-from typing import Dict, Union, List, Tuple
+from typing import Dict, Union, List
 from tqdm import tqdm
+from src.utils import TocMatcher
 
 # Setup logging configuration
 logging.basicConfig(
@@ -29,16 +30,14 @@ def load_config(config_path: str) -> Dict:
         config = yaml.safe_load(f)
     return config
 
-def create_toc_patterns(toc_structure: Dict[str, Union[str, Dict[str, str]]]) -> List[Tuple[str, re.Pattern]]:
-    """Creates a list of tuples containing subsection titles and compiled regex patterns."""
-    patterns = []
+def create_toc_patterns(toc_structure: Dict[str, Union[str, Dict[str, str]]]) -> TocMatcher:
+    """Creates a matcher over the TOC subsection titles, compiled once per TOC."""
+    subsection_titles = []
     for section, subsections in toc_structure["Table of Contents"].items():
         if isinstance(subsections, dict):
-            for subsection in subsections:
-                pattern = rf"^\s*{re.escape(subsection)}[\s:]*$"
-                patterns.append((subsection, re.compile(pattern, re.IGNORECASE | re.MULTILINE)))
-    
-    return patterns
+            subsection_titles.extend(subsections)
+
+    return TocMatcher(subsection_titles)
 
 def split_logically_by_paragraphs(text: str, title: str) -> List[Dict]:
     """Logically split large sections based on paragraphs."""
@@ -54,7 +53,7 @@ def split_logically_by_paragraphs(text: str, title: str) -> List[Dict]:
     
     return segments
 
-def segment_pdf_using_toc(pdf_path: str, toc_patterns: List[Tuple[str, re.Pattern]]) -> Dict[str, Dict]:
+def segment_pdf_using_toc(pdf_path: str, toc_patterns: TocMatcher) -> Dict[str, Dict]:
     """Extract and segment the text from the PDF based on TOC subsection patterns."""
     logging.info("Starting PDF segmentation process using TOC subsections.")
     text_segments = {}
@@ -84,35 +83,31 @@ def segment_pdf_using_toc(pdf_path: str, toc_patterns: List[Tuple[str, re.Patter
                     lines = text.split('\n') if isinstance(text, str) else [t['text'] for t in text]
 
                     for line in lines:
-                        matched = False
-                        for title, pattern in toc_patterns:
-                            if pattern.match(line):
-                                # Save the current segment if it exists
-                                if current_title and current_segment:
-                                    segment_text = "\n".join(current_segment).strip()
-                                    if len(segment_text.split('\n\n')) > MAX_PARAGRAPHS_PER_SEGMENT:
-                                        # Logically split large sections by paragraphs
-                                        for chunk in split_logically_by_paragraphs(segment_text, current_title):
-                                            text_segments[chunk["title"]] = {
-                                                "text": chunk["text"],
-                                                "start_page": start_page,
-                                                "end_page": page_num
-                                            }
-                                    else:
-                                        text_segments[current_title] = {
-                                            "text": segment_text,
+                        title = toc_patterns.match(line)
+                        if title:
+                            # Save the current segment if it exists
+                            if current_title and current_segment:
+                                segment_text = "\n".join(current_segment).strip()
+                                if len(segment_text.split('\n\n')) > MAX_PARAGRAPHS_PER_SEGMENT:
+                                    # Logically split large sections by paragraphs
+                                    for chunk in split_logically_by_paragraphs(segment_text, current_title):
+                                        text_segments[chunk["title"]] = {
+                                            "text": chunk["text"],
                                             "start_page": start_page,
                                             "end_page": page_num
                                         }
-                                    current_segment = []
-                                
-                                current_title = title
-                                start_page = page_num + 1
-                                logging.debug(f"Subsection detected: '{title}' - Creating new segment.")
-                                matched = True
-                                break
-                        
-                        if current_title and not matched:
+                                else:
+                                    text_segments[current_title] = {
+                                        "text": segment_text,
+                                        "start_page": start_page,
+                                        "end_page": page_num
+                                    }
+                                current_segment = []
+
+                            current_title = title
+                            start_page = page_num + 1
+                            logging.debug(f"Subsection detected: '{title}' - Creating new segment.")
+                        elif current_title:
                             current_segment.append(line.strip())
                     
                     logging.info(f"Finished processing page {page_num + 1}.")
@@ -0,0 +1,26 @@
+import unittest
+from src.utils import TocMatcher
+
+class TestTocMatcher(unittest.TestCase):
+    def setUp(self):
+        self.matcher = TocMatcher(["Open Door Policy", "Employment at Will", "OPEN DOOR POLICY"])
+
+    def test_match_ignores_case_and_surrounding_whitespace(self):
+        self.assertEqual(self.matcher.match("  open door policy  "), "Open Door Policy")
+        self.assertEqual(self.matcher.match("EMPLOYMENT AT WILL"), "Employment at Will")
+
+    def test_match_tolerates_trailing_colons(self):
+        self.assertEqual(self.matcher.match("Employment at Will:"), "Employment at Will")
+        self.assertEqual(self.matcher.match("Employment at Will : "), "Employment at Will")
+
+    def test_no_match_for_partial_lines(self):
+        self.assertIsNone(self.matcher.match("Our Open Door Policy"))
+        self.assertIsNone(self.matcher.match("Open Door Policy applies"))
+        self.assertIsNone(self.matcher.match(": Open Door Policy"))
+
+    def test_first_title_wins_on_duplicates(self):
+        self.assertEqual(len(self.matcher), 2)
+        self.assertEqual(self.matcher.match("open door policy"), "Open Door Policy")
+
+if __name__ == "__main__":
+    unittest.main()
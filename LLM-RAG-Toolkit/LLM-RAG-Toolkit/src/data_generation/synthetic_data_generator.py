@@ -4,31 +4,26 @@ import logging
 from typing import List, Dict, Any
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import partial
-from openai import OpenAI
 from rich.progress import Progress, SpinnerColumn, TextColumn
-from sentence_transformers import SentenceTransformer, util
 import nltk
 from nltk.tokenize import sent_tokenize
 from nltk.corpus import wordnet
 import random
-from transformers import pipeline
 import numpy as np
 
 from utils.config_manager import config
-
-# Download necessary NLTK data
-nltk.download('wordnet', quiet=True)
-nltk.download('averaged_perceptron_tagger', quiet=True)
+from utils.llm_cache import cached_chat_completion
+from utils.resources import ensure_nltk_data, get_hf_pipeline, get_openai_client, get_sentence_transformer
 
 logger = logging.getLogger(__name__)
 
 class QAGenerator:
     def __init__(self):
-        self.client = OpenAI(api_key=config.OPENAI_API_KEY)
+        self.client = get_openai_client()
         self.generation_model = config.models['generation_model']
         self.scoring_model = config.models['scoring_model']
-        self.sentence_transformer = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-        self.fluency_checker = pipeline("text-classification", model="textattack/roberta-base-CoLA")
+        self.sentence_transformer = get_sentence_transformer('paraphrase-MiniLM-L6-v2')
+        self.fluency_checker = get_hf_pipeline("text-classification", "textattack/roberta-base-CoLA")
 
     def generate_questions(self, segment_text: str, n_questions: int) -> List[str]:
         question_types = [
@@ -91,19 +86,20 @@ class QAGenerator:
 
     def _get_completion(self, prompt: str) -> str:
         try:
-            response = self.client.chat.completions.create(
-                model=self.generation_model,
-                messages=[{"role": "user", "content": prompt}],
+            return cached_chat_completion(
+                self.client,
+                self.generation_model,
+                [{"role": "user", "content": prompt}],
                 temperature=config.generation_parameters['temperature'],
                 top_p=config.generation_parameters['top_p'],
                 max_tokens=config.generation_parameters['max_tokens'],
             )
-            return response.choices[0].message.content
         except Exception as e:
             logger.error(f"Error in API call: {str(e)}", exc_info=True)
             raise
 
-def validate_response_with_sbert(response: str, segment_text: str, sentence_transformer: SentenceTransformer) -> float:
+def validate_response_with_sbert(response: str, segment_text: str, sentence_transformer: "SentenceTransformer") -> float:
+    from sentence_transformers import util
     embeddings = sentence_transformer.encode([segment_text, response])
     cosine_sim = util.pytorch_cos_sim(embeddings[0], embeddings[1])
     return cosine_sim.item()
@@ -133,6 +129,8 @@ def augment_data(question: str, response: str, qa_generator: QAGenerator) -> Lis
     return augmented_data
 
 def synonym_replacement(question: str, response: str) -> List[Dict[str, str]]:
+    ensure_nltk_data('punkt', 'wordnet', 'averaged_perceptron_tagger')
+
     def replace_synonyms(text):
         words = nltk.word_tokenize(text)
         pos_tags = nltk.pos_tag(words)
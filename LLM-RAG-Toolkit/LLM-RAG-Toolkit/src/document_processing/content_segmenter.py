@@ -2,42 +2,46 @@ import os
 import re
 import json
 import logging
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Iterable, Iterator, Optional, Union
 from tqdm import tqdm
-import fitz  # PyMuPDF
-import nltk
 from nltk.tokenize import sent_tokenize
-from nltk.corpus import stopwords
-import spacy
-import tiktoken
 from langdetect import detect, LangDetectException
 from collections import defaultdict
 from utils.config_manager import config
+from utils.resources import ensure_nltk_data
 from llama_index import Document  # Import LlamaIndex Document
+from .document_loader import DocumentLoader
+from .image_store import ImageStore
+from .parsed_document import compute_file_hash, get_parsed_document, iter_pages, read_outline
+from .segment_cache import SegmentCache, make_cache_key
+from .semantic_boundaries import (
+    DEFAULT_EMBEDDING_MODEL,
+    adjacent_window_similarities,
+    embed_sentences,
+    segment_by_similarity
+)
+from .sentence_packer import pack_sentences
+from .span_table import BOLD_FLAG, spans_with_headings
+from .toc_resolver import DEFAULT_MIN_CONFIDENCE, DEFAULT_PRINTED_TOC_PAGES, insert_toc_entry, resolve_toc
+from .token_counter import get_token_counter
 
 logger = logging.getLogger(__name__)
 
-# Download NLTK data if not already present
-nltk.download('punkt')
-nltk.download('stopwords')
+# Sentences buffered by iter_semantic_segments, in multiples of max_segment_tokens
+STREAM_WINDOW_SEGMENTS = 16
 
-# Initialize tokenizer for accurate token counts
-tokenizer = tiktoken.get_encoding('cl100k_base')
+# Bump whenever a change to this module alters the segments it produces, so cached results are not reused
+SEGMENTER_VERSION = 3
 
-# Load spaCy model for semantic analysis
-try:
-    nlp = spacy.load('en_core_web_sm')
-except OSError:
-    # Download the model if not present
-    from spacy.cli import download
-    download('en_core_web_sm')
-    nlp = spacy.load('en_core_web_sm')
+_segment_cache: Optional[SegmentCache] = None
+
+# Shared cl100k_base token counter for accurate, memoized token counts
+token_counter = get_token_counter('cl100k_base')
 
 
 def get_token_count(text: str) -> int:
     """Calculate the number of tokens in the text using the tokenizer."""
-    tokens = tokenizer.encode(text)
-    return len(tokens)
+    return token_counter.count(text)
 
 
 def load_toc(toc_json_path: str) -> Dict:
@@ -64,7 +68,10 @@ def load_toc(toc_json_path: str) -> Dict:
 
 
 def extract_toc_from_pdf(pdf_path: str) -> Dict:
-    """Extract the table of contents from the PDF.
+    """Extract the table of contents from the PDF's outline, or else from a printed TOC page.
+
+    Only the outline and the opening pages are read, so the document is not parsed
+    into the parse cache unless it is already there.
 
     Args:
         pdf_path (str): The path to the PDF file.
@@ -72,36 +79,38 @@ def extract_toc_from_pdf(pdf_path: str) -> Dict:
     Returns:
         Dict: The TOC data structured as a nested dictionary.
     """
-    toc_dict = {}
     try:
-        with fitz.open(pdf_path) as doc:
-            toc = doc.get_toc(simple=False)
-            for entry in toc:
-                if len(entry) >= 3:  # Ensure we have at least level, title, and page number
-                    level, title, page_num = entry[:3]
-                    insert_toc_entry(toc_dict, level, title.strip())
-        return toc_dict
+        return _read_toc(pdf_path)
     except Exception as e:
         logger.error(f"Error extracting TOC from PDF {os.path.basename(pdf_path)}: {e}", exc_info=True)
         return {}
 
 
-def insert_toc_entry(toc_dict: Dict, level: int, title: str):
-    """Insert a TOC entry into the nested dictionary based on its level.
+def _read_toc(pdf_path: str) -> Dict:
+    # extract_toc_from_pdf without the error handling, for callers that must not mistake
+    # an unreadable outline for a document without one
+    settings = config.toc_resolution or {}
+    printed_toc_pages = settings.get('printed_toc_pages', DEFAULT_PRINTED_TOC_PAGES)
+    outline, pages, page_count = read_outline(pdf_path, printed_toc_pages)
+    return resolve_toc(outline, pages, page_count,
+                       min_confidence=settings.get('min_confidence', DEFAULT_MIN_CONFIDENCE),
+                       printed_toc_pages=printed_toc_pages)["toc"]
+
+
+def iter_toc_entries(toc_structure: Dict, level: int = 1) -> Iterator[Tuple[int, str]]:
+    """Walk the TOC structure depth-first, yielding each section with its level.
 
     Args:
-        toc_dict (Dict): The current TOC dictionary.
-        level (int): The level of the TOC entry.
-        title (str): The title of the TOC entry.
+        toc_structure (Dict): The TOC data.
+        level (int): The current level in the TOC hierarchy.
+
+    Yields:
+        Tuple[int, str]: The level and title of each section, in document order.
     """
-    current_level = toc_dict
-    for _ in range(level - 1):
-        if not current_level:
-            current_level[title] = {}
-            return
-        last_key = next(reversed(current_level))
-        current_level = current_level[last_key]
-    current_level[title] = {}
+    for section, subsections in toc_structure.items():
+        yield level, section
+        if isinstance(subsections, dict) and level < config.document_processing.get('max_toc_depth', 5):
+            yield from iter_toc_entries(subsections, level + 1)
 
 
 def create_toc_patterns(toc_structure: Dict, level: int = 1) -> List[Tuple[int, str, re.Pattern]]:
@@ -114,41 +123,86 @@ def create_toc_patterns(toc_structure: Dict, level: int = 1) -> List[Tuple[int,
     Returns:
         List[Tuple[int, str, re.Pattern]]: A list of tuples containing level, section titles, and regex patterns.
     """
-    patterns = []
-    for section, subsections in toc_structure.items():
-        pattern = re.compile(rf"^\s*{re.escape(section)}[\s]*$", re.IGNORECASE)
-        patterns.append((level, section, pattern))
-        if isinstance(subsections, dict) and level < config.document_processing.get('max_toc_depth', 5):
-            patterns.extend(create_toc_patterns(subsections, level + 1))
-    return patterns
+    return [
+        (section_level, section, re.compile(rf"^\s*{re.escape(section)}[\s]*$", re.IGNORECASE))
+        for section_level, section in iter_toc_entries(toc_structure, level)
+    ]
+
+
+class TocMatcher:
+    """Matches text spans against every TOC title with a single dictionary lookup.
+
+    A span matches a title exactly when the title's ``^\\s*title\\s*$`` pattern from
+    ``create_toc_patterns`` would match it case-insensitively; when several titles
+    normalize to the same key, the first one in TOC order wins, as it did when the
+    patterns were tried in sequence.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[int, str]]):
+        """Build the lookup table.
 
+        Args:
+            entries (Iterable[Tuple[int, str]]): The (level, title) pairs in TOC order.
+        """
+        self._lookup: Dict[str, Tuple[int, str]] = {}
+        for level, title in entries:
+            self._lookup.setdefault(self.normalize(title), (level, title))
 
-def extract_images(pdf_path: str) -> List[Dict]:
-    """Extract images from the PDF.
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Reduce text to the key used for matching: surrounding whitespace removed, lowercased."""
+        return text.strip().lower()
+
+    @classmethod
+    def from_patterns(cls, toc_patterns: List[Tuple[int, str, re.Pattern]]) -> "TocMatcher":
+        """Build a matcher from the output of ``create_toc_patterns``."""
+        return cls((level, title) for level, title, _ in toc_patterns)
+
+    def match(self, text: str) -> Optional[Tuple[int, str]]:
+        """Return the (level, title) of the TOC entry the text is a heading for, if any."""
+        return self._lookup.get(self.normalize(text))
+
+
+def create_toc_matcher(toc_structure: Dict) -> TocMatcher:
+    """Compile the TOC structure into a matcher, once per TOC.
+
+    Args:
+        toc_structure (Dict): The TOC data.
+
+    Returns:
+        TocMatcher: A matcher over every TOC title.
+    """
+    return TocMatcher(iter_toc_entries(toc_structure))
+
+
+def extract_images(pdf_path: str, image_store: Optional[ImageStore] = None) -> List[Dict]:
+    """Extract image information from the PDF without decoding the images.
 
     Args:
         pdf_path (str): The path to the PDF file.
+        image_store (Optional[ImageStore]): A store to write the image bytes to. When given,
+            each entry also carries the content ``digest`` and the stored ``path``.
 
     Returns:
-        List[Dict]: A list of dictionaries containing image data.
+        List[Dict]: A list of dictionaries describing each image occurrence.
     """
     images = []
     try:
-        with fitz.open(pdf_path) as pdf_document:
-            for page_num in range(len(pdf_document)):
-                page = pdf_document[page_num]
-                image_list = page.get_images(full=True)
-                for img_index, img in enumerate(image_list):
-                    xref = img[0]
-                    base_image = pdf_document.extract_image(xref)
-                    images.append({
-                        "page": page_num,
-                        "type": base_image.get("ext", ""),
-                        "size": len(base_image["image"]),
-                        "content": base_image["image"],
-                        "width": base_image.get("width", 0),
-                        "height": base_image.get("height", 0)
-                    })
+        parsed = get_parsed_document(pdf_path)
+        digests = parsed.save_images(image_store) if image_store is not None else {}
+        for image in parsed.images:
+            entry = {
+                "page": image["page"],
+                "xref": image["xref"],
+                "type": image["type"],
+                "size": image["size"],
+                "width": image["width"],
+                "height": image["height"]
+            }
+            if image["xref"] in digests:
+                entry["digest"] = digests[image["xref"]]
+                entry["path"] = image_store.path(entry["digest"], image["type"])
+            images.append(entry)
     except Exception as e:
         logger.error(f"Error extracting images from PDF {os.path.basename(pdf_path)}: {e}", exc_info=True)
     return images
@@ -157,6 +211,9 @@ def extract_images(pdf_path: str) -> List[Dict]:
 def extract_text_with_headings(pdf_path: str) -> List[Dict]:
     """Extract text from the PDF along with heading information.
 
+    Headings are classified for the whole document at once against the style
+    profile learned from its spans; see ``span_table.classify_headings``.
+
     Args:
         pdf_path (str): The path to the PDF file.
 
@@ -165,21 +222,8 @@ def extract_text_with_headings(pdf_path: str) -> List[Dict]:
     """
     content = []
     try:
-        with fitz.open(pdf_path) as doc:
-            for page_num, page in enumerate(doc):
-                blocks = page.get_text("dict")["blocks"]
-                for block in blocks:
-                    if "lines" in block:
-                        for line in block["lines"]:
-                            for span in line["spans"]:
-                                text = span["text"].strip()
-                                if text:
-                                    content.append({
-                                        "text": text,
-                                        "font_size": span["size"],
-                                        "font_flags": span["flags"],
-                                        "page_num": page_num
-                                    })
+        parsed = get_parsed_document(pdf_path)
+        content = spans_with_headings(parsed.spans, parsed.page_count)
     except Exception as e:
         logger.error(f"Error extracting text from PDF {os.path.basename(pdf_path)}: {e}", exc_info=True)
     return content
@@ -196,10 +240,60 @@ def is_heading(span: Dict[str, Any], avg_font_size: float) -> bool:
         bool: True if the span is considered a heading, False otherwise.
     """
     # Consider text as heading if font size is larger than average or if it's bold
-    is_bold = span["font_flags"] & 2  # Bold flag
+    is_bold = span["font_flags"] & BOLD_FLAG
     return span["font_size"] > avg_font_size * 1.2 or is_bold
 
 
+def get_segment_cache() -> SegmentCache:
+    """Return the persistent segment cache configured under ``segment_cache``."""
+    global _segment_cache
+    if _segment_cache is None:
+        cache_config = config.segment_cache or {}
+        _segment_cache = SegmentCache(
+            cache_config.get('cache_dir', 'cache/segments'),
+            max_bytes=cache_config.get('max_megabytes', 512) * 1024 * 1024,
+            max_age_days=cache_config.get('max_age_days', 30)
+        )
+    return _segment_cache
+
+
+def get_processed_segments(pdf_path: str, toc_data: Dict[str, Any] = None, use_cache: bool = True) -> List[Dict]:
+    """Segment and post-process a PDF, reusing the cached result when nothing relevant changed.
+
+    Results are keyed by the file content hash, SEGMENTER_VERSION, the
+    ``document_processing`` settings and the TOC, so an unchanged document is only
+    segmented once. Only a segmentation that finished is cached: errors reading the
+    PDF are raised, so a partial result is never stored under the content hash.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+        toc_data (Dict[str, Any], optional): The TOC data. Defaults to None.
+        use_cache (bool): Whether to read and write the segment cache.
+
+    Returns:
+        List[Dict]: The post-processed segments.
+    """
+    key = None
+    if use_cache:
+        key = make_cache_key(compute_file_hash(pdf_path), SEGMENTER_VERSION,
+                             config.document_processing, toc_data)
+        segments = get_segment_cache().get(key)
+        if segments is not None:
+            logger.info(f"Using cached segments for {os.path.basename(pdf_path)}")
+            return segments
+
+    # Raises on a failed page, before anything is cached
+    documents = segment_pdf(pdf_path, toc_data)
+    segments = post_process_segments([_document_to_segment(doc) for doc in documents])
+
+    if key is not None:
+        try:
+            get_segment_cache().put(key, segments, source=pdf_path)
+        except Exception as e:
+            logger.warning(f"Could not cache segments for {os.path.basename(pdf_path)}: {e}")
+    return segments
+
+
 def segment_pdf(pdf_path: str, toc_data: Dict[str, Any] = None) -> List[Document]:
     """Segment the PDF using TOC if available, otherwise use semantic segmentation.
 
@@ -210,27 +304,67 @@ def segment_pdf(pdf_path: str, toc_data: Dict[str, Any] = None) -> List[Document
     Returns:
         List[Document]: A list of segmented content from the PDF.
     """
+    return list(iter_segments(pdf_path, toc_data))
+
+
+def iter_segments(pdf_path: str, toc_data: Dict[str, Any] = None) -> Iterator[Document]:
+    """Stream the segments of a PDF, yielding each one as soon as it is complete.
+
+    ``segment_pdf`` collects these Documents into a list. Without toc_data the TOC is
+    read from the PDF's outline or printed TOC; an error reading it is raised rather
+    than taken for a document without one. With a TOC the PDF is read
+    one page at a time, without filling the parse cache, and a segment is yielded when
+    the next heading (or the token limit) closes it; without one, pages are streamed
+    through ``iter_segments_with_semantics``.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+        toc_data (Dict[str, Any], optional): The TOC data. Defaults to None.
+
+    Yields:
+        Document: The segments of the PDF, in document order.
+    """
     if not toc_data:
-        toc_data = extract_toc_from_pdf(pdf_path)
+        toc_data = _read_toc(pdf_path)
     if toc_data:
-        toc_patterns = create_toc_patterns(toc_data)
-        return segment_pdf_using_toc(pdf_path, toc_patterns)
+        yield from iter_segments_using_toc(pdf_path, create_toc_matcher(toc_data))
     else:
-        return segment_pdf_with_semantics(pdf_path)
+        yield from iter_segments_with_semantics(pdf_path)
 
 
-def segment_pdf_using_toc(pdf_path: str, toc_patterns: List[Tuple[int, str, re.Pattern]]) -> List[Document]:
+def segment_pdf_using_toc(pdf_path: str,
+                          toc_patterns: Union[TocMatcher, List[Tuple[int, str, re.Pattern]]]) -> List[Document]:
     """Segment the PDF using the table of contents structure.
 
     Args:
         pdf_path (str): The path to the PDF file.
-        toc_patterns (List[Tuple[int, str, re.Pattern]]): A list of TOC patterns with levels.
+        toc_patterns (Union[TocMatcher, List[Tuple[int, str, re.Pattern]]]): A compiled TOC matcher,
+            or a list of TOC patterns with levels from which one is built.
 
     Returns:
         List[Document]: A list of segmented content from the PDF.
     """
-    segments = []
-    images = extract_images(pdf_path)
+    return list(iter_segments_using_toc(pdf_path, toc_patterns))
+
+
+def iter_segments_using_toc(pdf_path: str,
+                            toc_patterns: Union[TocMatcher, List[Tuple[int, str, re.Pattern]]]) -> Iterator[Document]:
+    """Stream the PDF's TOC segments, reading one page at a time.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+        toc_patterns (Union[TocMatcher, List[Tuple[int, str, re.Pattern]]]): A compiled TOC matcher,
+            or a list of TOC patterns with levels from which one is built.
+
+    Errors reading a page are raised to the caller rather than ending the stream early,
+    so a failure is never mistaken for a shorter document.
+
+    Yields:
+        Document: Each text segment once it is closed, followed by one segment per image.
+    """
+    toc_matcher = toc_patterns if isinstance(toc_patterns, TocMatcher) else TocMatcher.from_patterns(toc_patterns)
+    max_tokens = config.document_processing['max_segment_tokens']
+    images = []
     current_segment = {
         "title": "Introduction",
         "content": [],
@@ -239,25 +373,18 @@ def segment_pdf_using_toc(pdf_path: str, toc_patterns: List[Tuple[int, str, re.P
         "path": ["Introduction"]
     }
 
-    content = extract_text_with_headings(pdf_path)
-    avg_font_size = sum(span['font_size'] for span in content) / len(content)
+    for page_num, spans, page_images in tqdm(iter_pages(pdf_path), desc="Processing pages"):
+        images.extend(page_images)
+        span_texts = spans.texts()
+        span_tokens = token_counter.count_batch(span_texts)
 
-    for span in tqdm(content, desc="Processing content"):
-        text = span['text']
-        matched = False
-        for level, title, pattern in toc_patterns:
-            if pattern.match(text):
+        for text, text_tokens in zip(span_texts, span_tokens):
+            heading = toc_matcher.match(text)
+            if heading:
+                level, title = heading
                 # Save current segment
                 if current_segment['content']:
-                    segment_content = " ".join(current_segment['content'])
-                    tokens = get_token_count(segment_content)
-                    segments.append({
-                        "title": current_segment['title'],
-                        "content": segment_content,
-                        "tokens": tokens,
-                        "level": current_segment['level'],
-                        "path": current_segment['path']
-                    })
+                    yield _segment_to_document(_close_segment(current_segment))
                 # Start new segment
                 current_segment = {
                     "title": title,
@@ -266,57 +393,60 @@ def segment_pdf_using_toc(pdf_path: str, toc_patterns: List[Tuple[int, str, re.P
                     "level": level,
                     "path": current_segment['path'][:level - 1] + [title]
                 }
-                matched = True
-                break
-
-        if not matched:
-            current_segment['content'].append(text)
-            current_segment['tokens'] += get_token_count(text)
-
-        if current_segment['tokens'] >= config.document_processing['max_segment_tokens']:
-            segment_content = " ".join(current_segment['content'])
-            tokens = get_token_count(segment_content)
-            segments.append({
-                "title": current_segment['title'],
-                "content": segment_content,
-                "tokens": tokens,
-                "level": current_segment['level'],
-                "path": current_segment['path']
-            })
-            # Reset current segment content but keep the same title and path
-            current_segment['content'] = []
-            current_segment['tokens'] = 0
+            else:
+                current_segment['content'].append(text)
+                current_segment['tokens'] += text_tokens
+
+            if current_segment['tokens'] >= max_tokens:
+                yield _segment_to_document(_close_segment(current_segment))
+                # Reset current segment content but keep the same title and path
+                current_segment['content'] = []
+                current_segment['tokens'] = 0
 
     # Add any remaining content
     if current_segment['content']:
-        segment_content = " ".join(current_segment['content'])
-        tokens = get_token_count(segment_content)
-        segments.append({
-            "title": current_segment['title'],
-            "content": segment_content,
-            "tokens": tokens,
-            "level": current_segment['level'],
-            "path": current_segment['path']
-        })
+        yield _segment_to_document(_close_segment(current_segment))
 
     # Process images
-    image_segments = process_images(images)
-    segments.extend(image_segments)
-
-    # Convert segments to Documents
-    documents = []
-    for segment in segments:
-        doc = Document(
-            text=segment["content"],
-            doc_id=segment.get("title", "Untitled"),
-            extra_info={
-                "tokens": segment.get("tokens", 0),
-                "level": segment.get("level", 1),
-                "path": segment.get("path", [])
-            }
-        )
-        documents.append(doc)
-    return documents
+    for image_segment in process_images(images):
+        yield _segment_to_document(image_segment)
+
+
+def _close_segment(current_segment: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "title": current_segment['title'],
+        "content": " ".join(current_segment['content']),
+        "tokens": current_segment['tokens'],
+        "level": current_segment['level'],
+        "path": current_segment['path']
+    }
+
+
+def _document_to_segment(document: Document) -> Dict[str, Any]:
+    extra_info = document.extra_info or {}
+    segment = {
+        "title": document.doc_id,
+        "content": document.text,
+        "tokens": extra_info.get("tokens", 0),
+        "level": extra_info.get("level", 1),
+        "path": extra_info.get("path", [])
+    }
+    if "image_data" in extra_info:
+        segment["image_data"] = extra_info["image_data"]
+    return segment
+
+
+def _segment_to_document(segment: Dict[str, Any]) -> Document:
+    return Document(
+        text=segment["content"],
+        doc_id=segment.get("title", "Untitled"),
+        extra_info={
+            "tokens": segment.get("tokens", 0),
+            "level": segment.get("level", 1),
+            "path": segment.get("path", []),
+            **({"image_data": segment["image_data"]} if "image_data" in segment else {})
+        }
+    )
 
 
 def segment_pdf_with_semantics(pdf_path: str) -> List[Document]:
@@ -328,94 +458,151 @@ def segment_pdf_with_semantics(pdf_path: str) -> List[Document]:
     Returns:
         List[Document]: A list of segmented content from the PDF.
     """
-    segments = []
-    images = extract_images(pdf_path)
+    return list(iter_segments_with_semantics(pdf_path))
 
-    try:
-        content = []
-        with fitz.open(pdf_path) as doc:
-            for page in doc:
-                text = page.get_text()
-                if text:
-                    content.append(text)
-        full_text = "\n".join(content)
-        # Perform semantic segmentation
-        segments = semantic_segmentation(full_text)
-        # Process images
-        image_segments = process_images(images)
-        segments.extend(image_segments)
-    except Exception as e:
-        logger.error(f"Error processing PDF {os.path.basename(pdf_path)}: {e}", exc_info=True)
-
-    # Convert segments to Documents
-    documents = []
-    for segment in segments:
-        doc = Document(
-            text=segment["content"],
-            doc_id=segment.get("title", "Untitled"),
-            extra_info={
-                "tokens": segment.get("tokens", 0),
-                "level": segment.get("level", 1),
-                "path": segment.get("path", [])
-            }
-        )
-        documents.append(doc)
-    return documents
+
+def iter_segments_with_semantics(pdf_path: str) -> Iterator[Document]:
+    """Stream the PDF's semantic segments, reading it a page at a time through ``DocumentLoader.iter_chunks``.
+
+    Text segments are yielded as ``iter_semantic_segments`` closes them, followed by
+    one segment per image.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+
+    Errors reading or segmenting a page are raised to the caller, as in
+    ``iter_segments_using_toc``.
+
+    Yields:
+        Document: The text segments, then the image segments.
+    """
+    images = []
+
+    def page_texts() -> Iterator[str]:
+        for chunk in DocumentLoader().iter_chunks(pdf_path):
+            images.extend(chunk.get("images", []))
+            if chunk["text"]:
+                yield chunk["text"]
+
+    for segment in iter_semantic_segments(page_texts()):
+        yield _segment_to_document(segment)
+    for image_segment in process_images(images):
+        yield _segment_to_document(image_segment)
+
+
+def _segment_ranges(sentences: List[str], sentence_counts: List[int]) -> List[Tuple[int, int, int]]:
+    # The (start, end, tokens) sentence ranges of each segment, by embeddings or by token count
+    max_tokens = config.document_processing['max_segment_tokens']
+    overlap = config.document_processing.get('overlap_sentences', 2)
+
+    if config.document_processing.get('semantic_mode', 'tokens') == 'embeddings' and len(sentences) > 1:
+        try:
+            embeddings = embed_sentences(
+                sentences, config.document_processing.get('embedding_model', DEFAULT_EMBEDDING_MODEL))
+            similarities = adjacent_window_similarities(
+                embeddings, config.document_processing.get('semantic_window', 3))
+            return segment_by_similarity(
+                similarities, sentence_counts, max_tokens, config.document_processing.get('semantic_depth', 0.5))
+        except Exception as e:
+            # sentence-transformers missing, or the model could not be downloaded or loaded
+            logger.warning(f"Embedding-based segmentation unavailable ({e}); packing sentences by token count.")
+
+    return pack_sentences(sentence_counts, max_tokens, overlap)
+
+
+def _numbered_segment(part: int, sentences: List[str], tokens: int) -> Dict:
+    return {
+        "title": f"Segment {part}",
+        "content": " ".join(sentences),
+        "tokens": tokens,
+        "level": 1,
+        "path": [f"Segment {part}"]
+    }
 
 
 def semantic_segmentation(text: str) -> List[Dict]:
     """Segment text based on semantic coherence.
 
+    With ``semantic_mode: tokens`` (the default) sentences are packed by token count
+    with ``overlap_sentences`` of overlap. With ``semantic_mode: embeddings`` every
+    sentence is embedded in one batch and segments end at valleys in the similarity of
+    adjacent sentence windows, within ``max_segment_tokens`` and without overlap; if
+    the embedding model cannot be loaded, sentences are packed by token count instead.
+
     Args:
         text (str): The full text to segment.
 
     Returns:
         List[Dict]: A list of text segments.
     """
+    ensure_nltk_data('punkt')
     sentences = sent_tokenize(text)
-    max_tokens = config.document_processing['max_segment_tokens']
-    overlap = config.document_processing.get('overlap_sentences', 2)
-    segments = []
-    current_segment = []
-    current_tokens = 0
-    part = 1
-    i = 0
-
-    while i < len(sentences):
-        sentence = sentences[i]
-        sentence_tokens = get_token_count(sentence)
-        if current_tokens + sentence_tokens > max_tokens and current_segment:
-            # Create segment
-            segment_content = " ".join(current_segment)
-            tokens = get_token_count(segment_content)
-            segments.append({
-                "title": f"Segment {part}",
-                "content": segment_content,
-                "tokens": tokens,
-                "level": 1,
-                "path": [f"Segment {part}"]
-            })
-            # Prepare for next segment with overlap
-            part += 1
-            current_segment = current_segment[-overlap:]  # Keep last 'overlap' sentences
-            current_tokens = get_token_count(" ".join(current_segment))
-        else:
-            current_segment.append(sentence)
-            current_tokens += sentence_tokens
-            i += 1
-
-    if current_segment:
-        segment_content = " ".join(current_segment)
-        tokens = get_token_count(segment_content)
-        segments.append({
-            "title": f"Segment {part}",
-            "content": segment_content,
-            "tokens": tokens,
-            "level": 1,
-            "path": [f"Segment {part}"]
-        })
+    sentence_counts = token_counter.count_batch(sentences)
+    return [
+        _numbered_segment(part, sentences[start:end], tokens)
+        for part, (start, end, tokens) in enumerate(_segment_ranges(sentences, sentence_counts), 1)
+    ]
 
-    return segments
+
+def iter_semantic_segments(chunks: Iterable[str], window_segments: int = STREAM_WINDOW_SEGMENTS) -> Iterator[Dict]:
+    """Segment a stream of text chunks, such as ``DocumentLoader.iter_chunks`` texts, as they arrive.
+
+    The last sentence of each chunk may continue in the next one, so it is held back
+    and tokenized again with the next chunk, joined by a newline. Sentences are
+    buffered until they hold about window_segments segments' worth of tokens; the
+    buffer is then segmented like ``semantic_segmentation`` and every segment but the
+    last is yielded. The last one may continue too, so its sentences start the next
+    buffer. Memory is bounded by the window, not the document.
+
+    With ``semantic_mode: tokens`` the segments are the same as
+    ``semantic_segmentation("\\n".join(chunks))``. With ``semantic_mode: embeddings``
+    the valley threshold (mean and standard deviation of the similarities) is
+    computed within each window rather than over the whole document, so boundaries
+    can differ from the batch result.
+
+    Args:
+        chunks (Iterable[str]): The document text, in order.
+        window_segments (int): The buffer size, in multiples of ``max_segment_tokens``.
+
+    Yields:
+        Dict: The text segments, numbered across the whole stream.
+    """
+    ensure_nltk_data('punkt')
+    window_tokens = config.document_processing['max_segment_tokens'] * window_segments
+    sentences: List[str] = []
+    sentence_counts: List[int] = []
+    buffered_tokens = 0
+    part = 0
+    pending = ""
+
+    for chunk in chunks:
+        text = f"{pending}\n{chunk}" if pending else chunk
+        new_sentences = sent_tokenize(text)
+        # The last sentence may run on into the next chunk; keep its raw text, trailing spaces included
+        pending = text[text.rfind(new_sentences.pop()):] if new_sentences else ""
+        new_counts = token_counter.count_batch(new_sentences)
+        sentences.extend(new_sentences)
+        sentence_counts.extend(new_counts)
+        buffered_tokens += sum(new_counts)
+        if buffered_tokens < window_tokens:
+            continue
+
+        ranges = _segment_ranges(sentences, sentence_counts)
+        for start, end, tokens in ranges[:-1]:
+            part += 1
+            yield _numbered_segment(part, sentences[start:end], tokens)
+        keep = ranges[-1][0]
+        sentences, sentence_counts = sentences[keep:], sentence_counts[keep:]
+        buffered_tokens = sum(sentence_counts)
+
+    if pending:
+        final_sentences = sent_tokenize(pending)
+        sentences.extend(final_sentences)
+        sentence_counts.extend(token_counter.count_batch(final_sentences))
+    if sentences:
+        for start, end, tokens in _segment_ranges(sentences, sentence_counts):
+            part += 1
+            yield _numbered_segment(part, sentences[start:end], tokens)
 
 
 def process_images(images: List[Dict]) -> List[Dict]:
@@ -428,10 +615,13 @@ def process_images(images: List[Dict]) -> List[Dict]:
         List[Dict]: A list of image segments.
     """
     processed_images = []
-    for i, img in enumerate(images):
+    contents = [
+        f"[Image: {img['type']} format, size: {img['width']}x{img['height']} pixels, on page: {img['page'] + 1}]"
+        for img in images
+    ]
+    image_tokens = token_counter.count_batch(contents)
+    for i, (img, content, tokens) in enumerate(zip(images, contents, image_tokens)):
         title = f"Image {i + 1}"
-        content = f"[Image: {img['type']} format, size: {img['width']}x{img['height']} pixels, on page: {img['page'] + 1}]"
-        tokens = get_token_count(content)
         processed_images.append({
             "title": title,
             "content": content,
@@ -461,13 +651,19 @@ def post_process_segments(segments: List[Dict]) -> List[Dict]:
     max_tokens = config.document_processing['max_segment_tokens']
     overlap = config.document_processing.get('overlap_sentences', 2)
 
-    for segment in segments:
+    normalized = {
+        i: re.sub(r'\s+', ' ', segment['content']).strip()
+        for i, segment in enumerate(segments) if "image_data" not in segment
+    }
+    normalized_tokens = dict(zip(normalized, token_counter.count_batch(normalized.values())))
+
+    for i, segment in enumerate(segments):
         if "image_data" in segment:
             processed_segments.append(segment)
             continue
 
-        content = re.sub(r'\s+', ' ', segment['content']).strip()
-        tokens = get_token_count(content)
+        content = normalized[i]
+        tokens = normalized_tokens[i]
 
         if tokens > max_tokens:
             split_segments = split_long_segment(segment, content, max_tokens, overlap)
@@ -501,39 +697,15 @@ def split_long_segment(segment: Dict, content: str, max_tokens: int, overlap: in
     Returns:
         List[Dict]: A list of split segments.
     """
+    ensure_nltk_data('punkt')
     sentences = sent_tokenize(content)
+    sentence_counts = token_counter.count_batch(sentences)
     chunks = []
-    current_chunk = []
-    current_tokens = 0
-    part = 1
-    i = 0
-
-    while i < len(sentences):
-        sentence = sentences[i]
-        sentence_tokens = get_token_count(sentence)
-        if current_tokens + sentence_tokens > max_tokens and current_chunk:
-            chunk_content = " ".join(current_chunk)
-            tokens = get_token_count(chunk_content)
-            new_segment = segment.copy()
-            new_segment['title'] = f"{segment['title']} (Part {part})"
-            new_segment['content'] = chunk_content
-            new_segment['tokens'] = tokens
-            new_segment['path'] = segment['path'] + [f"Part {part}"]
-            chunks.append(new_segment)
-            part += 1
-            current_chunk = current_chunk[-overlap:]  # Keep last 'overlap' sentences
-            current_tokens = get_token_count(" ".join(current_chunk))
-        else:
-            current_chunk.append(sentence)
-            current_tokens += sentence_tokens
-            i += 1
 
-    if current_chunk:
-        chunk_content = " ".join(current_chunk)
-        tokens = get_token_count(chunk_content)
+    for part, (start, end, tokens) in enumerate(pack_sentences(sentence_counts, max_tokens, overlap), 1):
         new_segment = segment.copy()
         new_segment['title'] = f"{segment['title']} (Part {part})"
-        new_segment['content'] = chunk_content
+        new_segment['content'] = " ".join(sentences[start:end])
         new_segment['tokens'] = tokens
         new_segment['path'] = segment['path'] + [f"Part {part}"]
         chunks.append(new_segment)
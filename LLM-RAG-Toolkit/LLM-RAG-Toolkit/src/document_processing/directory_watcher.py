@@ -0,0 +1,231 @@
+import os
+import time
+import logging
+import argparse
+import threading
+from typing import Callable, Collection, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 2.0
+
+# A file must keep the same size and mtime this long before it is processed
+DEFAULT_DEBOUNCE = 3.0
+
+DEFAULT_EXTENSIONS = ('.pdf',)
+
+# Size and mtime of a file, or None once it is gone
+Signature = Optional[Tuple[int, float]]
+
+
+class DirectoryWatcher:
+    """Watches a directory and reports files that were added, changed or removed.
+
+    The directory is polled every ``poll_interval`` seconds. When the optional
+    ``watchdog`` package is installed, file system events (inotify on Linux) wake the
+    poller at once instead. A change is only reported after the file's size and mtime
+    have stayed the same for ``debounce`` seconds, so a PDF still being copied or
+    saved is processed once, when it is complete.
+    """
+
+    def __init__(self, directory: str, on_change: Callable[[str], None], on_remove: Callable[[str], None],
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, debounce: float = DEFAULT_DEBOUNCE,
+                 extensions: Collection[str] = DEFAULT_EXTENSIONS):
+        self.directory = directory
+        self.on_change = on_change
+        self.on_remove = on_remove
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self._known: Dict[str, Signature] = {}
+        self._pending: Dict[str, Tuple[Signature, float]] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def scan(self) -> Dict[str, Tuple[int, float]]:
+        """Return the size and mtime of every watched file in the directory."""
+        signatures = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(self.extensions):
+                    stat = entry.stat()
+                    signatures[os.path.abspath(entry.path)] = (stat.st_size, stat.st_mtime)
+        return signatures
+
+    def seed(self, signatures: Optional[Dict[str, Tuple[int, float]]] = None):
+        """Treat the given files, by default the directory's current contents, as already handled."""
+        self._known = dict(self.scan() if signatures is None else signatures)
+        self._pending.clear()
+
+    def poll(self, now: Optional[float] = None) -> Tuple[List[str], List[str]]:
+        """Scan once and return the files whose change or removal has settled.
+
+        Args:
+            now (Optional[float]): The current time; defaults to ``time.monotonic()``.
+
+        Returns:
+            Tuple[List[str], List[str]]: The changed or added files and the removed files.
+        """
+        now = time.monotonic() if now is None else now
+        current = self.scan()
+        changed, removed = [], []
+        for path in set(current) | set(self._known) | set(self._pending):
+            signature = current.get(path)
+            if signature == self._known.get(path):
+                self._pending.pop(path, None)
+                continue
+            pending = self._pending.get(path)
+            if pending is None or pending[0] != signature:
+                self._pending[path] = (signature, now)
+                continue
+            if now - pending[1] < self.debounce:
+                continue
+            del self._pending[path]
+            if signature is None:
+                self._known.pop(path, None)
+                removed.append(path)
+            else:
+                self._known[path] = signature
+                changed.append(path)
+        return sorted(changed), sorted(removed)
+
+    def run_once(self, now: Optional[float] = None):
+        """Poll once and hand every settled change to the callbacks."""
+        changed, removed = self.poll(now)
+        for path in removed:
+            self._dispatch(self.on_remove, path, "removal")
+        for path in changed:
+            self._dispatch(self.on_change, path, "change")
+
+    def _dispatch(self, callback: Callable[[str], None], path: str, kind: str):
+        try:
+            callback(path)
+        except Exception as e:
+            # The file stays handled; it is tried again when it next changes
+            logger.error(f"Error handling {kind} of {os.path.basename(path)}: {e}", exc_info=True)
+
+    def run(self):
+        """Watch until ``stop`` is called."""
+        observer = self._start_observer()
+        try:
+            while not self._stop.is_set():
+                self.run_once()
+                # Poll on schedule, or sooner after a file system event
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def start(self) -> threading.Thread:
+        """Watch in a background daemon thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="directory-watcher", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """Stop watching and wait for the background thread, if any."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _start_observer(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return None
+
+        wake = self._wake
+
+        class WakeHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wake.set()
+
+        observer = Observer()
+        observer.schedule(WakeHandler(), self.directory, recursive=False)
+        observer.start()
+        return observer
+
+
+def reindex_document(file_path: str):
+    """Re-extract, re-segment and re-embed one document and swap it into the shared index."""
+    from .document_processor import DocumentProcessor
+    started = time.perf_counter()
+    result = DocumentProcessor(index_documents=True).process_document(file_path)
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    logger.info(f"Re-indexed {os.path.basename(file_path)} in {time.perf_counter() - started:.1f}s")
+
+
+def unindex_document(file_path: str):
+    """Remove a deleted document from the shared index."""
+    from .document_index import get_document_index
+    document_index = get_document_index()
+    if document_index.remove(file_path):
+        document_index.persist()
+        logger.info(f"Removed {os.path.basename(file_path)} from the index")
+
+
+def create_index_watcher(directory: Optional[str] = None, poll_interval: Optional[float] = None,
+                         debounce: Optional[float] = None) -> DirectoryWatcher:
+    """Create a watcher that keeps the shared document index in step with a directory.
+
+    Settings default to the ``watch`` section and the directory to
+    ``file_paths.input_directory``. Documents whose current version is not in the
+    index yet, or that left the directory while nothing was watching, are handled on
+    the first poll; the rest are seeded as up to date.
+
+    Returns:
+        DirectoryWatcher: The watcher; call ``run`` or ``start``.
+    """
+    from utils.config_manager import config
+    from .document_index import get_document_index
+    from .parsed_document import compute_file_hash
+    settings = config.watch or {}
+    watcher = DirectoryWatcher(
+        directory or config.file_paths['input_directory'],
+        reindex_document,
+        unindex_document,
+        poll_interval=poll_interval or settings.get('poll_interval', DEFAULT_POLL_INTERVAL),
+        debounce=debounce if debounce is not None else settings.get('debounce', DEFAULT_DEBOUNCE),
+        extensions=settings.get('extensions', DEFAULT_EXTENSIONS)
+    )
+
+    document_index = get_document_index()
+    current = watcher.scan()
+    seeded = {path: signature for path, signature in current.items()
+              if document_index.is_current(path, compute_file_hash(path))}
+    # Indexed sources that are gone are seeded as present, so the first poll removes them
+    watched_directory = os.path.abspath(watcher.directory)
+    for path in document_index.sources():
+        if os.path.dirname(path) == watched_directory and path not in current:
+            seeded[path] = (0, 0.0)
+    watcher.seed(seeded)
+    logger.info(f"Watching {watcher.directory}: {len(seeded)} documents up to date, "
+                f"{len(current) - len(seeded)} to index")
+    return watcher
+
+
+def main(argv: Optional[List[str]] = None):
+    """Keep the document index up to date with the input directory until interrupted."""
+    parser = argparse.ArgumentParser(description="Re-index documents as they change in a directory.")
+    parser.add_argument('--directory', help="The directory to watch; defaults to file_paths.input_directory.")
+    parser.add_argument('--interval', type=float, help="Seconds between polls.")
+    parser.add_argument('--debounce', type=float, help="Seconds a file must be unchanged before it is processed.")
+    args = parser.parse_args(argv)
+
+    watcher = create_index_watcher(args.directory, args.interval, args.debounce)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        logger.info("Stopped watching")
+
+
+if __name__ == "__main__":
+    main()
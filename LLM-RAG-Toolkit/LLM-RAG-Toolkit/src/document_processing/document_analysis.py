@@ -0,0 +1,183 @@
+import json
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from utils.config_manager import config
+from utils.llm_cache import cached_chat_completion, cached_chat_completion_async, make_cache_key
+from .parsed_document import read_opening_pages
+
+logger = logging.getLogger(__name__)
+
+# The LLM sees the opening pages of a document, cut to these sizes
+SAMPLE_PAGES = 10
+SAMPLE_CHARACTERS = 4000
+SAMPLE_IMAGES = 10
+
+# Number of document analyses remembered in this process
+ANALYSIS_CACHE_SIZE = 256
+
+# Structure extraction asked this model before it shared a request with the semantic metadata
+DEFAULT_STRUCTURE_MODEL = 'gpt-4'
+
+STRUCTURE_FIELDS = ("document_type", "structure", "toc", "notable_features")
+SEMANTIC_FIELDS = ("summary", "main_topics", "entities", "document_type")
+
+
+def read_document_sample(pdf_path: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """Return the text and image descriptions of the first SAMPLE_PAGES pages of a PDF.
+
+    Only those pages are read, unless the document is already in the parse cache.
+    """
+    opening = read_opening_pages(pdf_path, SAMPLE_PAGES)
+    return sample_pages(opening["pages"], opening["images"])
+
+
+def sample_pages(pages: List[str], images: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+    """Return the text and image descriptions of the first SAMPLE_PAGES of the given pages."""
+    text = "".join(page_text + "\n" for page_text in pages[:SAMPLE_PAGES])
+    sample_images = [
+        {"page": image["page"], "type": image["type"], "size": image["size"]}
+        for image in images if image["page"] < SAMPLE_PAGES
+    ]
+    return text, sample_images
+
+
+def make_sample(text: str, images: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Cut a document's text and images down to the sample sent to the LLM."""
+    return {"text": text[:SAMPLE_CHARACTERS], "images": images[:SAMPLE_IMAGES]}
+
+
+def build_analysis_messages(content: Dict[str, Any]) -> Optional[List[Dict[str, str]]]:
+    """Build one prompt asking for both the structure and the semantic metadata of a document.
+
+    Args:
+        content (Dict[str, Any]): The document sample with "text" and "images".
+
+    Returns:
+        Optional[List[Dict[str, str]]]: The messages, or None if the sample is empty.
+    """
+    text_sample = content.get("text", "")[:SAMPLE_CHARACTERS]
+    images = content.get("images", [])[:SAMPLE_IMAGES]
+    if not text_sample and not images:
+        return None
+
+    prompt = (
+        "Analyze this document excerpt. Describe its structure: identify main sections, subsections, "
+        "and any notable features like images or graphs. If a Table of Contents is present, extract it; "
+        "if no clear structure is found, suggest logical divisions based on content. "
+        "Also provide a brief summary, the main topics, and any notable entities mentioned. "
+        "Format the result as a JSON object with the following structure:\n"
+        "{\n"
+        '  "document_type": "report/article/manual/etc",\n'
+        '  "structure": ["list", "of", "main", "sections"],\n'
+        '  "toc": {"section1": {"subsection1": {}, "subsection2": {}}, "section2": {}},\n'
+        '  "notable_features": ["list", "of", "features"],\n'
+        '  "summary": "Brief summary of the content",\n'
+        '  "main_topics": ["list", "of", "main", "topics"],\n'
+        '  "entities": ["list", "of", "notable", "entities"]\n'
+        "}\n\n"
+        f"Document text sample:\n\n{text_sample}\n\n"
+        f"Image information:\n{json.dumps(images)}"
+    )
+    return [
+        {"role": "system", "content": "You are an expert in document analysis, structuring and metadata extraction."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _request_settings() -> Tuple[str, Dict[str, Any]]:
+    # models.structure_model, not generation_model: the structure has always come from its own model
+    params = {
+        "temperature": config.generation_parameters['temperature'],
+        "max_tokens": config.generation_parameters['max_tokens']
+    }
+    return config.models.get('structure_model', DEFAULT_STRUCTURE_MODEL), params
+
+
+_analyses: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_analyses_lock = threading.Lock()
+
+
+def _remembered(key: str) -> Optional[Dict[str, Any]]:
+    with _analyses_lock:
+        analysis = _analyses.get(key)
+        if analysis is not None:
+            _analyses.move_to_end(key)
+        return analysis
+
+
+def _remember(key: str, response_content: str) -> Dict[str, Any]:
+    # Raises json.JSONDecodeError, whose ``doc`` is the raw response, if the reply is not JSON
+    analysis = json.loads(response_content)
+    with _analyses_lock:
+        _analyses[key] = analysis
+        while len(_analyses) > ANALYSIS_CACHE_SIZE:
+            _analyses.popitem(last=False)
+    return analysis
+
+
+def analyze_content(client, content: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Return the combined structure and semantic analysis of a document sample.
+
+    One LLM request answers both ``structure_analyzer`` and ``metadata_extractor``:
+    whichever asks first pays for it and the other reads the remembered result, or
+    the LLM cache in another process.
+
+    Args:
+        client (OpenAI): The OpenAI client.
+        content (Dict[str, Any]): The document sample, e.g. from ``make_sample``.
+
+    Returns:
+        Optional[Dict[str, Any]]: The parsed analysis, or None if the sample is empty.
+
+    Raises:
+        json.JSONDecodeError: If the response is not JSON.
+    """
+    messages = build_analysis_messages(content)
+    if messages is None:
+        return None
+    model, params = _request_settings()
+    key = make_cache_key(model, messages, **params)
+    analysis = _remembered(key)
+    if analysis is None:
+        analysis = _remember(key, cached_chat_completion(client, model, messages, validate=json.loads, **params))
+    return analysis
+
+
+async def analyze_content_async(client, content: Dict[str, Any],
+                                semaphore: Optional[asyncio.Semaphore] = None) -> Optional[Dict[str, Any]]:
+    """Async counterpart of ``analyze_content``; the semaphore caps requests in flight."""
+    messages = build_analysis_messages(content)
+    if messages is None:
+        return None
+    model, params = _request_settings()
+    key = make_cache_key(model, messages, **params)
+    analysis = _remembered(key)
+    if analysis is None:
+        request = cached_chat_completion_async(client, model, messages, validate=json.loads, **params)
+        if semaphore is None:
+            response_content = await request
+        else:
+            async with semaphore:
+                response_content = await request
+        analysis = _remember(key, response_content)
+    return analysis
+
+
+def structure_fields(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Select the structure schema of an analysis, as ``extract_structure_llm`` returns it."""
+    defaults = {"document_type": "unknown", "structure": [], "toc": {}, "notable_features": []}
+    return {field: analysis.get(field, defaults[field]) for field in STRUCTURE_FIELDS}
+
+
+def semantic_fields(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Select the semantic metadata schema of an analysis, as ``extract_semantic_metadata`` returns it."""
+    return {field: analysis[field] for field in SEMANTIC_FIELDS if field in analysis}
+
+
+def clear_analyses():
+    """Forget all remembered analyses."""
+    with _analyses_lock:
+        _analyses.clear()
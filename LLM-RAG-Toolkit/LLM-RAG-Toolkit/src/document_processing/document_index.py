@@ -0,0 +1,169 @@
+import os
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+from llama_index import Document, GPTVectorStoreIndex, StorageContext, load_index_from_storage
+from utils.config_manager import config
+
+logger = logging.getLogger(__name__)
+
+# Records which source file each set of indexed documents came from
+SOURCES_FILE = 'sources.json'
+
+
+def segments_to_documents(segments: List[Dict[str, Any]], file_path: str, file_hash: str) -> List[Document]:
+    """Turn a file's segments into LlamaIndex documents with stable, unique ids.
+
+    Args:
+        segments (List[Dict[str, Any]]): The post-processed segments of the file.
+        file_path (str): The path of the source file.
+        file_hash (str): The SHA-256 hash of the file content.
+
+    Returns:
+        List[Document]: One document per segment with content, ids ``<file_hash>:<n>``.
+    """
+    return [
+        Document(
+            text=segment["content"],
+            doc_id=f"{file_hash}:{i}",
+            extra_info={
+                "source": os.path.basename(file_path),
+                "title": segment.get("title", "Untitled"),
+                "level": segment.get("level", 1),
+                "path": " > ".join(segment.get("path", []))
+            }
+        )
+        for i, segment in enumerate(segments) if segment.get("content")
+    ]
+
+
+class DocumentIndex:
+    """A corpus-wide vector index that is loaded once and updated one source file at a time.
+
+    Adding or changing a file embeds and inserts only that file's documents, then
+    deletes the nodes of its previous version; unchanged files are skipped by content
+    hash, and copies of one file under several paths share a single set of nodes. The
+    index is written back to ``persist_dir`` by ``persist``.
+    """
+
+    def __init__(self, persist_dir: str):
+        self.persist_dir = persist_dir
+        self._index: Optional[GPTVectorStoreIndex] = None
+        self._sources: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    @property
+    def index(self) -> GPTVectorStoreIndex:
+        """The LlamaIndex index, loaded from ``persist_dir`` on first use or created empty."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._index
+
+    def _ensure_loaded(self):
+        if self._index is not None:
+            return
+        sources_path = os.path.join(self.persist_dir, SOURCES_FILE)
+        if os.path.exists(sources_path):
+            storage_context = StorageContext.from_defaults(persist_dir=self.persist_dir)
+            self._index = load_index_from_storage(storage_context)
+            with open(sources_path, 'r') as f:
+                self._sources = json.load(f)
+            logger.info(f"Loaded document index with {len(self._sources)} sources from {self.persist_dir}")
+        else:
+            self._index = GPTVectorStoreIndex.from_documents([])
+            self._sources = {}
+
+    def is_current(self, file_path: str, file_hash: str) -> bool:
+        """Whether the index already holds this version of the file."""
+        with self._lock:
+            self._ensure_loaded()
+            source = self._sources.get(os.path.abspath(file_path))
+            return source is not None and source["file_hash"] == file_hash
+
+    def sources(self) -> List[str]:
+        """The indexed source files, as absolute paths."""
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._sources)
+
+    def upsert(self, file_path: str, file_hash: str, documents: List[Document]) -> bool:
+        """Insert a file's documents, replacing those of any earlier version of the file.
+
+        Args:
+            file_path (str): The path of the source file.
+            file_hash (str): The SHA-256 hash of the file content.
+            documents (List[Document]): The file's documents, e.g. from ``segments_to_documents``.
+
+        Returns:
+            bool: False if this version was already indexed and nothing changed.
+        """
+        key = os.path.abspath(file_path)
+        with self._lock:
+            self._ensure_loaded()
+            previous = self._sources.pop(key, None)
+            if previous is not None and previous["file_hash"] == file_hash:
+                self._sources[key] = previous
+                return False
+            shared = next((source for source in self._sources.values() if source["file_hash"] == file_hash), None)
+            if shared is None:
+                for document in documents:
+                    self._index.insert(document)
+            doc_ids = shared["doc_ids"] if shared else [document.doc_id for document in documents]
+            self._sources[key] = {"file_hash": file_hash, "doc_ids": doc_ids}
+            # The old version goes only after the new one is in, so queries always find one of them
+            if previous is not None:
+                self._release(previous)
+            self._dirty = True
+        logger.info(f"Indexed {len(documents)} documents from {os.path.basename(file_path)}")
+        return True
+
+    def remove(self, file_path: str) -> bool:
+        """Delete a file's documents from the index.
+
+        Returns:
+            bool: False if the file was not indexed.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            source = self._sources.pop(os.path.abspath(file_path), None)
+            if source is None:
+                return False
+            self._release(source)
+            self._dirty = True
+        return True
+
+    def _release(self, source: Dict[str, Any]):
+        # Delete the version's nodes unless another path still holds the same content
+        if any(other["file_hash"] == source["file_hash"] for other in self._sources.values()):
+            return
+        for doc_id in source["doc_ids"]:
+            self._index.delete_ref_doc(doc_id, delete_from_docstore=True)
+
+    def persist(self):
+        """Write the index to ``persist_dir`` if it changed since it was loaded or last written."""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(self.persist_dir, exist_ok=True)
+            self.index.storage_context.persist(persist_dir=self.persist_dir)
+            # The sources file goes last: it marks a complete, loadable index
+            tmp_path = os.path.join(self.persist_dir, SOURCES_FILE + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(self._sources, f)
+            os.replace(tmp_path, os.path.join(self.persist_dir, SOURCES_FILE))
+            self._dirty = False
+
+
+_document_index: Optional[DocumentIndex] = None
+_document_index_lock = threading.Lock()
+
+
+def get_document_index() -> DocumentIndex:
+    """Return the process-wide document index stored in ``file_paths.index_storage_dir``."""
+    global _document_index
+    with _document_index_lock:
+        if _document_index is None:
+            _document_index = DocumentIndex(config.file_paths.get('index_storage_dir', 'data/index'))
+        return _document_index
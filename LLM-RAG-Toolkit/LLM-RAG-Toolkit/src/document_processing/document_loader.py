@@ -1,9 +1,10 @@
 import os
 import logging
-from typing import Dict, Any
-import fitz  # PyMuPDF for PDF handling
+from typing import Dict, Any, Iterator
 from utils.config_manager import config
 from llama_index import Document  # Import LlamaIndex Document
+from .parsed_document import get_parsed_document, iter_page_contents
+from .text_stream import DEFAULT_CHUNK_BYTES, DEFAULT_MMAP_THRESHOLD, iter_text_file
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +32,13 @@ class DocumentLoader:
             '.txt': self.load_text,
             # Add more file types as needed
         }
+        self.chunk_iterators = {
+            '.pdf': self.iter_pdf_chunks,
+            '.txt': self.iter_text_chunks,
+        }
+        settings = config.document_loading or {}
+        self.chunk_bytes = settings.get('chunk_kilobytes', DEFAULT_CHUNK_BYTES // 1024) * 1024
+        self.mmap_threshold = settings.get('mmap_threshold_megabytes', DEFAULT_MMAP_THRESHOLD >> 20) << 20
 
     def load_document(self, file_path: str) -> Document:
         file_path = os.path.abspath(file_path)
@@ -55,11 +63,7 @@ class DocumentLoader:
 
     def load_pdf(self, file_path: str) -> str:
         try:
-            with fitz.open(file_path) as doc:
-                text = ""
-                for page in doc:
-                    text += page.get_text()
-                return text
+            return get_parsed_document(file_path).text
         except Exception as e:
             logger.error(f"Error loading PDF {file_path}: {e}", exc_info=True)
             return ""
@@ -71,3 +75,34 @@ class DocumentLoader:
         except Exception as e:
             logger.error(f"Error loading text file {file_path}: {e}", exc_info=True)
             return ""
+
+    def iter_chunks(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        """Stream a document as chunks of text without loading it whole.
+
+        PDFs yield one chunk per page and text files one chunk of whole paragraphs per
+        ``document_loading.chunk_kilobytes``, so a consumer such as
+        ``content_segmenter.iter_semantic_segments`` keeps memory flat on large files.
+
+        Args:
+            file_path (str): The path to the document.
+
+        Yields:
+            Dict[str, Any]: "text", plus "page" (zero-based) and "images" (the page's
+            ``ParsedDocument.images`` entries) for PDFs, or "offset" (in bytes) for text files.
+
+        Raises:
+            ValueError: If the file type is unsupported.
+        """
+        _, file_extension = os.path.splitext(file_path)
+        file_extension = file_extension.lower()
+        if file_extension not in self.chunk_iterators:
+            raise ValueError(f"Unsupported file type: {file_extension}")
+        return self.chunk_iterators[file_extension](os.path.abspath(file_path))
+
+    def iter_pdf_chunks(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        for page_num, text, images in iter_page_contents(file_path):
+            yield {"text": text, "page": page_num, "images": images}
+
+    def iter_text_chunks(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        for offset, text in iter_text_file(file_path, self.chunk_bytes, self.mmap_threshold):
+            yield {"text": text, "offset": offset}
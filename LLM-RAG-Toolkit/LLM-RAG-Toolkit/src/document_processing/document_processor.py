@@ -1,40 +1,42 @@
 import os
+import time
 import logging
 import json
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, List, Dict, Any, Optional, Sequence, Tuple
 from PIL import Image
-import pytesseract
-import spacy
 from nltk.tokenize import sent_tokenize
-import fitz  # Add this import
 from .content_segmenter import (
-    segment_pdf,
-    post_process_segments,
-    get_token_count,
+    get_processed_segments,
     extract_toc_from_pdf,
     extract_text_with_headings,
     extract_images
 )
+from .document_index import get_document_index, segments_to_documents
+from .ocr import OcrUnavailableError, get_ocr_stage
+from .parsed_document import compute_file_hash, get_parsed_document, set_parse_workers
+from .semantic_analyzer import get_semantic_analyzer
+from .sentence_packer import pack_sentences
+from .token_counter import get_token_counter
 from utils.config_manager import config
+from utils.resources import ensure_nltk_data
 from llama_index import GPTVectorStoreIndex  # Import LlamaIndex components
 
 logger = logging.getLogger(__name__)
 
-# Initialize spaCy model for semantic analysis
-try:
-    nlp = spacy.load('en_core_web_sm')
-except OSError:
-    # Download the model if not present
-    from spacy.cli import download
-    download('en_core_web_sm')
-    nlp = spacy.load('en_core_web_sm')
-
 
 class DocumentProcessor:
     """A class for processing documents (PDFs and images) and extracting relevant information."""
 
-    def __init__(self):
+    def __init__(self, index_documents: bool = True):
+        """Create the processor.
+
+        Args:
+            index_documents (bool): Whether processed PDFs are added to the persistent
+                document index.
+        """
         self.supported_types = {'.pdf', '.png', '.jpg', '.jpeg', '.tiff'}
+        self.index_documents = index_documents
 
     def process_document(self, file_path: str) -> Dict[str, Any]:
         """Process a document and extract information.
@@ -53,6 +55,92 @@ class DocumentProcessor:
         else:
             raise ValueError(f"Unsupported document type: {document_type}")
 
+    def process_batch(self, paths: Sequence[str], workers: Optional[int] = None,
+                      progress_callback: Optional[Callable[[int, int, Dict[str, Any]], None]] = None
+                      ) -> List[Dict[str, Any]]:
+        """Process several documents in parallel, one document per worker process.
+
+        The largest files are scheduled first, so the batch finishes close to the time
+        of its slowest file instead of waiting on a large file started last. Each
+        worker parses its PDF serially. Workers leave the document index alone; this
+        process adds every processed PDF to it once the batch is done, with a single
+        write to disk.
+
+        Args:
+            paths (Sequence[str]): The documents to process.
+            workers (Optional[int]): The number of worker processes. Defaults to
+                ``document_processing.batch_workers``, else the CPU count; 1 processes the
+                documents one after another in this process.
+            progress_callback (Optional[Callable[[int, int, Dict[str, Any]], None]]): Called
+                with the number of finished documents, the total and the latest result.
+
+        Returns:
+            List[Dict[str, Any]]: One result per path, in input order, each with its
+                ``processing_time`` in seconds.
+        """
+        settings = config.document_processing or {}
+        workers = workers or settings.get('batch_workers') or os.cpu_count() or 1
+        workers = min(workers, len(paths))
+        results: List[Optional[Dict[str, Any]]] = [None] * len(paths)
+        # Largest first: a big file started last would otherwise set the batch time on its own
+        order = sorted(range(len(paths)), key=lambda i: _file_size(paths[i]), reverse=True)
+        start_time = time.perf_counter()
+
+        def finish(i: int, result: Dict[str, Any]):
+            results[i] = result
+            done = sum(result is not None for result in results)
+            logger.info(f"Processed {os.path.basename(paths[i])} in {result['processing_time']:.2f}s ({done}/{len(paths)})")
+            if progress_callback:
+                progress_callback(done, len(paths), result)
+
+        if workers <= 1:
+            processor = DocumentProcessor(index_documents=False)
+            for i in order:
+                finish(i, _timed_process(processor, paths[i]))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=set_parse_workers, initargs=(1,)) as executor:
+                futures = {executor.submit(_process_in_worker, paths[i]): i for i in order}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Error processing {os.path.basename(paths[i])} in worker: {e}", exc_info=True)
+                        result = {"file_path": paths[i], "error": str(e), "processing_time": 0.0}
+                    finish(i, result)
+
+        if self.index_documents:
+            self.index_processed(results)
+
+        logger.info(f"Processed {len(paths)} documents in {time.perf_counter() - start_time:.2f}s with {workers} workers")
+        return results
+
+    def index_processed(self, results: List[Dict[str, Any]]) -> GPTVectorStoreIndex:
+        """Add processed PDFs to the persistent document index and write it to disk once.
+
+        Only files whose content changed since they were last indexed are embedded; the
+        nodes of their previous version are replaced. Each PDF result gets the index
+        under ``index``.
+
+        Args:
+            results (List[Dict[str, Any]]): Processing results; only successful PDFs are indexed.
+
+        Returns:
+            GPTVectorStoreIndex: The corpus-wide index.
+        """
+        document_index = get_document_index()
+        for result in results:
+            if "segments" not in result or not result["file_path"].lower().endswith('.pdf'):
+                continue
+            file_path = result["file_path"]
+            file_hash = compute_file_hash(file_path)
+            if not document_index.is_current(file_path, file_hash):
+                document_index.upsert(file_path, file_hash,
+                                      segments_to_documents(result["segments"], file_path, file_hash))
+            result["index"] = document_index.index
+        document_index.persist()
+        return document_index.index
+
     def detect_document_type(self, file_path: str) -> str:
         """Detect the type of the document based on the file extension.
 
@@ -82,8 +170,7 @@ class DocumentProcessor:
         try:
             metadata = self.extract_metadata(file_path)
             toc_data = extract_toc_from_pdf(file_path)
-            raw_segments = segment_pdf(file_path, toc_data)
-            processed_segments = post_process_segments(raw_segments)
+            processed_segments = get_processed_segments(file_path, toc_data)
             semantic_data = self.perform_semantic_analysis(processed_segments)
 
             result = {
@@ -94,12 +181,8 @@ class DocumentProcessor:
                 "semantic_data": semantic_data
             }
 
-            # Build LlamaIndex
-            index = GPTVectorStoreIndex.from_documents([result["document"]])
-            result["index"] = index
-
-            # Save index (optional)
-            index.storage_context.persist(persist_dir=config.file_paths['index_storage_dir'])
+            if self.index_documents:
+                self.index_processed([result])
 
             self.log_processing_results(result, "PDF")
 
@@ -121,19 +204,20 @@ class DocumentProcessor:
             Dict[str, Any]: The processed image data.
         """
         try:
-            image = Image.open(file_path)
-            metadata = {
-                "type": "image",
-                "format": image.format,
-                "mode": image.mode,
-                "size": image.size
-            }
-
-            # Attempt OCR using Tesseract
+            # Opening reads only the header; the pixels are decoded by OCR, if at all
+            with Image.open(file_path) as image:
+                metadata = {
+                    "type": "image",
+                    "format": image.format,
+                    "mode": image.mode,
+                    "size": image.size
+                }
+
+            # Attempt OCR; text is cached by image content, so re-processing is free
             try:
-                text = pytesseract.image_to_string(image)
+                text = get_ocr_stage().recognize_file(file_path)
                 segments = self.segment_image_text(text)
-            except pytesseract.pytesseract.TesseractNotFoundError:
+            except OcrUnavailableError:
                 logger.warning("Tesseract OCR not found. Unable to extract text from image.")
                 segments = [{
                     "title": "Image Content",
@@ -171,42 +255,17 @@ class DocumentProcessor:
         Returns:
             List[Dict[str, Any]]: A list of text segments.
         """
+        ensure_nltk_data('punkt')
         sentences = sent_tokenize(text)
+        sentence_counts = get_token_counter('cl100k_base').count_batch(sentences)
         segments = []
         max_tokens = config.document_processing['max_segment_tokens']
         overlap = config.document_processing.get('overlap_sentences', 2)
-        current_segment = []
-        current_tokens = 0
-        segment_index = 1
-        i = 0
-
-        while i < len(sentences):
-            sentence = sentences[i]
-            sentence_tokens = get_token_count(sentence)
-            if current_tokens + sentence_tokens > max_tokens and current_segment:
-                segment_content = " ".join(current_segment)
-                tokens = get_token_count(segment_content)
-                segments.append({
-                    "title": f"Segment {segment_index}",
-                    "content": segment_content,
-                    "tokens": tokens,
-                    "level": 1,
-                    "path": [f"Segment {segment_index}"]
-                })
-                segment_index += 1
-                current_segment = current_segment[-overlap:]  # Keep last 'overlap' sentences
-                current_tokens = get_token_count(" ".join(current_segment))
-            else:
-                current_segment.append(sentence)
-                current_tokens += sentence_tokens
-                i += 1
-
-        if current_segment:
-            segment_content = " ".join(current_segment)
-            tokens = get_token_count(segment_content)
+
+        for segment_index, (start, end, tokens) in enumerate(pack_sentences(sentence_counts, max_tokens, overlap), 1):
             segments.append({
                 "title": f"Segment {segment_index}",
-                "content": segment_content,
+                "content": " ".join(sentences[start:end]),
                 "tokens": tokens,
                 "level": 1,
                 "path": [f"Segment {segment_index}"]
@@ -217,18 +276,25 @@ class DocumentProcessor:
     def perform_semantic_analysis(self, segments: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Perform semantic analysis on the segments.
 
+        Key entities and the summary come from a single spaCy pass over the segments.
+
         Args:
             segments (List[Dict[str, Any]]): A list of content segments.
 
         Returns:
             Dict[str, Any]: Semantic analysis results.
         """
+        key_entities, summary = self._analyze_segments(segments)
         return {
             "main_topics": self.extract_main_topics(segments),
-            "key_entities": self.extract_key_entities(segments),
-            "summary": self.generate_summary(segments)
+            "key_entities": key_entities,
+            "summary": summary
         }
 
+    def _analyze_segments(self, segments: List[Dict[str, Any]]):
+        texts = [segment['content'] for segment in segments if segment.get('content')]
+        return get_semantic_analyzer().analyze(texts)
+
     def extract_main_topics(self, segments: List[Dict[str, Any]]) -> List[str]:
         """Extract main topics from the segments.
 
@@ -259,19 +325,7 @@ class DocumentProcessor:
         Returns:
             List[str]: A list of key entities.
         """
-        text = " ".join([segment['content'] for segment in segments])
-        doc = nlp(text)
-        entities = [ent.text for ent in doc.ents]
-        # Remove duplicates while preserving order
-        seen = set()
-        key_entities = []
-        for entity in entities:
-            if entity not in seen:
-                seen.add(entity)
-                key_entities.append(entity)
-            if len(key_entities) >= 10:
-                break
-        return key_entities
+        return self._analyze_segments(segments)[0]
 
     def generate_summary(self, segments: List[Dict[str, Any]]) -> str:
         """Generate a summary of the document.
@@ -282,13 +336,7 @@ class DocumentProcessor:
         Returns:
             str: A summary string.
         """
-        text = " ".join([segment['content'] for segment in segments])
-        doc = nlp(text)
-        # Simple summarization by selecting key sentences
-        sentences = [sent.text for sent in doc.sents]
-        # Use spaCy's sentence ranking (if available) or select the first few sentences
-        summary_sentences = sentences[:5]
-        return " ".join(summary_sentences)
+        return self._analyze_segments(segments)[1]
 
     def extract_metadata(self, file_path: str) -> Dict[str, Any]:
         """Extract metadata from a PDF document.
@@ -301,8 +349,7 @@ class DocumentProcessor:
         """
         metadata = {}
         try:
-            with fitz.open(file_path) as doc:
-                metadata = doc.metadata
+            metadata = dict(get_parsed_document(file_path).metadata)
         except Exception as e:
             logger.error(f"Error extracting metadata from PDF {os.path.basename(file_path)}: {e}", exc_info=True)
         return metadata
@@ -341,3 +388,26 @@ class DocumentProcessor:
         """Query the document index using LlamaIndex."""
         response = index.as_query_engine().query(query_str)
         return str(response)
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _timed_process(processor: DocumentProcessor, file_path: str) -> Dict[str, Any]:
+    start_time = time.perf_counter()
+    try:
+        result = processor.process_document(file_path)
+    except Exception as e:
+        logger.error(f"Error processing {os.path.basename(file_path)}: {e}", exc_info=True)
+        result = {"file_path": file_path, "error": str(e)}
+    result["processing_time"] = time.perf_counter() - start_time
+    return result
+
+
+def _process_in_worker(file_path: str) -> Dict[str, Any]:
+    """Process one document in a batch worker process."""
+    return _timed_process(DocumentProcessor(index_documents=False), file_path)
@@ -0,0 +1,86 @@
+import os
+import hashlib
+import logging
+import tempfile
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ImageStore:
+    """An on-disk, content-addressed store for image bytes.
+
+    Images are written once per distinct content, under their SHA-256 digest, so an
+    image repeated across pages or documents occupies a single file.
+    """
+
+    def __init__(self, root_dir: str):
+        """Create the store.
+
+        Args:
+            root_dir (str): The directory the images are written under.
+        """
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+
+    def path(self, digest: str, ext: str = "") -> str:
+        """Return the file path for a digest.
+
+        Args:
+            digest (str): The SHA-256 hex digest of the image content.
+            ext (str): The image file extension, without the dot.
+
+        Returns:
+            str: The path the image is (or would be) stored at.
+        """
+        file_name = f"{digest}.{ext}" if ext else digest
+        return os.path.join(self.root_dir, digest[:2], file_name)
+
+    def put(self, data: bytes, ext: str = "") -> str:
+        """Store image bytes unless identical content is already present.
+
+        Args:
+            data (bytes): The image content.
+            ext (str): The image file extension, without the dot.
+
+        Returns:
+            str: The SHA-256 hex digest addressing the content.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest, ext)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so a concurrent reader never sees a partial image
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            logger.debug(f"Stored image {digest} ({len(data)} bytes)")
+        return digest
+
+    def get(self, digest: str, ext: str = "") -> Optional[bytes]:
+        """Read image bytes back from the store.
+
+        Args:
+            digest (str): The SHA-256 hex digest of the image content.
+            ext (str): The image file extension, without the dot.
+
+        Returns:
+            Optional[bytes]: The image content, or None if it is not stored.
+        """
+        path = self.path(digest, ext)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def __contains__(self, digest: str) -> bool:
+        directory = os.path.join(self.root_dir, digest[:2])
+        return os.path.isdir(directory) and any(
+            name.split('.', 1)[0] == digest for name in os.listdir(directory)
+        )
@@ -1,18 +1,23 @@
-import fitz
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 from utils.config_manager import config
+from utils.resources import get_openai_client
 from openai import OpenAI
 import json
-from llama_index import Document  # Import LlamaIndex Document
+from .document_analysis import SAMPLE_PAGES, analyze_content, make_sample, semantic_fields
+from .parsed_document import get_parsed_document, iter_page_contents, read_document_info
+from .token_counter import TokenCounter, get_token_counter
 
 logger = logging.getLogger(__name__)
 
+# Pages whose tokens MetadataCollector counts in one count_batch call
+TOKEN_BATCH_PAGES = 64
+
 def load_openai_client() -> OpenAI:
     """Initialize and return an OpenAI client."""
     try:
-        return OpenAI(api_key=config.OPENAI_API_KEY)
+        return get_openai_client()
     except Exception as e:
         logger.error(f"Failed to initialize OpenAI client: {e}", exc_info=True)
         raise
@@ -20,17 +25,18 @@ def load_openai_client() -> OpenAI:
 def extract_basic_metadata(pdf_path: str) -> Dict[str, Any]:
     """Extract basic metadata from the PDF file."""
     try:
-        with fitz.open(pdf_path) as doc:
-            metadata = {
-                "title": doc.metadata.get("title", "Unknown"),
-                "author": doc.metadata.get("author", "Unknown"),
-                "subject": doc.metadata.get("subject", ""),
-                "keywords": doc.metadata.get("keywords", ""),
-                "creation_date": doc.metadata.get("creationDate", ""),
-                "modification_date": doc.metadata.get("modDate", ""),
-                "page_count": len(doc),
-                "file_size": doc.filesize,
-            }
+        info = read_document_info(pdf_path)
+        document_metadata = info["metadata"]
+        metadata = {
+            "title": document_metadata.get("title", "Unknown"),
+            "author": document_metadata.get("author", "Unknown"),
+            "subject": document_metadata.get("subject", ""),
+            "keywords": document_metadata.get("keywords", ""),
+            "creation_date": document_metadata.get("creationDate", ""),
+            "modification_date": document_metadata.get("modDate", ""),
+            "page_count": info["page_count"],
+            "file_size": info["file_size"],
+        }
         return metadata
     except Exception as e:
         logger.error(f"Error extracting basic metadata from {pdf_path}: {e}", exc_info=True)
@@ -39,108 +45,180 @@ def extract_basic_metadata(pdf_path: str) -> Dict[str, Any]:
 def extract_text_statistics(pdf_path: str) -> Dict[str, Any]:
     """Extract text statistics from the PDF file."""
     try:
-        with fitz.open(pdf_path) as doc:
-            text = ""
-            for page in doc:
-                text += page.get_text()
-            
-            word_count = len(text.split())
-            char_count = len(text)
-            
-            return {
-                "word_count": word_count,
-                "character_count": char_count,
-                "average_word_length": char_count / word_count if word_count > 0 else 0
-            }
+        text = get_parsed_document(pdf_path).text
+
+        word_count = len(text.split())
+        char_count = len(text)
+
+        return {
+            "word_count": word_count,
+            "character_count": char_count,
+            "average_word_length": char_count / word_count if word_count > 0 else 0
+        }
     except Exception as e:
         logger.error(f"Error extracting text statistics from {pdf_path}: {e}", exc_info=True)
         return {}
 
+def describe_image(image: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a ``ParsedDocument.images`` entry into its metadata record, numbered from 1."""
+    return {
+        "page_number": image["page"] + 1,
+        "image_index": image["index"] + 1,
+        "width": image["width"],
+        "height": image["height"],
+        "color_space": image["colorspace"],
+        "bits_per_component": image["bpc"],
+        "image_format": image["type"],
+    }
+
 def extract_image_info(pdf_path: str) -> List[Dict[str, Any]]:
     """Extract information about images in the PDF."""
     try:
-        image_info = []
-        with fitz.open(pdf_path) as doc:
-            for page_num, page in enumerate(doc):
-                for img_index, img in enumerate(page.get_images(full=True)):
-                    xref = img[0]
-                    base_image = doc.extract_image(xref)
-                    image_info.append({
-                        "page_number": page_num + 1,
-                        "image_index": img_index + 1,
-                        "width": base_image["width"],
-                        "height": base_image["height"],
-                        "color_space": base_image["colorspace"],
-                        "bits_per_component": base_image["bpc"],
-                        "image_format": base_image["ext"],
-                    })
-        return image_info
+        return [describe_image(image) for image in get_parsed_document(pdf_path).images]
     except Exception as e:
         logger.error(f"Error extracting image info from {pdf_path}: {e}", exc_info=True)
         return []
 
-def extract_semantic_metadata(client: OpenAI, text: str) -> Dict[str, Any]:
-    """Extract semantic metadata using LLM."""
-    prompt = (
-        "Analyze the following text and extract key semantic metadata. "
-        "Provide a brief summary, main topics, and any notable entities mentioned. "
-        "Format the result as a JSON object with the following structure:\n"
-        "{\n"
-        "  'summary': 'Brief summary of the content',\n"
-        "  'main_topics': ['list', 'of', 'main', 'topics'],\n"
-        "  'entities': ['list', 'of', 'notable', 'entities'],\n"
-        "  'document_type': 'Inferred document type (e.g., research paper, manual, report)'\n"
-        "}\n\n"
-        f"Text to analyze:\n\n{text[:4000]}"  # Limit text to avoid token limits
-    )
+def extract_semantic_metadata(client: OpenAI, text: str, images: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Extract semantic metadata using LLM.
 
+    This is the summary, topics and entities part of the document analysis shared
+    with ``structure_analyzer.extract_structure_llm``; given the same sample, the
+    two make a single request between them.
+
+    Args:
+        client (OpenAI): The OpenAI client.
+        text (str): The document text; only its opening is sent.
+        images (Optional[List[Dict[str, Any]]]): Descriptions of the images on those pages.
+
+    Returns:
+        Dict[str, Any]: The summary, main_topics, entities and document_type, or an
+        empty dict on failure.
+    """
     try:
-        response = client.chat.completions.create(
-            model=config.models['generation_model'],
-            messages=[
-                {"role": "system", "content": "You are an expert in document analysis and metadata extraction."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2,
-            max_tokens=500
-        )
-        semantic_metadata = response.choices[0].message.content
-        return json.loads(semantic_metadata)
+        analysis = analyze_content(client, make_sample(text, images or []))
+        return semantic_fields(analysis) if analysis else {}
     except Exception as e:
         logger.error(f"Error extracting semantic metadata: {e}", exc_info=True)
         return {}
 
-def extract_metadata(pdf_path: str) -> Document:
-    """Extract all metadata and create a LlamaIndex Document."""
+class MetadataCollector:
+    """Accumulates a document's statistics, image records and LLM sample one page at a time.
+
+    Feeding every page once through ``add_page`` yields the same text statistics and
+    image info as ``extract_text_statistics`` and ``extract_image_info``, plus token
+    counts and per-page figures, without ever joining the whole text. Page texts wait
+    until ``TOKEN_BATCH_PAGES`` of them can be counted in one ``count_batch`` call.
+    """
+
+    def __init__(self, token_counter: Optional[TokenCounter] = None, token_batch_pages: int = TOKEN_BATCH_PAGES):
+        self.token_counter = token_counter or get_token_counter()
+        self.token_batch_pages = token_batch_pages
+        self.word_count = 0
+        self.character_count = 0
+        self.token_count = 0
+        self.image_info: List[Dict[str, Any]] = []
+        self._page_stats: List[Dict[str, Any]] = []
+        # Stats entries and texts of pages whose tokens are not counted yet
+        self._uncounted: List[Tuple[Dict[str, Any], str]] = []
+        self._sample_text: List[str] = []
+        self._sample_images: List[Dict[str, Any]] = []
+
+    def add_page(self, page_num: int, text: str, images: List[Dict[str, Any]]):
+        """Add one page's text and its ``ParsedDocument.images`` entries."""
+        words, characters = len(text.split()), len(text)
+        self.word_count += words
+        self.character_count += characters
+        stats = {
+            "page_number": page_num + 1,
+            "word_count": words,
+            "character_count": characters,
+            "token_count": 0,
+            "image_count": len(images)
+        }
+        self._page_stats.append(stats)
+        self._uncounted.append((stats, text))
+        if len(self._uncounted) >= self.token_batch_pages:
+            self._count_tokens()
+        self.image_info.extend(describe_image(image) for image in images)
+        if page_num < SAMPLE_PAGES:
+            self._sample_text.append(text + "\n")
+            self._sample_images.extend(
+                {"page": image["page"], "type": image["type"], "size": image["size"]} for image in images
+            )
+
+    def _count_tokens(self):
+        if not self._uncounted:
+            return
+        counts = self.token_counter.count_batch(text for _stats, text in self._uncounted)
+        for (stats, _text), tokens in zip(self._uncounted, counts):
+            stats["token_count"] = tokens
+            self.token_count += tokens
+        self._uncounted = []
+
+    @property
+    def page_stats(self) -> List[Dict[str, Any]]:
+        """The word, character, token and image counts of each page added so far."""
+        self._count_tokens()
+        return self._page_stats
+
+    def text_statistics(self) -> Dict[str, Any]:
+        """The document-wide counts, with the same keys as ``extract_text_statistics`` plus token_count."""
+        self._count_tokens()
+        return {
+            "word_count": self.word_count,
+            "character_count": self.character_count,
+            "average_word_length": self.character_count / self.word_count if self.word_count > 0 else 0,
+            "token_count": self.token_count
+        }
+
+    def sample(self) -> Tuple[str, List[Dict[str, Any]]]:
+        """The opening pages' text and images, as ``read_document_sample`` returns them."""
+        return "".join(self._sample_text), self._sample_images
+
+def collect_metadata(pdf_path: str) -> Tuple[Dict[str, Any], MetadataCollector]:
+    """Walk a PDF's pages once, collecting its basic metadata and page-by-page statistics.
+
+    Pages are streamed with ``iter_page_contents``, so a document that is not already
+    in the parse cache is read one page at a time and not cached.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+
+    Returns:
+        Tuple[Dict[str, Any], MetadataCollector]: The basic metadata and the filled collector.
+    """
+    collector = MetadataCollector()
+    for page_num, page_text, images in iter_page_contents(pdf_path):
+        collector.add_page(page_num, page_text, images)
+    return extract_basic_metadata(pdf_path), collector
+
+def extract_metadata(pdf_path: str) -> Dict[str, Any]:
+    """Extract all metadata of a PDF.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+
+    Returns:
+        Dict[str, Any]: The basic metadata, text statistics, per-page statistics, image
+        info, semantic metadata and extraction date, or an empty dict on failure.
+    """
     try:
-        basic_metadata = extract_basic_metadata(pdf_path)
-        text_stats = extract_text_statistics(pdf_path)
-        image_info = extract_image_info(pdf_path)
-        
-        # Extract text for semantic analysis
-        with fitz.open(pdf_path) as doc:
-            text = ""
-            for page in doc:
-                text += page.get_text()
-        
+        basic_metadata, collector = collect_metadata(pdf_path)
+
+        # The opening pages the structure analysis also sees, so both share one LLM request
+        text, images = collector.sample()
         client = load_openai_client()
-        semantic_metadata = extract_semantic_metadata(client, text)
-        
-        metadata = {
+        semantic_metadata = extract_semantic_metadata(client, text, images)
+
+        return {
             **basic_metadata,
-            **text_stats,
-            "image_info": image_info,
+            **collector.text_statistics(),
+            "page_stats": collector.page_stats,
+            "image_info": collector.image_info,
             **semantic_metadata,
             "extraction_date": datetime.now().isoformat()
         }
-        
-        # Create Document with metadata
-        document = Document(
-            text="",  # Metadata does not have textual content
-            doc_id=pdf_path,
-            extra_info=metadata
-        )
-        return document
     except Exception as e:
         logger.error(f"Error extracting metadata from {pdf_path}: {e}", exc_info=True)
         return {}
@@ -0,0 +1,257 @@
+import os
+import io
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Scans are downscaled to this resolution before OCR; Tesseract gains nothing above it
+DEFAULT_TARGET_DPI = 300
+
+# Images larger than this are split into horizontal strips recognized in parallel
+DEFAULT_TILE_PIXELS = 12_000_000
+
+# Assumed resolution of images that carry no DPI information
+DEFAULT_SOURCE_DPI = 300
+
+
+class OcrUnavailableError(RuntimeError):
+    """Raised when the OCR engine cannot run, e.g. because its binary is not installed."""
+
+
+class OcrEngine:
+    """Turns an image into text. Subclasses implement ``recognize``.
+
+    ``cache_id`` names the engine and every setting that changes its output, so
+    cached text from a differently configured engine is never reused.
+    """
+
+    cache_id = "engine"
+
+    def recognize(self, image: Image.Image) -> str:
+        raise NotImplementedError
+
+
+class TesseractEngine(OcrEngine):
+    """OCR with the Tesseract binary through pytesseract."""
+
+    def __init__(self, lang: str = "eng", tesseract_config: str = ""):
+        self.lang = lang
+        self.tesseract_config = tesseract_config
+        self.cache_id = f"tesseract:{lang}:{tesseract_config}"
+
+    def recognize(self, image: Image.Image) -> str:
+        import pytesseract
+        try:
+            return pytesseract.image_to_string(image, lang=self.lang, config=self.tesseract_config)
+        except pytesseract.pytesseract.TesseractNotFoundError as e:
+            raise OcrUnavailableError("Tesseract OCR is not installed") from e
+
+
+_engine_factories: Dict[str, Callable[..., OcrEngine]] = {
+    "tesseract": TesseractEngine,
+}
+
+
+def register_ocr_engine(name: str, factory: Callable[..., OcrEngine]):
+    """Make an OCR engine available under a name for the ``ocr.engine`` setting.
+
+    Args:
+        name (str): The engine name.
+        factory (Callable[..., OcrEngine]): Called with the engine's keyword settings.
+    """
+    _engine_factories[name] = factory
+
+
+def create_ocr_engine(name: str, **settings) -> OcrEngine:
+    """Create a registered OCR engine.
+
+    Raises:
+        ValueError: If no engine is registered under the name.
+    """
+    if name not in _engine_factories:
+        raise ValueError(f"Unknown OCR engine: {name}")
+    return _engine_factories[name](**settings)
+
+
+class OcrCache:
+    """Recognized text on disk, one file per image content hash and engine configuration."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".txt")
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with open(self.path(key), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, text: str):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so a concurrent reader never sees partial text
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def prepare_image(image: Image.Image, target_dpi: int = DEFAULT_TARGET_DPI) -> Image.Image:
+    """Convert an image to grayscale and downscale it to at most target_dpi.
+
+    Args:
+        image (Image.Image): The scanned image.
+        target_dpi (int): The resolution OCR runs at.
+
+    Returns:
+        Image.Image: The image to recognize.
+    """
+    dpi = image.info.get("dpi", (DEFAULT_SOURCE_DPI, DEFAULT_SOURCE_DPI))[0] or DEFAULT_SOURCE_DPI
+    if image.mode != "L":
+        image = image.convert("L")
+    if dpi > target_dpi:
+        scale = target_dpi / dpi
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+    return image
+
+
+def strip_bounds(image: Image.Image, max_pixels: int = DEFAULT_TILE_PIXELS, search: float = 0.1) -> List[Tuple[int, int]]:
+    """Split an image into horizontal strips of at most about max_pixels pixels.
+
+    Each cut is placed on the lightest row near its nominal position, so cuts fall
+    between lines of text instead of through them and strips need no overlap.
+
+    Args:
+        image (Image.Image): A grayscale image.
+        max_pixels (int): The target strip size in pixels.
+        search (float): The fraction of a strip's height searched around each cut.
+
+    Returns:
+        List[Tuple[int, int]]: The (top, bottom) rows of each strip.
+    """
+    strip_count = -(-image.width * image.height // max_pixels)
+    if strip_count <= 1:
+        return [(0, image.height)]
+    # Mean brightness of each row; the brightest rows are the gaps between text lines
+    row_brightness = np.asarray(image, dtype=np.float32).mean(axis=1)
+    strip_height = image.height / strip_count
+    radius = max(1, int(strip_height * search))
+    cuts = [0]
+    for i in range(1, strip_count):
+        nominal = int(i * strip_height)
+        low, high = max(cuts[-1] + 1, nominal - radius), min(image.height - 1, nominal + radius)
+        cuts.append(low + int(np.argmax(row_brightness[low:high + 1])))
+    cuts.append(image.height)
+    return list(zip(cuts, cuts[1:]))
+
+
+class OcrStage:
+    """Recognizes images with a pluggable engine, caching text by image content hash.
+
+    Images are downscaled to ``target_dpi``; very large scans are split into strips
+    that are recognized in parallel. Tesseract runs as a separate process per call,
+    so a thread pool is enough to keep several cores busy.
+    """
+
+    def __init__(self, engine: OcrEngine, cache: Optional[OcrCache] = None, target_dpi: int = DEFAULT_TARGET_DPI,
+                 tile_pixels: int = DEFAULT_TILE_PIXELS, workers: Optional[int] = None):
+        self.engine = engine
+        self.cache = cache
+        self.target_dpi = target_dpi
+        self.tile_pixels = tile_pixels
+        self.workers = workers or os.cpu_count() or 1
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr")
+            return self._executor
+
+    def cache_key(self, content: bytes) -> str:
+        material = f"{self.engine.cache_id}|{self.target_dpi}|{self.tile_pixels}|".encode("utf-8")
+        return hashlib.sha256(material + content).hexdigest()
+
+    def recognize_file(self, file_path: str) -> str:
+        """Return the text of an image file, running OCR only if it is not cached.
+
+        Args:
+            file_path (str): The path to the image.
+
+        Returns:
+            str: The recognized text.
+
+        Raises:
+            OcrUnavailableError: If the engine cannot run.
+        """
+        with open(file_path, "rb") as f:
+            content = f.read()
+        key = self.cache_key(content)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.debug(f"OCR cache hit for {os.path.basename(file_path)}")
+                return cached
+
+        with Image.open(io.BytesIO(content)) as image:
+            text = self.recognize(image)
+        if self.cache is not None:
+            self.cache.put(key, text)
+        return text
+
+    def recognize_files(self, file_paths: Sequence[str]) -> List[str]:
+        """Recognize several image files concurrently, in input order."""
+        return list(self._pool().map(self.recognize_file, file_paths))
+
+    def recognize(self, image: Image.Image) -> str:
+        """Prepare an image and recognize it, strip by strip when it is very large."""
+        image = prepare_image(image, self.target_dpi)
+        bounds = strip_bounds(image, self.tile_pixels)
+        if len(bounds) == 1:
+            return self.engine.recognize(image)
+        strips = [image.crop((0, top, image.width, bottom)) for top, bottom in bounds]
+        logger.debug(f"OCR of a {image.width}x{image.height} image in {len(strips)} strips")
+        # Strips go straight to the engine: nesting them in the pool could deadlock it
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(strips))) as executor:
+            texts = list(executor.map(self.engine.recognize, strips))
+        return "\n".join(text.rstrip("\n") for text in texts)
+
+
+_ocr_stage: Optional[OcrStage] = None
+_ocr_stage_lock = threading.Lock()
+
+
+def get_ocr_stage() -> OcrStage:
+    """Return the shared OCR stage configured under ``ocr``."""
+    global _ocr_stage
+    with _ocr_stage_lock:
+        if _ocr_stage is None:
+            from utils.config_manager import config
+            settings = dict(config.ocr or {})
+            engine_settings = settings.get("engine_settings") or {}
+            _ocr_stage = OcrStage(
+                create_ocr_engine(settings.get("engine", "tesseract"), **engine_settings),
+                OcrCache(settings.get("cache_dir", "cache/ocr")),
+                target_dpi=settings.get("target_dpi", DEFAULT_TARGET_DPI),
+                tile_pixels=int(settings.get("tile_megapixels", DEFAULT_TILE_PIXELS / 1e6) * 1e6),
+                workers=settings.get("workers") or None
+            )
+        return _ocr_stage
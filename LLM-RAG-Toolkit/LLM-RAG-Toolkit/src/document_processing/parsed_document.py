@@ -0,0 +1,485 @@
+import os
+import sys
+import time
+import hashlib
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+import fitz  # PyMuPDF
+from .image_store import ImageStore
+from .span_table import SpanTable, SpanTableBuilder
+
+logger = logging.getLogger(__name__)
+
+# Number of parsed documents kept in memory; one handbook is shared by all consumers
+PARSE_CACHE_SIZE = 8
+
+# Documents with at least this many pages are parsed by a process pool, one page range per worker
+PARALLEL_PARSE_MIN_PAGES = 64
+
+# Extension of images stored with each PDF filter; the rest are extracted as PNG
+_FILTER_EXTENSIONS = {
+    "DCTDecode": "jpeg",
+    "JPXDecode": "jpx",
+    "JBIG2Decode": "jb2",
+}
+
+# Page ranges handed to each worker; more than one evens out pages of uneven cost
+SHARDS_PER_WORKER = 2
+
+_parse_cache: "OrderedDict[str, ParsedDocument]" = OrderedDict()
+_parse_cache_lock = threading.Lock()
+
+# Worker count used when from_file is not given one; None means the CPU count
+_default_parse_workers: Optional[int] = None
+
+
+def compute_file_hash(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """Compute the SHA-256 hash of a file's content.
+
+    Args:
+        file_path (str): The path to the file.
+        chunk_size (int): The number of bytes read per iteration.
+
+    Returns:
+        str: The hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParsedDocument:
+    """Everything the pipeline reads from a PDF, collected in a single pass over the file.
+
+    Attributes:
+        file_path (str): The path the document was parsed from.
+        file_hash (str): The SHA-256 hash of the file content.
+        file_size (int): The file size in bytes.
+        page_count (int): The number of pages.
+        metadata (Dict[str, Any]): The PDF metadata dictionary.
+        outline (List[list]): The embedded outline as returned by ``get_toc(simple=False)``.
+        pages (List[str]): The plain text of each page.
+        spans (SpanTable): Non-empty text spans with font information, stored by column.
+        images (List[Dict[str, Any]]): One entry per image occurrence, in page order. Only
+            image metadata is read; use ``image_content`` or ``save_images`` for the bytes.
+    """
+
+    def __init__(self, file_path: str, file_hash: str):
+        self.file_path = file_path
+        self.file_hash = file_hash
+        self.file_size = 0
+        self.page_count = 0
+        self.metadata: Dict[str, Any] = {}
+        self.outline: List[list] = []
+        self.pages: List[str] = []
+        self.spans = SpanTable.empty()
+        self.images: List[Dict[str, Any]] = []
+        self._image_info: Dict[int, Dict[str, Any]] = {}
+
+    @property
+    def text(self) -> str:
+        """The full document text, pages joined in order."""
+        return "".join(self.pages)
+
+    @property
+    def fonts(self) -> Dict[str, int]:
+        """The number of spans set in each font."""
+        return self.spans.font_counts()
+
+    @classmethod
+    def from_file(cls, pdf_path: str, file_hash: Optional[str] = None,
+                  workers: Optional[int] = None) -> "ParsedDocument":
+        """Parse a PDF, walking every page exactly once.
+
+        Long documents are split into contiguous page ranges that are parsed in a process
+        pool, each worker opening its own handle on the file; the results are merged back
+        in page order, so the parsed document is the same as a serial parse. Workers are
+        spawned rather than forked, since forking a multithreaded process can deadlock.
+        Off the main thread (thread pools, the directory watcher, Streamlit) the document
+        is parsed serially, so concurrent callers do not each start a pool.
+
+        Args:
+            pdf_path (str): The path to the PDF file.
+            file_hash (Optional[str]): The precomputed content hash, if known.
+            workers (Optional[int]): The number of worker processes. Defaults to the value
+                set with ``set_parse_workers``, else the CPU count; 1 parses serially in
+                the calling process.
+
+        Returns:
+            ParsedDocument: The parsed document.
+        """
+        parsed = cls(pdf_path, file_hash or compute_file_hash(pdf_path))
+        parsed.file_size = os.path.getsize(pdf_path)
+        workers = workers or _default_parse_workers or os.cpu_count() or 1
+        with fitz.open(pdf_path) as doc:
+            parsed.page_count = len(doc)
+            parsed.metadata = dict(doc.metadata or {})
+            parsed.outline = doc.get_toc(simple=False)
+            if (workers <= 1 or parsed.page_count < PARALLEL_PARSE_MIN_PAGES
+                    or threading.current_thread() is not threading.main_thread()):
+                parsed._parse_pages(doc, 0, parsed.page_count)
+                return parsed
+
+        ranges = _page_ranges(parsed.page_count, workers * SHARDS_PER_WORKER)
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges)),
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            parsed._merge(list(executor.map(_parse_page_range, [pdf_path] * len(ranges), *zip(*ranges))))
+        return parsed
+
+    def _parse_pages(self, doc: "fitz.Document", start: int, stop: int):
+        spans = SpanTableBuilder()
+        for page_num in range(start, stop):
+            page = doc[page_num]
+            self.pages.append(page.get_text())
+            spans.add_page(page, page_num)
+            self._collect_images(doc, page, page_num)
+        self.spans = SpanTable.concat([self.spans, spans.build()])
+
+    def _merge(self, parts: List["ParsedDocument"]):
+        self.spans = SpanTable.concat([self.spans] + [part.spans for part in parts])
+        for part in parts:
+            self.pages.extend(part.pages)
+            self.images.extend(part.images)
+            for xref, info in part._image_info.items():
+                self._image_info.setdefault(xref, info)
+
+    def image_content(self, xref: int) -> bytes:
+        """Decode one image from the file.
+
+        Args:
+            xref (int): The image's cross-reference number.
+
+        Returns:
+            bytes: The image content.
+        """
+        with fitz.open(self.file_path) as doc:
+            return doc.extract_image(xref)["image"]
+
+    def save_images(self, store: ImageStore) -> Dict[int, str]:
+        """Write every distinct image of the document to a content-addressed store.
+
+        Each xref is decoded once and then released, so only one image is held in
+        memory at a time; identical images under different xrefs share one stored file.
+
+        Args:
+            store (ImageStore): The store to write to.
+
+        Returns:
+            Dict[int, str]: The content digest of each image xref.
+        """
+        digests = {}
+        with fitz.open(self.file_path) as doc:
+            for xref, info in self._image_info.items():
+                digests[xref] = store.put(doc.extract_image(xref)["image"], info["type"])
+        return digests
+
+    def _collect_images(self, doc: "fitz.Document", page: "fitz.Page", page_num: int):
+        for img_index, img in enumerate(page.get_images(full=True)):
+            xref = img[0]
+            info = self._image_info.get(xref)
+            if info is None:
+                info = self._image_info[xref] = _read_image_info(doc, img)
+            self.images.append({"page": page_num, "index": img_index, "xref": xref, **info})
+
+
+def _page_ranges(page_count: int, shards: int) -> List[Tuple[int, int]]:
+    shards = max(1, min(shards, page_count))
+    bounds = [page_count * i // shards for i in range(shards + 1)]
+    return [(start, stop) for start, stop in zip(bounds, bounds[1:]) if stop > start]
+
+
+def _parse_page_range(pdf_path: str, start: int, stop: int) -> ParsedDocument:
+    """Parse pages ``start`` to ``stop`` in a worker process with its own document handle."""
+    part = ParsedDocument(pdf_path, "")
+    with fitz.open(pdf_path) as doc:
+        part._parse_pages(doc, start, stop)
+    return part
+
+
+def _stream_length(doc: "fitz.Document", xref: int) -> int:
+    kind, value = doc.xref_get_key(xref, "Length")
+    if kind == "xref":
+        # Indirect length: "12 0 R" refers to an object holding the number
+        value = doc.xref_object(int(value.split()[0]), compressed=True)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _read_image_info(doc: "fitz.Document", img: tuple) -> Dict[str, Any]:
+    """Describe an image from its ``get_images(full=True)`` entry and xref dictionary, without decoding it."""
+    xref, _smask, width, height, bpc, colorspace, _alt_colorspace, _name, image_filter = img[:9]
+    return {
+        "type": _FILTER_EXTENSIONS.get(image_filter, "png"),
+        "size": _stream_length(doc, xref),
+        "width": width,
+        "height": height,
+        "colorspace": colorspace,
+        "bpc": bpc,
+    }
+
+
+def extract_page_spans(page: "fitz.Page", page_num: int) -> SpanTable:
+    """Collect the non-empty text spans of one page with their font information.
+
+    Args:
+        page (fitz.Page): The page to read.
+        page_num (int): The zero-based page number recorded on each span.
+
+    Returns:
+        SpanTable: The spans in reading order.
+    """
+    spans = SpanTableBuilder()
+    spans.add_page(page, page_num)
+    return spans.build()
+
+
+def iter_pages(pdf_path: str) -> Iterator[Tuple[int, SpanTable, List[Dict[str, Any]]]]:
+    """Yield the spans and image information of a PDF one page at a time.
+
+    A document already in the parse cache is served from memory. Otherwise the file is
+    read page by page without being cached, so memory stays bounded by the largest page.
+    Image entries carry the same metadata fields as ``ParsedDocument.images``.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+
+    Yields:
+        Tuple[int, SpanTable, List[Dict[str, Any]]]: The page number, its spans and its images.
+    """
+    with _parse_cache_lock:
+        parsed = _parse_cache.get(compute_file_hash(pdf_path))
+
+    if parsed is not None:
+        page_offsets = parsed.spans.page_offsets(parsed.page_count)
+        images_by_page = _images_by_page(parsed)
+        for page_num in range(parsed.page_count):
+            spans = parsed.spans[page_offsets[page_num]:page_offsets[page_num + 1]]
+            yield page_num, spans, images_by_page.get(page_num, [])
+        return
+
+    image_info: Dict[int, Dict[str, Any]] = {}
+    with fitz.open(pdf_path) as doc:
+        for page_num, page in enumerate(doc):
+            yield page_num, extract_page_spans(page, page_num), _page_images(doc, page, page_num, image_info)
+
+
+def _page_images(doc: "fitz.Document", page: "fitz.Page", page_num: int,
+                 image_info: Dict[int, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # The page's image entries; image_info remembers each xref's description across pages
+    images = []
+    for img_index, img in enumerate(page.get_images(full=True)):
+        xref = img[0]
+        info = image_info.get(xref)
+        if info is None:
+            info = image_info[xref] = _read_image_info(doc, img)
+        images.append({"page": page_num, "index": img_index, "xref": xref, **info})
+    return images
+
+
+def _images_by_page(parsed: ParsedDocument) -> Dict[int, List[Dict[str, Any]]]:
+    images_by_page: Dict[int, List[Dict[str, Any]]] = {}
+    for image in parsed.images:
+        images_by_page.setdefault(image["page"], []).append(image)
+    return images_by_page
+
+
+def iter_page_contents(pdf_path: str) -> Iterator[Tuple[int, str, List[Dict[str, Any]]]]:
+    """Yield the plain text and image information of a PDF one page at a time.
+
+    Like ``iter_pages``, a document in the parse cache is served from memory and any
+    other is read page by page without being cached.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+
+    Yields:
+        Tuple[int, str, List[Dict[str, Any]]]: The page number, its text and its images.
+    """
+    with _parse_cache_lock:
+        parsed = _parse_cache.get(compute_file_hash(pdf_path))
+
+    if parsed is not None:
+        images_by_page = _images_by_page(parsed)
+        for page_num, text in enumerate(parsed.pages):
+            yield page_num, text, images_by_page.get(page_num, [])
+        return
+
+    image_info: Dict[int, Dict[str, Any]] = {}
+    with fitz.open(pdf_path) as doc:
+        for page_num, page in enumerate(doc):
+            yield page_num, page.get_text(), _page_images(doc, page, page_num, image_info)
+
+
+def read_document_info(pdf_path: str) -> Dict[str, Any]:
+    """Return a PDF's document metadata, page count and file size without reading its pages.
+
+    Returns:
+        Dict[str, Any]: "metadata", "page_count" and "file_size", as on ``ParsedDocument``.
+    """
+    with _parse_cache_lock:
+        parsed = _parse_cache.get(compute_file_hash(pdf_path))
+
+    if parsed is not None:
+        return {"metadata": parsed.metadata, "page_count": parsed.page_count, "file_size": parsed.file_size}
+
+    with fitz.open(pdf_path) as doc:
+        return {"metadata": dict(doc.metadata or {}), "page_count": len(doc),
+                "file_size": os.path.getsize(pdf_path)}
+
+
+def read_outline(pdf_path: str, opening_pages: int) -> Tuple[List[list], List[str], int]:
+    """Return a PDF's outline, the text of its opening pages and its page count.
+
+    A document in the parse cache is served from memory. Otherwise only the outline
+    and the first ``opening_pages`` pages are read, and nothing is cached, so finding a
+    TOC does not parse the whole document.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+        opening_pages (int): The number of opening pages whose text is returned.
+
+    Returns:
+        Tuple[List[list], List[str], int]: The outline as returned by
+        ``get_toc(simple=False)``, the opening page texts and the page count.
+    """
+    with _parse_cache_lock:
+        parsed = _parse_cache.get(compute_file_hash(pdf_path))
+
+    if parsed is not None:
+        return parsed.outline, parsed.pages[:opening_pages], parsed.page_count
+
+    with fitz.open(pdf_path) as doc:
+        pages = [doc[page_num].get_text() for page_num in range(min(opening_pages, len(doc)))]
+        return doc.get_toc(simple=False), pages, len(doc)
+
+
+def read_opening_pages(pdf_path: str, opening_pages: int) -> Dict[str, Any]:
+    """Return a PDF's outline and page count with the text and images of its opening pages.
+
+    Like ``read_outline``, a document in the parse cache is served from memory and any
+    other has only its first ``opening_pages`` pages read, without being cached.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+        opening_pages (int): The number of opening pages read.
+
+    Returns:
+        Dict[str, Any]: "outline", "pages" (the opening page texts), "images" (their
+        image entries, as in ``ParsedDocument.images``) and "page_count".
+    """
+    with _parse_cache_lock:
+        parsed = _parse_cache.get(compute_file_hash(pdf_path))
+
+    if parsed is not None:
+        return {
+            "outline": parsed.outline,
+            "pages": parsed.pages[:opening_pages],
+            "images": [image for image in parsed.images if image["page"] < opening_pages],
+            "page_count": parsed.page_count
+        }
+
+    pages = []
+    images = []
+    image_info: Dict[int, Dict[str, Any]] = {}
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(min(opening_pages, len(doc))):
+            page = doc[page_num]
+            pages.append(page.get_text())
+            images.extend(_page_images(doc, page, page_num, image_info))
+        return {"outline": doc.get_toc(simple=False), "pages": pages, "images": images, "page_count": len(doc)}
+
+
+def set_parse_workers(workers: Optional[int]):
+    """Set the number of processes each PDF parse may use when none is passed.
+
+    Processes that already run one document per worker set this to 1, so every
+    document is parsed serially instead of spawning a nested pool.
+
+    Args:
+        workers (Optional[int]): The worker count, or None for the CPU count.
+    """
+    global _default_parse_workers
+    _default_parse_workers = workers
+
+
+def get_parsed_document(pdf_path: str) -> ParsedDocument:
+    """Return the parsed form of a PDF, parsing it only if its content has not been seen.
+
+    Parsed documents are cached by content hash, so every consumer in a pipeline run
+    shares one parse of the file.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+
+    Returns:
+        ParsedDocument: The parsed document.
+    """
+    file_hash = compute_file_hash(pdf_path)
+    with _parse_cache_lock:
+        parsed = _parse_cache.get(file_hash)
+        if parsed is not None:
+            _parse_cache.move_to_end(file_hash)
+            return parsed
+
+    parsed = ParsedDocument.from_file(pdf_path, file_hash)
+    with _parse_cache_lock:
+        _parse_cache[file_hash] = parsed
+        _parse_cache.move_to_end(file_hash)
+        while len(_parse_cache) > PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+    logger.debug(f"Parsed {os.path.basename(pdf_path)}: {parsed.page_count} pages, {len(parsed.spans)} spans")
+    return parsed
+
+
+def clear_parse_cache():
+    """Drop all cached parsed documents."""
+    with _parse_cache_lock:
+        _parse_cache.clear()
+
+
+def benchmark_parsing(pdf_path: str, workers: Optional[int] = None, repeat: int = 3) -> Dict[str, float]:
+    """Time a serial parse against a process-pool parse of the same PDF.
+
+    Args:
+        pdf_path (str): The path to the PDF file.
+        workers (Optional[int]): The number of worker processes. Defaults to the CPU count.
+        repeat (int): The number of timed runs per mode; the best run is reported.
+
+    Returns:
+        Dict[str, float]: The best serial and parallel times in seconds, and the speedup.
+    """
+    file_hash = compute_file_hash(pdf_path)
+    workers = workers or os.cpu_count() or 1
+
+    def best_time(n_workers: int) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            ParsedDocument.from_file(pdf_path, file_hash, workers=n_workers)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    serial = best_time(1)
+    parallel = best_time(workers)
+    return {
+        "workers": workers,
+        "serial_seconds": serial,
+        "parallel_seconds": parallel,
+        "speedup": serial / parallel if parallel > 0 else 0.0
+    }
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        result = benchmark_parsing(path)
+        print(f"{os.path.basename(path)}: serial {result['serial_seconds']:.2f}s, "
+              f"{result['workers']} workers {result['parallel_seconds']:.2f}s, "
+              f"speedup {result['speedup']:.2f}x")
@@ -0,0 +1,202 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+import argparse
+import tempfile
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = 'cache/segments'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = 30
+
+_ENTRY_SUFFIX = '.json.gz'
+
+
+def make_cache_key(file_hash: str, segmenter_version: int, settings: Dict[str, Any],
+                   toc_data: Optional[Dict[str, Any]] = None) -> str:
+    """Build the cache key for one segmentation run.
+
+    Args:
+        file_hash (str): The SHA-256 hash of the document content.
+        segmenter_version (int): The version of the segmentation code.
+        settings (Dict[str, Any]): The configuration values that affect segmentation.
+        toc_data (Optional[Dict[str, Any]]): The TOC passed to the segmenter, if any.
+
+    Returns:
+        str: The hex digest identifying the segmentation result.
+    """
+    toc_hash = hashlib.sha256(json.dumps(toc_data or {}, sort_keys=True).encode('utf-8')).hexdigest()
+    material = json.dumps({
+        "file": file_hash,
+        "version": segmenter_version,
+        "settings": settings or {},
+        "toc": toc_hash
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class SegmentCache:
+    """A persistent cache of post-processed segments, one gzip-compressed JSON file per key.
+
+    Entries are evicted once they are older than ``max_age_days`` or, least recently
+    used first, when the cache grows beyond ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + _ENTRY_SUFFIX)
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Return the cached segments for a key, or None on a miss.
+
+        Args:
+            key (str): The cache key from ``make_cache_key``.
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: The cached segments.
+        """
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Discarding unreadable segment cache entry {key}: {e}")
+            self._remove(path)
+            return None
+        # Record the access so eviction drops the least recently used entries first
+        os.utime(path, None)
+        return entry["segments"]
+
+    def put(self, key: str, segments: List[Dict[str, Any]], source: str = ""):
+        """Store the segments for a key, then evict entries over the size or age limits.
+
+        Args:
+            key (str): The cache key from ``make_cache_key``.
+            segments (List[Dict[str, Any]]): The post-processed segments.
+            source (str): The document path, recorded for inspection.
+        """
+        entry = {"source": source, "created": time.time(), "segments": segments}
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            self._remove(tmp_path)
+            raise
+        self.evict()
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """List the cache entries, most recently used first.
+
+        Returns:
+            List[Dict[str, Any]]: The key, size in bytes and last access time of each entry.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(_ENTRY_SUFFIX):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append({
+                    "key": name[:-len(_ENTRY_SUFFIX)],
+                    "size": stat.st_size,
+                    "last_used": stat.st_mtime
+                })
+        return sorted(entries, key=lambda entry: entry["last_used"], reverse=True)
+
+    def describe(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the source, creation time and segment count of an entry."""
+        try:
+            with gzip.open(self._path(key), 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return {"source": entry.get("source", ""), "created": entry.get("created"),
+                "segments": len(entry.get("segments", []))}
+
+    def evict(self) -> int:
+        """Remove entries past the age limit, then the least recently used over the size limit.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        removed = 0
+        cutoff = time.time() - self.max_age_days * 86400
+        kept = []
+        for entry in self.entries():
+            if entry["last_used"] < cutoff:
+                removed += self._remove(self._path(entry["key"]))
+            else:
+                kept.append(entry)
+
+        total = sum(entry["size"] for entry in kept)
+        while kept and total > self.max_bytes:
+            entry = kept.pop()
+            total -= entry["size"]
+            removed += self._remove(self._path(entry["key"]))
+        return removed
+
+    def purge(self, older_than_days: Optional[float] = None) -> int:
+        """Remove all entries, or only those unused for more than older_than_days.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        cutoff = time.time() - older_than_days * 86400 if older_than_days is not None else None
+        removed = 0
+        for entry in self.entries():
+            if cutoff is None or entry["last_used"] < cutoff:
+                removed += self._remove(self._path(entry["key"]))
+        return removed
+
+    @staticmethod
+    def _remove(path: str) -> int:
+        try:
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+
+
+def main(argv: Optional[List[str]] = None):
+    """Inspect or purge the segment cache from the command line."""
+    parser = argparse.ArgumentParser(description="Inspect or purge the segmentation cache.")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="The segment cache directory.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help="Show the number and total size of entries.")
+    subparsers.add_parser('list', help="List entries, most recently used first.")
+    purge_parser = subparsers.add_parser('purge', help="Remove entries.")
+    purge_parser.add_argument('--older-than', type=float, default=None, metavar='DAYS',
+                              help="Only remove entries unused for more than DAYS days.")
+    args = parser.parse_args(argv)
+
+    cache = SegmentCache(args.cache_dir, max_bytes=float('inf'), max_age_days=float('inf'))
+    if args.command == 'stats':
+        entries = cache.entries()
+        total = sum(entry["size"] for entry in entries)
+        print(f"{len(entries)} entries, {total / 1024:.1f} KiB in {args.cache_dir}")
+    elif args.command == 'list':
+        for entry in cache.entries():
+            details = cache.describe(entry["key"]) or {}
+            last_used = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry["last_used"]))
+            print(f"{entry['key'][:16]}  {entry['size'] / 1024:8.1f} KiB  {last_used}  "
+                  f"{details.get('segments', '?'):>5} segments  {details.get('source', '')}")
+    elif args.command == 'purge':
+        removed = cache.purge(args.older_than)
+        print(f"Removed {removed} entries from {args.cache_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+from utils.resources import DEFAULT_SPACY_MODEL, get_resource, get_spacy_model
+
+logger = logging.getLogger(__name__)
+
+# Components the analysis never reads; sentence boundaries come from the rule-based sentencizer
+EXCLUDED_PIPES = ('tagger', 'parser', 'attribute_ruler', 'lemmatizer', 'senter')
+
+# Number of per-segment analyses remembered by each analyzer
+ANALYSIS_CACHE_SIZE = 4096
+
+MAX_ENTITIES = 10
+SUMMARY_SENTENCES = 5
+
+# Per-segment result: the segment's entities and its first SUMMARY_SENTENCES sentences
+SegmentResult = Tuple[Tuple[str, ...], Tuple[str, ...]]
+
+
+def get_analysis_pipeline(model_name: str = DEFAULT_SPACY_MODEL):
+    """Return the shared spaCy pipeline reduced to NER plus a sentencizer."""
+    def load():
+        nlp = get_spacy_model(model_name, exclude=EXCLUDED_PIPES)
+        if 'sentencizer' not in nlp.pipe_names:
+            nlp.add_pipe('sentencizer', first=True)
+        return nlp
+    return get_resource(('spacy_analysis', model_name), load)
+
+
+def _segment_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class SemanticAnalyzer:
+    """Finds a document's key entities and summary sentences in one streaming spaCy pass.
+
+    Segments are streamed through ``nlp.pipe`` in document order, a batch at a time,
+    and the pass stops as soon as enough unique entities and summary sentences have
+    been seen. Each segment's result is memoized by content hash, so re-analyzing a
+    document, or another document sharing its segments, skips spaCy for those.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_SPACY_MODEL, batch_size: int = 32, n_process: int = 1,
+                 cache_size: int = ANALYSIS_CACHE_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, SegmentResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def analyze(self, texts: Sequence[str], max_entities: int = MAX_ENTITIES,
+                summary_sentences: int = SUMMARY_SENTENCES) -> Tuple[List[str], str]:
+        """Return the first unique entities and the opening sentences of the texts.
+
+        Args:
+            texts (Sequence[str]): The segment texts, in document order.
+            max_entities (int): The number of unique entities to collect.
+            summary_sentences (int): The number of sentences in the summary, at most
+                ``SUMMARY_SENTENCES``.
+
+        Returns:
+            Tuple[List[str], str]: The key entities and the summary.
+        """
+        entities: Dict[str, None] = {}
+        sentences: List[str] = []
+        # Each round feeds every worker process one full batch
+        round_size = self.batch_size * max(self.n_process, 1)
+
+        for start in range(0, len(texts), round_size):
+            for segment_entities, segment_sentences in self._analyze_round(texts[start:start + round_size]):
+                for entity in segment_entities:
+                    if len(entities) >= max_entities:
+                        break
+                    entities.setdefault(entity, None)
+                sentences.extend(segment_sentences[:summary_sentences - len(sentences)])
+                if len(entities) >= max_entities and len(sentences) >= summary_sentences:
+                    return list(entities), " ".join(sentences)
+
+        return list(entities), " ".join(sentences)
+
+    def _analyze_round(self, texts: Sequence[str]) -> List[SegmentResult]:
+        keys = [_segment_key(text) for text in texts]
+        results: List[Optional[SegmentResult]] = [None] * len(texts)
+        missing: Dict[bytes, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    results[i] = cached
+
+        if missing:
+            nlp = get_analysis_pipeline(self.model_name)
+            pending = (texts[positions[0]] for positions in missing.values())
+            analyzed = [
+                (tuple(ent.text for ent in doc.ents), tuple(sent.text for sent in doc.sents)[:SUMMARY_SENTENCES])
+                for doc in nlp.pipe(pending, batch_size=self.batch_size, n_process=self.n_process)
+            ]
+            with self._lock:
+                for (key, positions), result in zip(missing.items(), analyzed):
+                    for i in positions:
+                        results[i] = result
+                    self._cache[key] = result
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return results
+
+    def clear(self):
+        """Forget all memoized segment analyses."""
+        with self._lock:
+            self._cache.clear()
+
+
+def get_semantic_analyzer() -> SemanticAnalyzer:
+    """Return the shared analyzer configured under ``semantic_analysis``."""
+    def load():
+        from utils.config_manager import config
+        settings = config.semantic_analysis or {}
+        return SemanticAnalyzer(
+            settings.get('spacy_model', DEFAULT_SPACY_MODEL),
+            batch_size=settings.get('batch_size', 32),
+            n_process=settings.get('n_process', 1)
+        )
+    return get_resource(('semantic_analyzer',), load)
@@ -0,0 +1,123 @@
+import logging
+from itertools import accumulate
+from typing import List, Sequence, Tuple
+import numpy as np
+from utils.resources import get_sentence_transformer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+
+def get_sentence_model(model_name: str = DEFAULT_EMBEDDING_MODEL) -> "SentenceTransformer":
+    """Return the SentenceTransformer for a name, loading it on first use.
+
+    Args:
+        model_name (str): The sentence-transformers model name.
+
+    Returns:
+        SentenceTransformer: The shared model instance.
+    """
+    return get_sentence_transformer(model_name)
+
+
+def embed_sentences(sentences: Sequence[str], model_name: str = DEFAULT_EMBEDDING_MODEL,
+                    batch_size: int = 64) -> np.ndarray:
+    """Embed every sentence in one batched encode call.
+
+    Args:
+        sentences (Sequence[str]): The sentences to embed.
+        model_name (str): The sentence-transformers model name.
+        batch_size (int): The encoder batch size.
+
+    Returns:
+        np.ndarray: A (len(sentences), dim) array of unit-length embeddings.
+    """
+    model = get_sentence_model(model_name)
+    return model.encode(list(sentences), batch_size=batch_size, convert_to_numpy=True,
+                        normalize_embeddings=True, show_progress_bar=False)
+
+
+def adjacent_window_similarities(embeddings: np.ndarray, window: int = 3) -> np.ndarray:
+    """Cosine similarity between the windows of sentences on either side of every gap.
+
+    Gap ``g`` lies between sentence ``g`` and sentence ``g + 1``; its score compares the
+    mean embedding of up to ``window`` sentences before it with the mean of up to
+    ``window`` sentences after it. All gaps are computed at once from cumulative sums.
+
+    Args:
+        embeddings (np.ndarray): A (n, dim) array of sentence embeddings.
+        window (int): The number of sentences averaged on each side of a gap.
+
+    Returns:
+        np.ndarray: The n - 1 gap similarities.
+    """
+    n = embeddings.shape[0]
+    if n < 2:
+        return np.empty(0, dtype=np.float32)
+    window = max(window, 1)
+    cumsum = np.vstack([np.zeros((1, embeddings.shape[1]), dtype=embeddings.dtype), np.cumsum(embeddings, axis=0)])
+    gaps = np.arange(1, n)
+    left = cumsum[gaps] - cumsum[np.maximum(gaps - window, 0)]
+    right = cumsum[np.minimum(gaps + window, n)] - cumsum[gaps]
+    norms = np.linalg.norm(left, axis=1) * np.linalg.norm(right, axis=1)
+    return np.einsum('ij,ij->i', left, right) / np.maximum(norms, 1e-12)
+
+
+def similarity_valleys(similarities: np.ndarray, depth: float = 0.5) -> np.ndarray:
+    """Find the gaps that are local similarity minima and sit clearly below the average.
+
+    Args:
+        similarities (np.ndarray): The gap similarities.
+        depth (float): How many standard deviations below the mean a valley must be.
+
+    Returns:
+        np.ndarray: The indices of the valley gaps, in increasing order.
+    """
+    if similarities.size == 0:
+        return np.empty(0, dtype=np.int64)
+    padded = np.concatenate([[np.inf], similarities, [np.inf]])
+    is_minimum = (padded[1:-1] < padded[:-2]) & (padded[1:-1] <= padded[2:])
+    threshold = similarities.mean() - depth * similarities.std()
+    return np.flatnonzero(is_minimum & (similarities < threshold))
+
+
+def segment_by_similarity(similarities: np.ndarray, token_counts: Sequence[int], max_tokens: int,
+                          depth: float = 0.5) -> List[Tuple[int, int, int]]:
+    """Split sentences at similarity valleys, keeping every segment within max_tokens.
+
+    Segments that would exceed the limit are cut again at the least similar gap in the
+    back half of the range that keeps the first piece within it; a single sentence
+    longer than the limit becomes a segment of its own.
+
+    Args:
+        similarities (np.ndarray): The n - 1 gap similarities for n sentences.
+        token_counts (Sequence[int]): The token count of each sentence.
+        max_tokens (int): The maximum number of tokens per segment.
+        depth (float): How many standard deviations below the mean a valley must be.
+
+    Returns:
+        List[Tuple[int, int, int]]: The (start, end, tokens) of each segment, where the
+            segment is ``sentences[start:end]``.
+    """
+    n = len(token_counts)
+    if n == 0:
+        return []
+    prefix = np.fromiter(accumulate(token_counts, initial=0), dtype=np.int64, count=n + 1)
+    # A cut at gap g ends a segment after sentence g
+    cuts = [0] + [int(g) + 1 for g in similarity_valleys(similarities, depth)] + [n]
+
+    segments = []
+    for start, end in zip(cuts, cuts[1:]):
+        while prefix[end] - prefix[start] > max_tokens and end - start > 1:
+            # The furthest end that keeps [start, limit) within max_tokens, at least one sentence
+            limit = int(np.searchsorted(prefix, prefix[start] + max_tokens, side='right')) - 1
+            limit = min(max(limit, start + 1), end - 1)
+            # Cut at the least similar gap in the second half of the allowed range, so the
+            # pieces stay reasonably full when the similarities are flat
+            lowest = start + (limit - start) // 2
+            cut = lowest + 1 + int(np.argmin(similarities[lowest:limit]))
+            segments.append((start, cut, int(prefix[cut] - prefix[start])))
+            start = cut
+        segments.append((start, end, int(prefix[end] - prefix[start])))
+    return segments
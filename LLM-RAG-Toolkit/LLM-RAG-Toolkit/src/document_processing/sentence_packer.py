@@ -0,0 +1,38 @@
+from itertools import accumulate
+from typing import List, Sequence, Tuple
+
+
+def pack_sentences(token_counts: Sequence[int], max_tokens: int, overlap: int = 0) -> List[Tuple[int, int, int]]:
+    """Greedily pack consecutive sentences into chunks of at most max_tokens tokens.
+
+    Each chunk after the first starts with up to ``overlap`` sentences from the end of
+    the previous chunk; overlap sentences are dropped from the front when keeping them
+    would push the next sentence over the limit, so every chunk adds new text. A single
+    sentence longer than max_tokens becomes a chunk of its own. Token totals come from a
+    prefix-sum array over the per-sentence counts, so the whole pass is O(n).
+
+    Args:
+        token_counts (Sequence[int]): The token count of each sentence, in order.
+        max_tokens (int): The maximum number of tokens per chunk.
+        overlap (int): The number of sentences carried over between chunks.
+
+    Returns:
+        List[Tuple[int, int, int]]: The (start, end, tokens) of each chunk, where the chunk
+            is ``sentences[start:end]`` and tokens is the sum of its sentence counts.
+    """
+    prefix = list(accumulate(token_counts, initial=0))
+    overlap = max(overlap, 0)
+    chunks = []
+    start = 0
+
+    for i in range(len(token_counts)):
+        if prefix[i + 1] - prefix[start] > max_tokens and i > start:
+            chunks.append((start, i, prefix[i] - prefix[start]))
+            # Keep the last 'overlap' sentences, but only as many as fit with sentence i
+            start = max(start, i - overlap)
+            while start < i and prefix[i + 1] - prefix[start] > max_tokens:
+                start += 1
+
+    if start < len(token_counts):
+        chunks.append((start, len(token_counts), prefix[-1] - prefix[start]))
+    return chunks
@@ -0,0 +1,324 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+
+# PyMuPDF span flag for bold text (fitz.TEXT_FONT_BOLD)
+BOLD_FLAG = 16
+
+# Spans at least this many times the body size are headings
+HEADING_SIZE_RATIO = 1.2
+
+# Longer spans are treated as body text even when set in a heading style
+HEADING_MAX_CHARS = 120
+
+# Font sizes are compared at this resolution, in points
+SIZE_RESOLUTION = 0.5
+
+
+class SpanTable:
+    """Text spans stored column by column instead of one dict per span.
+
+    All span texts live in one string addressed by an offsets array; the font
+    size, flags, font, page number and bounding box of each span are NumPy
+    columns. Slicing a table returns a view over the same columns.
+
+    Attributes:
+        text (str): The texts of all spans, concatenated.
+        offsets (np.ndarray): ``n + 1`` offsets into ``text``; span ``i`` is ``text[offsets[i]:offsets[i + 1]]``.
+        size (np.ndarray): The font size of each span.
+        flags (np.ndarray): The PyMuPDF font flags of each span.
+        font (np.ndarray): Each span's index into ``font_names``.
+        font_names (List[str]): The distinct font names.
+        page (np.ndarray): The zero-based page number of each span, in non-decreasing order.
+        bbox (np.ndarray): A (n, 4) array of span bounding boxes (x0, y0, x1, y1).
+    """
+
+    __slots__ = ('text', 'offsets', 'size', 'flags', 'font', 'font_names', 'page', 'bbox')
+
+    def __init__(self, text: str, offsets: np.ndarray, size: np.ndarray, flags: np.ndarray,
+                 font: np.ndarray, font_names: List[str], page: np.ndarray, bbox: np.ndarray):
+        self.text = text
+        self.offsets = offsets
+        self.size = size
+        self.flags = flags
+        self.font = font
+        self.font_names = font_names
+        self.page = page
+        self.bbox = bbox
+
+    @classmethod
+    def empty(cls) -> "SpanTable":
+        return SpanTableBuilder().build()
+
+    @classmethod
+    def from_spans(cls, spans: Iterable[Dict[str, Any]]) -> "SpanTable":
+        """Build a table from span dictionaries as produced by ``SpanTable.__iter__``."""
+        builder = SpanTableBuilder()
+        for span in spans:
+            builder.add(span["text"], span["font_size"], span["font_flags"], span.get("font", ""),
+                        span["page_num"], span.get("bbox", (0.0, 0.0, 0.0, 0.0)))
+        return builder.build()
+
+    @classmethod
+    def concat(cls, tables: Sequence["SpanTable"]) -> "SpanTable":
+        """Join tables in order, remapping their font indices onto one font list."""
+        tables = [table for table in tables if len(table)]
+        if not tables:
+            return cls.empty()
+        if len(tables) == 1:
+            return tables[0]
+
+        font_index: Dict[str, int] = {}
+        fonts, offsets = [], [np.zeros(1, dtype=np.int64)]
+        text_length = 0
+        for table in tables:
+            codes = np.array([font_index.setdefault(name, len(font_index)) for name in table.font_names],
+                             dtype=np.int32)
+            fonts.append(codes[table.font] if codes.size else table.font)
+            offsets.append(table.offsets[1:] - table.offsets[0] + text_length)
+            text_length += int(table.offsets[-1] - table.offsets[0])
+
+        return cls(
+            "".join(table.text[table.offsets[0]:table.offsets[-1]] for table in tables),
+            np.concatenate(offsets),
+            np.concatenate([table.size for table in tables]),
+            np.concatenate([table.flags for table in tables]),
+            np.concatenate(fonts),
+            list(font_index),
+            np.concatenate([table.page for table in tables]),
+            np.concatenate([table.bbox for table in tables])
+        )
+
+    def __len__(self) -> int:
+        return self.size.shape[0]
+
+    def text_at(self, i: int) -> str:
+        return self.text[self.offsets[i]:self.offsets[i + 1]]
+
+    def texts(self) -> List[str]:
+        """Return the text of every span."""
+        offsets = self.offsets.tolist()
+        return [self.text[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    def text_lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("SpanTable slices must be contiguous")
+            stop = max(start, stop)
+            return SpanTable(self.text, self.offsets[start:stop + 1], self.size[start:stop],
+                             self.flags[start:stop], self.font[start:stop], self.font_names,
+                             self.page[start:stop], self.bbox[start:stop])
+        if index < 0:
+            index += len(self)
+        return {
+            "text": self.text_at(index),
+            "font_size": float(self.size[index]),
+            "font_flags": int(self.flags[index]),
+            "font": self.font_names[self.font[index]] if self.font_names else "",
+            "page_num": int(self.page[index]),
+            "bbox": tuple(self.bbox[index].tolist())
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Yield each span as a dictionary, for callers that work on single spans."""
+        for i in range(len(self)):
+            yield self[i]
+
+    def page_offsets(self, page_count: int) -> np.ndarray:
+        """Return ``page_count + 1`` span indices; page ``p`` holds the spans ``offsets[p]`` to ``offsets[p + 1]``."""
+        return np.searchsorted(self.page, np.arange(page_count + 1), side='left')
+
+    def font_counts(self) -> Dict[str, int]:
+        """Return the number of spans set in each font."""
+        counts = np.bincount(self.font, minlength=len(self.font_names))
+        return {name: int(count) for name, count in zip(self.font_names, counts) if count}
+
+    def size_histogram(self, by_page: bool = False) -> Tuple[np.ndarray, ...]:
+        """Count the characters set at each font size, for the document or for every page.
+
+        Sizes are rounded to ``SIZE_RESOLUTION`` points.
+
+        Args:
+            by_page (bool): Whether to count each page separately.
+
+        Returns:
+            Tuple[np.ndarray, ...]: ``(sizes, chars)`` or, by page, ``(pages, sizes, chars)``,
+                sorted by page and then by size.
+        """
+        sizes = np.round(self.size / SIZE_RESOLUTION) * SIZE_RESOLUTION
+        weights = self.text_lengths()
+        if not by_page:
+            unique_sizes, inverse = np.unique(sizes, return_inverse=True)
+            return unique_sizes, np.bincount(inverse, weights=weights, minlength=unique_sizes.size)
+        keys = np.stack([self.page.astype(np.float64), sizes])
+        unique_keys, inverse = np.unique(keys, axis=1, return_inverse=True)
+        chars = np.bincount(inverse.ravel(), weights=weights, minlength=unique_keys.shape[1])
+        return unique_keys[0].astype(np.int32), unique_keys[1], chars
+
+    def page_body_sizes(self, page_count: int, default: float = 0.0) -> np.ndarray:
+        """Return the font size holding the most characters on each page.
+
+        Args:
+            page_count (int): The number of pages in the document.
+            default (float): The size used for pages without text.
+
+        Returns:
+            np.ndarray: The body font size of each page.
+        """
+        body = np.full(page_count, default, dtype=np.float32)
+        if not len(self):
+            return body
+        pages, sizes, chars = self.size_histogram(by_page=True)
+        # Sort by page, then characters, so the last row of each page is its most used size
+        order = np.lexsort((chars, pages))
+        last_of_page = np.r_[pages[order][1:] != pages[order][:-1], True]
+        body[pages[order][last_of_page]] = sizes[order][last_of_page]
+        return body
+
+
+class SpanTableBuilder:
+    """Accumulates spans into plain lists and converts them to a ``SpanTable`` once."""
+
+    def __init__(self):
+        self._texts: List[str] = []
+        self._sizes: List[float] = []
+        self._flags: List[int] = []
+        self._fonts: List[int] = []
+        self._pages: List[int] = []
+        self._bboxes: List[Tuple[float, float, float, float]] = []
+        self._font_index: Dict[str, int] = {}
+
+    def add(self, text: str, size: float, flags: int, font: str, page_num: int,
+            bbox: Tuple[float, float, float, float]):
+        self._texts.append(text)
+        self._sizes.append(size)
+        self._flags.append(flags)
+        self._fonts.append(self._font_index.setdefault(font, len(self._font_index)))
+        self._pages.append(page_num)
+        self._bboxes.append(bbox)
+
+    def add_page(self, page: "fitz.Page", page_num: int):
+        """Add the non-empty text spans of a PyMuPDF page, in reading order."""
+        for block in page.get_text("dict")["blocks"]:
+            for line in block.get("lines", ()):
+                for span in line["spans"]:
+                    text = span["text"].strip()
+                    if text:
+                        self.add(text, span["size"], span["flags"], span.get("font", ""), page_num, span["bbox"])
+
+    def build(self) -> SpanTable:
+        offsets = np.zeros(len(self._texts) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in self._texts], out=offsets[1:])
+        return SpanTable(
+            "".join(self._texts),
+            offsets,
+            np.array(self._sizes, dtype=np.float32),
+            np.array(self._flags, dtype=np.int32),
+            np.array(self._fonts, dtype=np.int32),
+            list(self._font_index),
+            np.array(self._pages, dtype=np.int32),
+            np.array(self._bboxes, dtype=np.float32).reshape(-1, 4)
+        )
+
+
+class StyleProfile:
+    """The typographic conventions of one document, learned from its span table.
+
+    Attributes:
+        body_size (float): The font size holding the most characters in the document.
+        heading_sizes (List[float]): Font sizes used for headings, largest first; the
+            position of a size in this list is its heading level minus one.
+    """
+
+    def __init__(self, body_size: float, heading_sizes: List[float]):
+        self.body_size = body_size
+        self.heading_sizes = heading_sizes
+
+    @classmethod
+    def learn(cls, table: SpanTable, size_ratio: float = HEADING_SIZE_RATIO,
+              max_chars: int = HEADING_MAX_CHARS, max_levels: int = 6) -> "StyleProfile":
+        """Learn the body size and heading size levels of a document.
+
+        Args:
+            table (SpanTable): The document's spans.
+            size_ratio (float): How much larger than body text a heading must be.
+            max_chars (int): The longest span that can be a heading.
+            max_levels (int): The number of heading sizes kept.
+
+        Returns:
+            StyleProfile: The learned profile.
+        """
+        if not len(table):
+            return cls(0.0, [])
+        sizes, chars = table.size_histogram()
+        body_size = float(sizes[np.argmax(chars)])
+        short = table.text_lengths() <= max_chars
+        rounded = np.round(table.size[short] / SIZE_RESOLUTION) * SIZE_RESOLUTION
+        heading_sizes = np.unique(rounded[rounded >= body_size * size_ratio])[::-1]
+        return cls(body_size, [float(size) for size in heading_sizes[:max_levels]])
+
+
+def classify_headings(table: SpanTable, page_count: Optional[int] = None,
+                      profile: Optional[StyleProfile] = None, size_ratio: float = HEADING_SIZE_RATIO,
+                      max_chars: int = HEADING_MAX_CHARS) -> Tuple[np.ndarray, np.ndarray]:
+    """Mark the spans that are headings and assign each a level, for all spans at once.
+
+    A span is a heading when it is short and either at least ``size_ratio`` times the
+    body size of its page, or bold and no smaller than that body size. Size-based
+    headings take the level of their size in the document's profile; bold headings at
+    body size rank one level below the smallest heading size.
+
+    Args:
+        table (SpanTable): The document's spans.
+        page_count (Optional[int]): The number of pages; defaults to the last span's page + 1.
+        profile (Optional[StyleProfile]): The document profile; learned from the table if omitted.
+        size_ratio (float): How much larger than body text a heading must be.
+        max_chars (int): The longest span that can be a heading.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: A boolean heading mask and the heading level of
+            each span (0 for body text).
+    """
+    if not len(table):
+        return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int8)
+    if page_count is None:
+        page_count = int(table.page[-1]) + 1
+    if profile is None:
+        profile = StyleProfile.learn(table, size_ratio, max_chars)
+
+    page_body = table.page_body_sizes(page_count, default=profile.body_size)[table.page]
+    short = table.text_lengths() <= max_chars
+    large = table.size >= page_body * size_ratio
+    bold = ((table.flags & BOLD_FLAG) != 0) & (table.size >= page_body)
+    headings = short & (large | bold)
+
+    levels = np.zeros(len(table), dtype=np.int8)
+    if profile.heading_sizes:
+        # heading_sizes is descending; count the sizes strictly larger than each span's
+        descending = np.asarray(profile.heading_sizes, dtype=np.float32)
+        rounded = np.round(table.size / SIZE_RESOLUTION) * SIZE_RESOLUTION
+        rank = np.searchsorted(-descending, -rounded, side='left')
+        levels[headings] = np.minimum(rank[headings], len(descending)) + 1
+    else:
+        levels[headings] = 1
+    return headings, levels
+
+
+def spans_with_headings(table: SpanTable, page_count: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Return every span as a dictionary carrying its ``is_heading`` flag and ``heading_level``.
+
+    Args:
+        table (SpanTable): The document's spans.
+        page_count (Optional[int]): The number of pages in the document.
+
+    Returns:
+        List[Dict[str, Any]]: The spans in document order.
+    """
+    headings, levels = classify_headings(table, page_count)
+    return [
+        {**span, "is_heading": heading, "heading_level": level}
+        for span, heading, level in zip(table, headings.tolist(), levels.tolist())
+    ]
@@ -1,40 +1,36 @@
 import re
-import fitz
 import logging
 import json
 import os
-from typing import Dict, Any, List, Tuple
-from openai import OpenAI
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from openai import AsyncOpenAI, OpenAI
 from utils.config_manager import config
+from utils.resources import create_async_openai_client, get_openai_client
 from llama_index import GPTListIndex  # Import appropriate index
+from .document_analysis import (
+    SAMPLE_PAGES, analyze_content, analyze_content_async, make_sample, read_document_sample, sample_pages,
+    structure_fields
+)
+from .parsed_document import read_opening_pages
+from .toc_resolver import DEFAULT_MIN_CONFIDENCE, DEFAULT_PRINTED_TOC_PAGES, SOURCE_LLM, resolve_toc
 
 logger = logging.getLogger(__name__)
 
+# LLM requests in flight at once during batch structure extraction
+DEFAULT_MAX_CONCURRENCY = 8
+
 def load_openai_client() -> OpenAI:
     try:
-        return OpenAI(api_key=config.OPENAI_API_KEY)
+        return get_openai_client()
     except Exception as e:
         logger.error(f"Failed to initialize OpenAI client: {e}", exc_info=True)
         raise
 
 def extract_text_and_images(pdf_path: str) -> Tuple[str, List[Dict]]:
     try:
-        with fitz.open(pdf_path) as pdf_document:
-            text = ""
-            images = []
-            for page_num in range(0, min(10, pdf_document.page_count)):
-                page = pdf_document[page_num]
-                text += page.get_text() + "\n"
-                for img in page.get_images(full=True):
-                    xref = img[0]
-                    base_image = pdf_document.extract_image(xref)
-                    image_info = {
-                        "page": page_num,
-                        "type": base_image["ext"],
-                        "size": len(base_image["image"])
-                    }
-                    images.append(image_info)
-        return text, images
+        return read_document_sample(pdf_path)
     except FileNotFoundError:
         logger.error(f"PDF file not found: {pdf_path}")
         return "", []
@@ -60,95 +56,38 @@ def clean_json_string(json_string):
     if not json_string.endswith('}'): json_string = json_string + '}'
     return json_string
 
-import hashlib
-import pickle
-import os
+def _empty_structure(**extra) -> Dict[str, Any]:
+    return {**extra, "document_type": "unknown", "structure": [], "toc": {}, "notable_features": []}
+
+def _failed_structure(error: Exception) -> Dict[str, Any]:
+    if isinstance(error, json.JSONDecodeError):
+        logger.error(f"Error parsing JSON from LLM response: {error}")
+        return _empty_structure(error="Failed to parse LLM response as JSON", raw_response=error.doc)
+    logger.error(f"Error during LLM structure extraction: {error}", exc_info=error)
+    return _empty_structure(error=str(error))
 
-def cache_result(func):
-    def wrapper(*args, **kwargs):
-        key = hashlib.md5(str(args).encode() + str(kwargs).encode()).hexdigest()
-        cache_file = f"cache/{key}.pkl"
-        
-        if os.path.exists(cache_file):
-            with open(cache_file, 'rb') as f:
-                return pickle.load(f)
-        
-        result = func(*args, **kwargs)
-        
-        os.makedirs("cache", exist_ok=True)
-        with open(cache_file, 'wb') as f:
-            pickle.dump(result, f)
-        
-        return result
-    return wrapper
-
-@cache_result
 def extract_structure_llm(client: OpenAI, content: Dict[str, Any]) -> Dict[str, Any]:
-    text_sample = content.get("text", "")[:4000]
-    image_info = json.dumps(content.get("images", [])[:10])
-    
-    if not text_sample and not image_info:
-        return {
-            "error": "No content provided for analysis",
-            "document_type": "unknown",
-            "structure": [],
-            "toc": {},
-            "notable_features": []
-        }
-    
-    prompt = (
-        "Analyze this document excerpt and describe its structure. "
-        "Identify main sections, subsections, and any notable features like images or graphs. "
-        "If a Table of Contents is present, extract it. "
-        "If no clear structure is found, suggest logical divisions based on content. "
-        "Format the result as a JSON object with the following structure:\n"
-        "{\n"
-        '  "document_type": "report/article/manual/etc",\n'
-        '  "structure": ["list", "of", "main", "sections"],\n'
-        '  "toc": {"section1": {"subsection1": {}, "subsection2": {}}, "section2": {}},\n'
-        '  "notable_features": ["list", "of", "features"]\n'
-        "}\n\n"
-        f"Document text sample:\n\n{text_sample}\n\n"
-        f"Image information:\n{image_info}"
-    )
+    """Return the structure part of the document analysis shared with ``extract_semantic_metadata``."""
+    try:
+        analysis = analyze_content(client, content)
+    except Exception as e:
+        return _failed_structure(e)
+    if analysis is None:
+        return _empty_structure(error="No content provided for analysis")
+    logger.info("LLM structure extraction completed successfully.")
+    return structure_fields(analysis)
 
+async def extract_structure_llm_async(client: AsyncOpenAI, content: Dict[str, Any],
+                                      semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """Async counterpart of ``extract_structure_llm``; the semaphore caps requests in flight."""
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are an expert in document analysis and structuring."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=config.generation_parameters['temperature'],
-            max_tokens=config.generation_parameters['max_tokens']
-        )
-        response_content = response.choices[0].message.content
-        logger.info(f"Raw LLM response: {response_content}")
-        print(f"Raw LLM response: {response_content}")
-        
-        try:
-            structure_json = json.loads(response_content)
-            logger.info("LLM structure extraction completed successfully.")
-            return structure_json
-        except json.JSONDecodeError as json_error:
-            logger.error(f"Error parsing JSON from LLM response: {json_error}")
-            return {
-                "error": "Failed to parse LLM response as JSON",
-                "raw_response": response_content,
-                "document_type": "unknown",
-                "structure": [],
-                "toc": {},
-                "notable_features": []
-            }
+        analysis = await analyze_content_async(client, content, semaphore)
     except Exception as e:
-        logger.error(f"Error during LLM structure extraction: {e}", exc_info=True)
-        return {
-            "error": str(e),
-            "document_type": "unknown",
-            "structure": [],
-            "toc": {},
-            "notable_features": []
-        }
+        return _failed_structure(e)
+    if analysis is None:
+        return _empty_structure(error="No content provided for analysis")
+    logger.info("LLM structure extraction completed successfully.")
+    return structure_fields(analysis)
 
 def extract_info_from_text(text):
     doc_type_match = re.search(r'"document_type":\s*"([^"]+)"', text)
@@ -163,32 +102,62 @@ def extract_info_from_text(text):
         "notable_features": json.loads(features_match.group(1)) if features_match else []
     }
 
-def extract_toc(pdf_path: str) -> Dict[str, Any]:
-    client = load_openai_client()
-    if not client:
-        return {"error": "Failed to initialize OpenAI client"}
-
+def _read_opening(pdf_path: str) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    # The outline and opening pages, enough for both the LLM sample and a printed TOC,
+    # or None and an error result
+    printed_toc_pages = (config.toc_resolution or {}).get('printed_toc_pages', DEFAULT_PRINTED_TOC_PAGES)
     try:
-        text, images = extract_text_and_images(pdf_path)
+        return read_opening_pages(pdf_path, max(SAMPLE_PAGES, printed_toc_pages)), {}
     except FileNotFoundError:
-        return {"error": f"PDF file not found: {pdf_path}"}
+        logger.error(f"PDF file not found: {pdf_path}")
+        return None, {"error": f"PDF file not found: {pdf_path}"}
     except Exception as e:
-        return {"error": f"Error extracting content from PDF: {str(e)}"}
+        logger.error(f"Error extracting content from PDF {pdf_path}: {str(e)}")
+        return None, {"error": f"Error extracting content from PDF: {str(e)}"}
 
-    if not text and not images:
-        return {"error": "No content extracted from the PDF"}
+def _local_structure(pdf_path: str, opening: Dict[str, Any],
+                     document_structure: Dict[str, bool]) -> Optional[Dict[str, Any]]:
+    # The structure from the embedded outline or a printed TOC, or None if only the LLM can tell
+    settings = config.toc_resolution or {}
+    min_confidence = settings.get('min_confidence', DEFAULT_MIN_CONFIDENCE)
+    resolution = resolve_toc(opening["outline"], opening["pages"], opening["page_count"],
+                             min_confidence=min_confidence,
+                             printed_toc_pages=settings.get('printed_toc_pages', DEFAULT_PRINTED_TOC_PAGES))
+    if resolution["confidence"] < min_confidence and settings.get('llm_fallback', True):
+        return None
+    logger.info(f"Resolved the TOC of {os.path.basename(pdf_path)} from its {resolution['source']} without the LLM")
+    return {
+        "document_type": "unknown",
+        "structure": list(resolution["toc"]),
+        "toc": resolution["toc"],
+        "notable_features": [],
+        "detected_structure": document_structure,
+        "toc_source": resolution["source"],
+        "toc_confidence": resolution["confidence"]
+    }
+
+def _prepare_document(pdf_path: str) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    # Returns the LLM sample and detected structure, or None and the final result when
+    # the document failed to load or its TOC was resolved without the LLM. Only the
+    # outline and opening pages are read, so a batch does not parse every file in full.
+    opening, error = _read_opening(pdf_path)
+    if opening is None:
+        return None, error
 
+    text, images = sample_pages(opening["pages"], opening["images"])
+    if not text and not images:
+        return None, {"error": "No content extracted from the PDF"}
     document_structure = detect_document_structure(text, images)
-    
-    content = {
-        "text": text[:4000],  # Limit text to 4000 characters
-        "images": images[:10]  # Limit to first 10 images
-    }
-    
-    structure_data = extract_structure_llm(client, content)
 
+    local = _local_structure(pdf_path, opening, document_structure)
+    if local is not None:
+        return None, local
+    return make_sample(text, images), document_structure
+
+def _finish_structure(structure_data: Dict[str, Any], document_structure: Dict[str, bool]) -> Dict[str, Any]:
     if isinstance(structure_data, dict) and "error" not in structure_data:
         structure_data["detected_structure"] = document_structure
+        structure_data["toc_source"] = SOURCE_LLM
         return structure_data
     else:
         logger.error("Structure extraction failed or incomplete.")
@@ -198,6 +167,86 @@ def extract_toc(pdf_path: str) -> Dict[str, Any]:
             "llm_output": structure_data
         }
 
+def extract_toc(pdf_path: str) -> Dict[str, Any]:
+    """Extract a PDF's structure and TOC, asking the LLM only without a usable outline or printed TOC.
+
+    The result's "toc_source" records which tier answered: outline, printed, llm or none.
+    """
+    content, document_structure = _prepare_document(pdf_path)
+    if content is None:
+        return document_structure
+
+    client = load_openai_client()
+    if not client:
+        return {"error": "Failed to initialize OpenAI client"}
+
+    structure_data = extract_structure_llm(client, content)
+    return _finish_structure(structure_data, document_structure)
+
+async def extract_tocs_async(pdf_paths: Sequence[str], max_concurrency: Optional[int] = None,
+                             sample_workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """Extract the structure of several PDFs with overlapping LLM requests.
+
+    The page samples are read, and the outline and printed-TOC tiers tried, in a
+    thread pool. Documents those tiers cannot resolve go to the LLM through one
+    async client, at most ``max_concurrency`` requests at a time, so a batch takes
+    about as long as its slowest request rather than the sum of them all.
+
+    Args:
+        pdf_paths (Sequence[str]): The PDF files.
+        max_concurrency (Optional[int]): The cap on LLM requests in flight; defaults
+            to ``structure_extraction.max_concurrency``.
+        sample_workers (Optional[int]): Threads reading the samples; defaults to
+            ``structure_extraction.sample_workers`` or the CPU count.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Each path's result, as returned by ``extract_toc``.
+    """
+    settings = config.structure_extraction or {}
+    max_concurrency = max_concurrency or settings.get('max_concurrency', DEFAULT_MAX_CONCURRENCY)
+    sample_workers = sample_workers or settings.get('sample_workers') or os.cpu_count() or 1
+    pdf_paths = list(dict.fromkeys(pdf_paths))
+    if not pdf_paths:
+        return {}
+
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=min(sample_workers, len(pdf_paths))) as executor:
+        samples = await asyncio.gather(*(
+            loop.run_in_executor(executor, _prepare_document, pdf_path) for pdf_path in pdf_paths
+        ))
+
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = []
+    for pdf_path, (content, document_structure) in zip(pdf_paths, samples):
+        if content is None:
+            results[pdf_path] = document_structure
+        else:
+            pending.append((pdf_path, content, document_structure))
+    if not pending:
+        return results
+
+    try:
+        client = create_async_openai_client()
+    except Exception as e:
+        logger.error(f"Failed to initialize async OpenAI client: {e}", exc_info=True)
+        results.update({pdf_path: {"error": "Failed to initialize OpenAI client"} for pdf_path, _, _ in pending})
+        return results
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async with client:
+        structures = await asyncio.gather(*(
+            extract_structure_llm_async(client, content, semaphore) for _, content, _ in pending
+        ))
+    for (pdf_path, _, document_structure), structure_data in zip(pending, structures):
+        results[pdf_path] = _finish_structure(structure_data, document_structure)
+    logger.info(f"Extracted the structure of {len(pdf_paths)} documents")
+    return results
+
+def extract_tocs(pdf_paths: Sequence[str], max_concurrency: Optional[int] = None,
+                 sample_workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """Blocking wrapper around ``extract_tocs_async`` for synchronous callers."""
+    return asyncio.run(extract_tocs_async(pdf_paths, max_concurrency, sample_workers))
+
 def save_toc_to_json(toc_data: Dict[str, Any], output_file: str) -> None:
     try:
         with open(output_file, 'w') as f:
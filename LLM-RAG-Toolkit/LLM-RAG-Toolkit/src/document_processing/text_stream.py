@@ -0,0 +1,91 @@
+import os
+import re
+import mmap
+import logging
+from typing import Iterator, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Paragraphs are grouped into chunks of about this many bytes
+DEFAULT_CHUNK_BYTES = 1 << 16
+
+# Files at least this large are memory-mapped instead of read into memory
+DEFAULT_MMAP_THRESHOLD = 8 << 20
+
+# A blank line, possibly holding whitespace, with Unix or Windows line endings
+_PARAGRAPH_BREAK = re.compile(rb'\r?\n[ \t]*\r?\n')
+
+
+def _cut_position(buffer: Union[bytes, mmap.mmap], start: int, limit: int) -> int:
+    # The end of the chunk starting at start: the last paragraph break before limit,
+    # else the last line break, else limit moved back to a UTF-8 character boundary
+    cut = None
+    for match in _PARAGRAPH_BREAK.finditer(buffer, start, limit):
+        cut = match.end()
+    if cut is not None and cut > start:
+        return cut
+    newline = buffer.rfind(b'\n', start, limit)
+    if newline >= start:
+        return newline + 1
+    cut = limit
+    while cut > start and 0x80 <= buffer[cut] < 0xC0:
+        cut -= 1
+    if cut > start:
+        return cut
+    # A chunk size smaller than one character: take that whole character
+    cut = start + 1
+    while cut < len(buffer) and 0x80 <= buffer[cut] < 0xC0:
+        cut += 1
+    return cut
+
+
+def iter_text_chunks(buffer: Union[bytes, mmap.mmap], chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                     encoding: str = 'utf-8') -> Iterator[Tuple[int, str]]:
+    """Split UTF-8 text into chunks of whole paragraphs, decoding one chunk at a time.
+
+    Chunks end after a blank line where possible, so sentences and paragraphs are not
+    cut; text without blank lines is cut at a line break, and a single line longer
+    than chunk_bytes at a character boundary.
+
+    Args:
+        buffer (Union[bytes, mmap.mmap]): The encoded text.
+        chunk_bytes (int): The target chunk size in bytes.
+        encoding (str): The text encoding; must be ASCII-compatible.
+
+    Yields:
+        Tuple[int, str]: The byte offset and the decoded text of each chunk.
+    """
+    size = len(buffer)
+    start = 0
+    while start < size:
+        limit = start + chunk_bytes
+        end = size if limit >= size else _cut_position(buffer, start, limit)
+        yield start, buffer[start:end].decode(encoding, errors='replace')
+        start = end
+
+
+def iter_text_file(file_path: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                   mmap_threshold: int = DEFAULT_MMAP_THRESHOLD) -> Iterator[Tuple[int, str]]:
+    """Stream a text file as paragraph chunks without loading it whole.
+
+    Large files are memory-mapped, so the operating system pages their bytes in and
+    out as the chunks are read and memory stays flat however large the file is.
+
+    Args:
+        file_path (str): The path to the UTF-8 text file.
+        chunk_bytes (int): The target chunk size in bytes.
+        mmap_threshold (int): Files at least this large are memory-mapped.
+
+    Yields:
+        Tuple[int, str]: The byte offset and text of each chunk.
+    """
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        if size < mmap_threshold:
+            yield from iter_text_chunks(f.read(), chunk_bytes)
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            logger.debug(f"Streaming {os.path.basename(file_path)} ({size} bytes) through mmap")
+            yield from iter_text_chunks(mapped, chunk_bytes)
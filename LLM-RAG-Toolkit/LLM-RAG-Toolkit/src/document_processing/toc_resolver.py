@@ -0,0 +1,207 @@
+import re
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tiers that can answer, cheapest first
+SOURCE_OUTLINE = 'outline'
+SOURCE_PRINTED = 'printed'
+SOURCE_LLM = 'llm'
+SOURCE_NONE = 'none'
+
+# A tier's answer is used when its confidence reaches this
+DEFAULT_MIN_CONFIDENCE = 0.6
+
+# Printed tables of contents are looked for on this many opening pages
+DEFAULT_PRINTED_TOC_PAGES = 20
+
+# Fewer entries than this are not trusted as a table of contents
+MIN_PRINTED_ENTRIES = 3
+MIN_OUTLINE_ENTRIES = 2
+
+# (level, title, page number); page numbers are 1-based, 0 when unknown
+TocEntry = Tuple[int, str, int]
+
+_TOC_HEADING = re.compile(r'^\s*(?:table\s+of\s+contents|contents|toc)\s*$', re.IGNORECASE)
+# Front matter is numbered in lower-case roman numerals; upper-case letters are appendix labels
+_PAGE_NUMBER = re.compile(r'^\s*(\d{1,4}|[ivxlc]{1,7})\s*$')
+# A title, then dot leaders or whitespace, then the page number at the end of the line
+_TOC_LINE = re.compile(r'^\s*(?P<title>\S.*?)(?:\s*[.·…_]{2,}\s*|\s+)(?P<page>\d{1,4}|[ivxlc]{1,7})\s*$')
+_NUMBERING = re.compile(r'^(?:(?:chapter|part|section|appendix)\s+)?(\d+(?:\.\d+)*|[A-Z])\.?\s', re.IGNORECASE)
+_ROMAN_VALUES = {'i': 1, 'v': 5, 'x': 10, 'l': 50, 'c': 100}
+
+
+def _page_value(page: str) -> Tuple[int, bool]:
+    # Returns the page number and whether it is arabic; roman numbers mark front matter
+    if page.isdigit():
+        return int(page), True
+    values = [_ROMAN_VALUES[c] for c in page.lower()]
+    return sum(-v if v < nxt else v for v, nxt in zip(values, values[1:] + [0])), False
+
+
+def _entry_level(title: str) -> int:
+    match = _NUMBERING.match(title)
+    if match is None or not match.group(1)[0].isdigit():
+        return 1
+    return match.group(1).count('.') + 1
+
+
+def insert_toc_entry(toc_dict: Dict, level: int, title: str):
+    """Insert a TOC entry into the nested dictionary based on its level.
+
+    Args:
+        toc_dict (Dict): The current TOC dictionary.
+        level (int): The level of the TOC entry.
+        title (str): The title of the TOC entry.
+    """
+    current_level = toc_dict
+    for _ in range(level - 1):
+        if not current_level:
+            current_level[title] = {}
+            return
+        last_key = next(reversed(current_level))
+        current_level = current_level[last_key]
+    current_level[title] = {}
+
+
+def entries_to_tree(entries: Sequence[TocEntry]) -> Dict[str, Any]:
+    """Nest TOC entries into the title dictionary the segmenters consume."""
+    toc: Dict[str, Any] = {}
+    for level, title, _page in entries:
+        insert_toc_entry(toc, level, title)
+    return toc
+
+
+def outline_entries(outline: Sequence[list]) -> Tuple[List[TocEntry], float]:
+    """Read a PDF's embedded outline, as returned by ``get_toc``.
+
+    Returns:
+        Tuple[List[TocEntry], float]: The entries and the confidence in them.
+    """
+    entries = [
+        (int(entry[0]), entry[1].strip(), int(entry[2]))
+        for entry in outline if len(entry) >= 3 and entry[1].strip()
+    ]
+    if not entries:
+        return [], 0.0
+    return entries, 1.0 if len(entries) >= MIN_OUTLINE_ENTRIES else 0.5
+
+
+def _parse_toc_page(lines: Sequence[str]) -> Tuple[List[Tuple[int, str, str]], int]:
+    # Returns (level, title, page) entries and the number of non-blank lines read
+    entries, pending_title, content_lines = [], None, 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        content_lines += 1
+        page_only = _PAGE_NUMBER.match(line)
+        if page_only and pending_title:
+            # Title and page number extracted as separate lines
+            entries.append((_entry_level(pending_title), pending_title, page_only.group(1)))
+            pending_title = None
+            continue
+        match = _TOC_LINE.match(line)
+        if match and not _TOC_HEADING.match(line):
+            title = match.group('title').rstrip(' .·…_')
+            entries.append((_entry_level(title), title, match.group('page')))
+            pending_title = None
+        elif not page_only:
+            pending_title = f"{pending_title} {line}" if pending_title and len(pending_title) < 80 else line
+    return entries, content_lines
+
+
+def parse_printed_toc(pages: Sequence[str], page_count: Optional[int] = None,
+                      max_pages: int = DEFAULT_PRINTED_TOC_PAGES) -> Tuple[List[TocEntry], float]:
+    """Find a printed table of contents in the opening pages and parse its entries.
+
+    The TOC starts after a "Contents" or "Table of Contents" line and continues onto
+    the following pages while most of their lines still read as entries. Entry levels
+    come from section numbering such as "2.3". Confidence is the share of page numbers
+    that are in order and within the document.
+
+    Args:
+        pages (Sequence[str]): The text of each page.
+        page_count (Optional[int]): The number of pages, to reject impossible page numbers.
+        max_pages (int): The number of opening pages searched.
+
+    Returns:
+        Tuple[List[TocEntry], float]: The entries and the confidence in them.
+    """
+    page_count = page_count or len(pages)
+    raw: List[Tuple[int, str, str]] = []
+    for page_text in pages[:max_pages]:
+        lines = page_text.splitlines()
+        if not raw:
+            start = next((i for i, line in enumerate(lines) if _TOC_HEADING.match(line)), None)
+            if start is None:
+                continue
+            raw, _ = _parse_toc_page(lines[start + 1:])
+            continue
+        entries, content_lines = _parse_toc_page(lines)
+        if not content_lines or len(entries) < content_lines / 2:
+            break
+        raw.extend(entries)
+
+    if len(raw) < MIN_PRINTED_ENTRIES:
+        return [], 0.0
+
+    entries: List[TocEntry] = []
+    arabic: List[int] = []
+    for level, title, page in raw:
+        value, is_arabic = _page_value(page)
+        entries.append((level, title, value if is_arabic else 0))
+        if is_arabic:
+            arabic.append(value)
+    if len(arabic) < MIN_PRINTED_ENTRIES:
+        return entries, 0.0
+    # Printed numbers are offset from physical pages by the front matter, so only order and range are checked
+    ordered = sum(a <= b for a, b in zip(arabic, arabic[1:])) / (len(arabic) - 1)
+    in_range = sum(1 <= value <= page_count for value in arabic) / len(arabic)
+    return entries, ordered * in_range
+
+
+def resolve_toc(outline: Sequence[list], pages: Sequence[str], page_count: Optional[int] = None,
+                llm_fallback: Optional[Callable[[], Dict[str, Any]]] = None,
+                min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+                printed_toc_pages: int = DEFAULT_PRINTED_TOC_PAGES) -> Dict[str, Any]:
+    """Resolve a document's table of contents, trying the cheapest source first.
+
+    1. The embedded PDF outline.
+    2. A printed table of contents parsed from the opening pages.
+    3. ``llm_fallback``, called only when neither reaches ``min_confidence``.
+
+    Args:
+        outline (Sequence[list]): The embedded outline, e.g. ``ParsedDocument.outline``.
+        pages (Sequence[str]): The text of each page.
+        page_count (Optional[int]): The number of pages; defaults to ``len(pages)``.
+        llm_fallback (Optional[Callable[[], Dict[str, Any]]]): Returns a TOC dictionary
+            from the LLM. Without it, the best low-confidence answer is returned.
+        min_confidence (float): The confidence a tier needs to answer.
+        printed_toc_pages (int): The number of opening pages searched for a printed TOC.
+
+    Returns:
+        Dict[str, Any]: "toc" (the nested title dictionary), "entries" (level, title
+        and page of each entry, empty for the LLM tier), "source" (the tier that
+        answered: outline, printed, llm or none) and "confidence".
+    """
+    candidates = []
+    for source, (entries, confidence) in (
+        (SOURCE_OUTLINE, outline_entries(outline)),
+        (SOURCE_PRINTED, parse_printed_toc(pages, page_count, printed_toc_pages)),
+    ):
+        result = {"toc": entries_to_tree(entries), "entries": entries, "source": source, "confidence": confidence}
+        if confidence >= min_confidence:
+            logger.debug(f"TOC resolved from the {source} with {len(entries)} entries")
+            return result
+        candidates.append(result)
+
+    if llm_fallback is not None:
+        logger.debug("No confident outline or printed TOC, asking the LLM")
+        return {"toc": llm_fallback() or {}, "entries": [], "source": SOURCE_LLM, "confidence": None}
+
+    best = max(candidates, key=lambda result: result["confidence"])
+    if not best["entries"]:
+        return {"toc": {}, "entries": [], "source": SOURCE_NONE, "confidence": 0.0}
+    return best
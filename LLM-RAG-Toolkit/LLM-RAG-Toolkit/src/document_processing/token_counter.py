@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING = 'cl100k_base'
+
+# Number of per-text token counts remembered by each counter
+TOKEN_CACHE_SIZE = 65536
+
+_encodings: Dict[str, "tiktoken.Encoding"] = {}
+_encodings_lock = threading.Lock()
+
+
+def get_encoding(encoding_name: str = DEFAULT_ENCODING) -> "tiktoken.Encoding":
+    """Return the tiktoken encoding for a name, loading it once per process.
+
+    Args:
+        encoding_name (str): The tiktoken encoding name.
+
+    Returns:
+        tiktoken.Encoding: The shared encoding instance.
+    """
+    with _encodings_lock:
+        encoding = _encodings.get(encoding_name)
+        if encoding is None:
+            encoding = _encodings[encoding_name] = tiktoken.get_encoding(encoding_name)
+        return encoding
+
+
+def _text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class TokenCounter:
+    """Counts tokens with batched encoding and an LRU memo keyed by text hash.
+
+    Text is encoded with ``encode_ordinary``, so special-token markers found in
+    documents are counted as ordinary text instead of raising.
+    """
+
+    def __init__(self, encoding_name: str = DEFAULT_ENCODING, cache_size: int = TOKEN_CACHE_SIZE):
+        self.encoding_name = encoding_name
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def encoding(self) -> "tiktoken.Encoding":
+        return get_encoding(self.encoding_name)
+
+    def count(self, text: str) -> int:
+        """Return the number of tokens in the text.
+
+        Args:
+            text (str): The text to count.
+
+        Returns:
+            int: The token count.
+        """
+        return self.count_batch([text])[0]
+
+    def count_batch(self, texts: Iterable[str]) -> List[int]:
+        """Return the token count of each text, encoding all cache misses in one batch.
+
+        Args:
+            texts (Iterable[str]): The texts to count.
+
+        Returns:
+            List[int]: The token counts, in input order.
+        """
+        texts = list(texts)
+        keys = [_text_key(text) for text in texts]
+        counts: List[Optional[int]] = [None] * len(texts)
+        missing: Dict[bytes, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    counts[i] = cached
+
+        if missing:
+            pending = [texts[positions[0]] for positions in missing.values()]
+            encoded = self.encoding.encode_ordinary_batch(pending)
+            with self._lock:
+                for (key, positions), tokens in zip(missing.items(), encoded):
+                    for i in positions:
+                        counts[i] = len(tokens)
+                    self._cache[key] = len(tokens)
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return counts
+
+    def clear(self):
+        """Forget all memoized counts."""
+        with self._lock:
+            self._cache.clear()
+
+
+_counters: Dict[str, TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(encoding_name: str = DEFAULT_ENCODING) -> TokenCounter:
+    """Return the shared token counter for an encoding.
+
+    Args:
+        encoding_name (str): The tiktoken encoding name.
+
+    Returns:
+        TokenCounter: The counter shared by every caller using this encoding.
+    """
+    with _counters_lock:
+        counter = _counters.get(encoding_name)
+        if counter is None:
+            counter = _counters[encoding_name] = TokenCounter(encoding_name)
+        return counter
@@ -1,12 +1,15 @@
 import os
+from functools import lru_cache
 from openai import OpenAI
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize OpenAI client with the API key
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+@lru_cache(maxsize=None)
+def get_client() -> OpenAI:
+    """Create the OpenAI client with the API key on first use."""
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 # Your fine-tuned model ID
 fine_tuned_model_id = "ft:gpt-4o-mini-2024-07-18:personal::A4X2MjrJ"
@@ -16,7 +19,7 @@ fine_tune_job_id = "ftjob-Y2YiiDDsFd8pQFu64dvhCFf7"
 
 def get_fine_tuned_model_info(model_id):
     try:
-        response = client.models.retrieve(model_id)
+        response = get_client().models.retrieve(model_id)
         print(f"Model Info: {response}")
         return response
     except Exception as e:
@@ -24,7 +27,7 @@ def get_fine_tuned_model_info(model_id):
 
 def get_fine_tuning_job_info(job_id):
     try:
-        response = client.fine_tuning.jobs.retrieve(job_id)
+        response = get_client().fine_tuning.jobs.retrieve(job_id)
         print(f"Fine-Tuning Job Info:")
         print(f"  ID: {response.id}")
         print(f"  Status: {response.status}")
@@ -38,7 +41,7 @@ def get_fine_tuning_job_info(job_id):
 
 def list_fine_tune_events(job_id):
     try:
-        response = client.fine_tuning.jobs.list_events(job_id, limit=10)
+        response = get_client().fine_tuning.jobs.list_events(job_id, limit=10)
         print("Fine-Tuning Job Events:")
         for event in response:
             print(f"  {event.created_at}: {event.message}")
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Tuple
+from src.document_processing.parsed_document import compute_file_hash
+
+logger = logging.getLogger(__name__)
+
+STATUS_NEW = 'new'
+STATUS_CHANGED = 'changed'
+STATUS_UNCHANGED = 'unchanged'
+
+
+class IngestionManifest:
+    """Records what was produced from each source file, so unchanged files are not processed again.
+
+    Each source has an entry with its content hash, size and mtime, and the path and
+    version of every artifact made from it. A file is unchanged when its size and
+    mtime match (or, if they moved, its content hash still does), every artifact still
+    exists and every artifact version is current. The manifest is a JSON file written
+    atomically by ``save``.
+
+    Sources are keyed by absolute path, and an artifact file is only deleted once no
+    entry records it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # Content hashes computed this session, by path, size and mtime
+        self._hashes: Dict[Tuple[str, int, float], str] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self._entries = json.load(f)
+
+    def __contains__(self, file_path: str) -> bool:
+        return os.path.abspath(file_path) in self._entries
+
+    def sources(self) -> List[str]:
+        """The source files with an entry, as absolute paths."""
+        with self._lock:
+            return list(self._entries)
+
+    def artifacts(self, file_path: str) -> Dict[str, str]:
+        """The artifact paths recorded for a source file, by artifact name."""
+        with self._lock:
+            entry = self._entries.get(os.path.abspath(file_path), {})
+            return {name: artifact["path"] for name, artifact in entry.get("artifacts", {}).items()}
+
+    def status(self, file_path: str, artifact_versions: Dict[str, int]) -> str:
+        """Whether a source file is new, changed or unchanged since it was recorded.
+
+        The content is only hashed when the size or mtime differ from the entry.
+
+        Args:
+            file_path (str): The source file.
+            artifact_versions (Dict[str, int]): The current version of each artifact;
+                an entry with any other version, or missing an artifact, is changed.
+
+        Returns:
+            str: ``STATUS_NEW``, ``STATUS_CHANGED`` or ``STATUS_UNCHANGED``.
+        """
+        key = os.path.abspath(file_path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return STATUS_NEW
+
+        artifacts = entry.get("artifacts", {})
+        if any(artifacts.get(name, {}).get("version") != version for name, version in artifact_versions.items()):
+            return STATUS_CHANGED
+        if not all(os.path.exists(artifact["path"]) for artifact in artifacts.values()):
+            return STATUS_CHANGED
+
+        stat = os.stat(key)
+        if stat.st_size == entry["size"] and stat.st_mtime == entry["mtime"]:
+            return STATUS_UNCHANGED
+        if stat.st_size == entry["size"] and self._file_hash(key, stat) == entry["file_hash"]:
+            # Touched but not modified: remember the new mtime so the next run skips hashing
+            with self._lock:
+                entry["mtime"] = stat.st_mtime
+            return STATUS_UNCHANGED
+        return STATUS_CHANGED
+
+    def _file_hash(self, key: str, stat: os.stat_result) -> str:
+        hash_key = (key, stat.st_size, stat.st_mtime)
+        with self._lock:
+            file_hash = self._hashes.get(hash_key)
+        if file_hash is None:
+            file_hash = compute_file_hash(key)
+            with self._lock:
+                self._hashes[hash_key] = file_hash
+        return file_hash
+
+    def record(self, file_path: str, artifacts: Dict[str, str], artifact_versions: Dict[str, int]) -> List[str]:
+        """Record the artifacts just produced from a source file.
+
+        Artifact files of the previous entry that the new one no longer records are
+        deleted, only now that the new artifacts exist.
+
+        Args:
+            file_path (str): The source file.
+            artifacts (Dict[str, str]): The path of each artifact, by name.
+            artifact_versions (Dict[str, int]): The version each artifact was made with.
+
+        Returns:
+            List[str]: The stale artifact files deleted.
+        """
+        key = os.path.abspath(file_path)
+        stat = os.stat(key)
+        entry = {
+            "file_hash": self._file_hash(key, stat),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "artifacts": {
+                name: {"path": path, "version": artifact_versions.get(name)}
+                for name, path in artifacts.items()
+            },
+            "processed_at": time.time()
+        }
+        with self._lock:
+            previous = self._entries.get(key, {})
+            self._entries[key] = entry
+        return self._delete_unreferenced(artifact["path"] for artifact in previous.get("artifacts", {}).values())
+
+    def removed(self, present: Iterable[str]) -> List[str]:
+        """The recorded sources that are not among the present files."""
+        present = {os.path.abspath(file_path) for file_path in present}
+        with self._lock:
+            return [key for key in self._entries if key not in present]
+
+    def forget(self, file_path: str, delete_artifacts: bool = True) -> List[str]:
+        """Drop a source's entry, deleting its artifact files unless told not to.
+
+        Returns:
+            List[str]: The artifact files deleted.
+        """
+        with self._lock:
+            entry = self._entries.pop(os.path.abspath(file_path), None)
+        if entry is None or not delete_artifacts:
+            return []
+        return self._delete_unreferenced(artifact["path"] for artifact in entry.get("artifacts", {}).values())
+
+    def _delete_unreferenced(self, paths: Iterable[str]) -> List[str]:
+        # Delete the files no entry records any more
+        with self._lock:
+            referenced = {os.path.abspath(artifact["path"]) for entry in self._entries.values()
+                          for artifact in entry.get("artifacts", {}).values()}
+        deleted = []
+        for path in dict.fromkeys(paths):
+            if os.path.abspath(path) not in referenced and os.path.exists(path):
+                os.remove(path)
+                deleted.append(path)
+        return deleted
+
+    def save(self):
+        """Write the manifest to its file."""
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with self._lock:
+            with open(tmp_path, 'w') as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp_path, self.path)
@@ -1,18 +1,19 @@
 import os
 import time
 import logging
-from typing import Dict, Any, List  # Add List to the import
-from openai import OpenAI
+from typing import Dict, Any, List, Optional  # Add List to the import
 from utils.config_manager import config
+from utils.resources import get_openai_client
 
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=config.OPENAI_API_KEY)
-
-def estimate_cost(train_file_path: str, val_file_path: str, price_per_token: float = config.training['price_per_token']) -> float:
+def estimate_cost(train_file_path: str, val_file_path: str, price_per_token: Optional[float] = None) -> float:
     """
     Estimate the cost of fine-tuning based on the number of tokens in the training and validation files.
+    Uses the configured training price per token unless one is given.
     """
+    if price_per_token is None:
+        price_per_token = config.training['price_per_token']
     try:
         with open(train_file_path, 'r') as train_file, open(val_file_path, 'r') as val_file:
             train_tokens = sum(len(line.split()) for line in train_file)
@@ -32,7 +33,7 @@ def upload_file(file_path: str, purpose: str) -> str:
     try:
         logger.info(f"Uploading file {file_path} for purpose: {purpose}")
         with open(file_path, "rb") as file:
-            response = client.files.create(file=file, purpose=purpose)
+            response = get_openai_client().files.create(file=file, purpose=purpose)
         logger.info(f"File uploaded successfully: {response.id}")
         return response.id
     except Exception as e:
@@ -45,7 +46,7 @@ def create_fine_tuning_job(train_file_id: str, val_file_id: str) -> str:
     """
     try:
         logger.info("Creating fine-tuning job.")
-        response = client.fine_tuning.jobs.create(
+        response = get_openai_client().fine_tuning.jobs.create(
             training_file=train_file_id,
             validation_file=val_file_id,
             model=config.training['model_name'],
@@ -63,7 +64,7 @@ def monitor_fine_tuning(fine_tune_id: str, poll_interval: int = 60) -> None:
     """
     while True:
         try:
-            status = client.fine_tuning.jobs.retrieve(fine_tune_id)
+            status = get_openai_client().fine_tuning.jobs.retrieve(fine_tune_id)
             logger.info(f"Status: {status.status}")
             print(f"Status: {status.status}")
 
@@ -104,7 +105,7 @@ def get_fine_tuned_model_info(model_id: str) -> Dict[str, Any]:
     Retrieve information about a fine-tuned model.
     """
     try:
-        response = client.models.retrieve(model_id)
+        response = get_openai_client().models.retrieve(model_id)
         logger.info(f"Model Info: {response}")
         return response
     except Exception as e:
@@ -116,7 +117,7 @@ def get_fine_tuning_job_info(job_id: str) -> Dict[str, Any]:
     Retrieve information about a fine-tuning job.
     """
     try:
-        response = client.fine_tuning.jobs.retrieve(job_id)
+        response = get_openai_client().fine_tuning.jobs.retrieve(job_id)
         logger.info(f"Fine-Tuning Job Info: {response}")
         return response
     except Exception as e:
@@ -128,7 +129,7 @@ def list_fine_tune_events(job_id: str, limit: int = 10) -> List[Dict[str, Any]]:
     List events for a fine-tuning job.
     """
     try:
-        response = client.fine_tuning.jobs.list_events(job_id, limit=limit)
+        response = get_openai_client().fine_tuning.jobs.list_events(job_id, limit=limit)
         logger.info("Fine-Tuning Job Events retrieved successfully")
         return list(response)
     except Exception as e:
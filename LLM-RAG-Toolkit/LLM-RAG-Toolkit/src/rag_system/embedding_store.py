@@ -0,0 +1,427 @@
+import os
+import time
+import hashlib
+import logging
+import argparse
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import faiss
+from .indexer import TRAINING_POINTS_PER_CENTROID, default_pq_subquantizers
+
+logger = logging.getLogger(__name__)
+
+STORAGE_FLOAT32 = 'float32'
+STORAGE_FP16 = 'fp16'
+STORAGE_SQ8 = 'sq8'
+STORAGE_PQ = 'pq'
+STORAGE_MODES = (STORAGE_FLOAT32, STORAGE_FP16, STORAGE_SQ8, STORAGE_PQ)
+
+# A search scans k * rescore_factor candidates by their codes before re-scoring them exactly
+DEFAULT_RESCORE_FACTOR = 4
+
+# Codes are decoded and scanned this many rows at a time, bounding the float32 working set
+SCAN_BLOCK_ROWS = 1 << 14
+
+# PQ codes are one byte per sub-vector
+PQ_MAX_CENTROIDS = 256
+
+# Limits of the float32 copies kept for re-scoring, 4 * dim bytes per vector
+DEFAULT_FLOAT_MAX_MEGABYTES = 2048
+DEFAULT_FLOAT_MAX_AGE_DAYS = 30
+
+_FLOAT_SUFFIX = '.npy'
+
+
+class EmbeddingStore:
+    """Embeddings kept as compact codes, with optional exact re-scoring from a float32 copy.
+
+    Storage modes, in bytes per vector for dimension d:
+
+    - ``float32``: 4d, the vectors as they are.
+    - ``fp16``: 2d, half precision.
+    - ``sq8``: d, each dimension scaled to 8 bits between its trained minimum and maximum.
+    - ``pq``: m, one byte per sub-vector naming its nearest of 256 trained centroids.
+
+    ``search`` scans the codes, then, when a float32 copy is attached (normally a
+    memory-mapped ``.npy`` file, so it stays on disk), re-scores the best
+    ``k * rescore_factor`` candidates exactly. Only those rows of the float file are
+    read. Distances are squared L2 for the 'l2' metric and inner products for 'ip',
+    ordered as FAISS orders them, so the store can stand in for a flat index.
+    """
+
+    def __init__(self, dim: int, storage: str = STORAGE_FP16, metric: str = 'l2',
+                 pq_m: Optional[int] = None, rescore_factor: int = DEFAULT_RESCORE_FACTOR):
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"Unknown embedding storage: {storage}")
+        if metric not in ('l2', 'ip'):
+            raise ValueError(f"Unknown metric: {metric}")
+        self.dim = dim
+        self.storage = storage
+        self.metric = metric
+        self.rescore_factor = rescore_factor
+        self.pq_m = (pq_m or default_pq_subquantizers(dim)) if storage == STORAGE_PQ else None
+        if self.pq_m and dim % self.pq_m:
+            raise ValueError(f"PQ sub-quantizers ({self.pq_m}) must divide the dimension ({dim})")
+        code_dtype, code_width = {
+            STORAGE_FLOAT32: (np.float32, dim),
+            STORAGE_FP16: (np.float16, dim),
+            STORAGE_SQ8: (np.uint8, dim),
+            STORAGE_PQ: (np.uint8, self.pq_m),
+        }[storage]
+        self.codes = np.empty((0, code_width), dtype=code_dtype)
+        self.floats: Optional[np.ndarray] = None
+        # sq8: per-dimension minimum and step; pq: (m, centroids, dim / m) codebooks
+        self._sq_min: Optional[np.ndarray] = None
+        self._sq_step: Optional[np.ndarray] = None
+        self._codebooks: Optional[np.ndarray] = None
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.codes), self.dim
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def ntotal(self) -> int:
+        return len(self.codes)
+
+    @property
+    def is_trained(self) -> bool:
+        if self.storage == STORAGE_SQ8:
+            return self._sq_min is not None
+        if self.storage == STORAGE_PQ:
+            return self._codebooks is not None
+        return True
+
+    @property
+    def nbytes(self) -> int:
+        """The memory held by the codes and codebooks; an attached float copy is not counted."""
+        return self.codes.nbytes + sum(
+            array.nbytes for array in (self._sq_min, self._sq_step, self._codebooks) if array is not None)
+
+    def train(self, vectors: np.ndarray, seed: int = 0):
+        """Fit the SQ ranges or PQ codebooks; a no-op for float32 and fp16.
+
+        Args:
+            vectors (np.ndarray): The vectors to fit on, usually the whole corpus.
+            seed (int): The sampling and k-means seed.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.storage == STORAGE_SQ8:
+            self._sq_min = vectors.min(axis=0)
+            step = (vectors.max(axis=0) - self._sq_min) / 255
+            self._sq_step = np.where(step > 0, step, 1).astype(np.float32)
+        elif self.storage == STORAGE_PQ:
+            if len(vectors) == 0:
+                raise ValueError("PQ storage needs vectors to train on")
+            centroids = min(PQ_MAX_CENTROIDS, len(vectors))
+            sample_size = centroids * TRAINING_POINTS_PER_CENTROID
+            if len(vectors) > sample_size:
+                rows = np.random.default_rng(seed).choice(len(vectors), sample_size, replace=False)
+                vectors = vectors[np.sort(rows)]
+            codebooks = []
+            for j, sub in enumerate(self._split(vectors)):
+                # faiss.Clustering rather than faiss.Kmeans, whose centroid copy breaks when
+                # pymupdf's SWIG vector types are loaded in the same process
+                clustering = faiss.Clustering(sub.shape[1], centroids)
+                clustering.niter = 20
+                clustering.seed = seed + j
+                quantizer = faiss.IndexFlatL2(sub.shape[1])
+                clustering.train(np.ascontiguousarray(sub), quantizer)
+                codebooks.append(quantizer.reconstruct_n(0, centroids))
+            self._codebooks = np.stack(codebooks)
+
+    def _split(self, vectors: np.ndarray) -> List[np.ndarray]:
+        return np.split(vectors, self.pq_m, axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Encode float vectors with the trained codec."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.storage in (STORAGE_FLOAT32, STORAGE_FP16):
+            return vectors.astype(self.codes.dtype)
+        if self.storage == STORAGE_SQ8:
+            return np.clip(np.rint((vectors - self._sq_min) / self._sq_step), 0, 255).astype(np.uint8)
+        codes = np.empty((len(vectors), self.pq_m), dtype=np.uint8)
+        for j, sub in enumerate(self._split(vectors)):
+            centroids = self._codebooks[j]
+            distances = (centroids ** 2).sum(axis=1) - 2 * sub @ centroids.T
+            codes[:, j] = distances.argmin(axis=1)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Decode codes back to approximate float32 vectors."""
+        if self.storage in (STORAGE_FLOAT32, STORAGE_FP16):
+            return codes.astype(np.float32)
+        if self.storage == STORAGE_SQ8:
+            return codes * self._sq_step + self._sq_min
+        return np.concatenate([self._codebooks[j][codes[:, j]] for j in range(self.pq_m)], axis=1)
+
+    def add(self, vectors: np.ndarray):
+        """Encode and append vectors, training the codec on them first if needed."""
+        if not self.is_trained:
+            self.train(vectors)
+        self.codes = np.concatenate([self.codes, self.encode(vectors)])
+
+    def attach_floats(self, floats: Optional[np.ndarray]):
+        """Use a float32 copy of the vectors, in the same order, to re-score search candidates."""
+        if floats is not None and floats.shape != self.shape:
+            raise ValueError(f"Float copy has shape {floats.shape}, expected {self.shape}")
+        self.floats = floats
+
+    def _scan(self, queries: np.ndarray, candidates: int) -> Tuple[np.ndarray, np.ndarray]:
+        # The (queries, candidates) best distances from the codes and their rows, unordered;
+        # lower is closer for both metrics. Only a running top set and one block of
+        # distances are held, never a distance for every vector.
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self.codes), SCAN_BLOCK_ROWS):
+            block = self.codes[start:start + SCAN_BLOCK_ROWS]
+            if self.storage == STORAGE_PQ:
+                block_scores = self._pq_scan(queries, block)
+            else:
+                block_scores = self._exact(queries, self.decode(block))
+            block_rows = np.broadcast_to(np.arange(start, start + len(block), dtype=np.int64), block_scores.shape)
+            best_scores = np.concatenate([best_scores, block_scores.astype(np.float32, copy=False)], axis=1)
+            best_rows = np.concatenate([best_rows, block_rows], axis=1)
+            if best_scores.shape[1] > candidates:
+                keep = np.argpartition(best_scores, candidates - 1, axis=1)[:, :candidates]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        return best_scores, best_rows
+
+    def _pq_scan(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # Asymmetric distances: a (sub-vector, centroid) table per query, summed over the codes
+        scores = np.zeros((len(queries), len(codes)), dtype=np.float32)
+        for j, sub in enumerate(self._split(queries)):
+            centroids = self._codebooks[j]
+            if self.metric == 'l2':
+                table = ((sub[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+            else:
+                table = -(sub @ centroids.T)
+            scores += table[:, codes[:, j]]
+        return scores
+
+    def _exact(self, queries: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        if self.metric == 'ip':
+            return -(queries @ vectors.T)
+        return (queries ** 2).sum(axis=1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(axis=1)[None, :]
+
+    def search(self, queries: np.ndarray, k: int, rescore_factor: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the distances and ids of the k nearest vectors to each query, like a FAISS index.
+
+        Args:
+            queries (np.ndarray): The (n, dim) query vectors.
+            k (int): The number of neighbours per query; missing hits have id -1.
+            rescore_factor (Optional[int]): Candidates re-scored per neighbour when a
+                float copy is attached; defaults to the store's setting, 1 disables.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The (n, k) distances and ids.
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        distances = np.full((len(queries), k), np.inf if self.metric == 'l2' else -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        if not len(self.codes):
+            return distances, ids
+
+        factor = (rescore_factor or self.rescore_factor) if self.floats is not None else 1
+        candidates = min(k * max(factor, 1), len(self.codes))
+        scores, top = self._scan(queries, candidates)
+        for row, query in enumerate(queries):
+            # Sorted rows keep reads from the float file sequential and ties in id order
+            by_row = np.argsort(top[row])
+            rows = top[row][by_row]
+            if factor > 1:
+                row_scores = self._exact(query[None, :], np.asarray(self.floats[rows], dtype=np.float32))[0]
+            else:
+                row_scores = scores[row][by_row]
+            order = np.argsort(row_scores, kind='stable')[:k]
+            ids[row, :len(order)] = rows[order]
+            distances[row, :len(order)] = -row_scores[order] if self.metric == 'ip' else row_scores[order]
+        return distances, ids
+
+
+def _float_file(vectors: np.ndarray, float_dir: str,
+                max_megabytes: float = DEFAULT_FLOAT_MAX_MEGABYTES,
+                max_age_days: float = DEFAULT_FLOAT_MAX_AGE_DAYS) -> np.ndarray:
+    # The float32 copy for re-scoring, written once per distinct set of vectors and memory-mapped
+    os.makedirs(float_dir, exist_ok=True)
+    path = os.path.join(float_dir, hashlib.sha256(vectors.tobytes()).hexdigest()[:32] + _FLOAT_SUFFIX)
+    if os.path.exists(path):
+        # Record the use so eviction drops the least recently used copies first
+        os.utime(path, None)
+    else:
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, vectors)
+        os.replace(tmp_path, path)
+    evict_float_files(float_dir, max_megabytes, max_age_days, keep=path)
+    return np.load(path, mmap_mode='r')
+
+
+def evict_float_files(float_dir: str, max_megabytes: float = DEFAULT_FLOAT_MAX_MEGABYTES,
+                      max_age_days: float = DEFAULT_FLOAT_MAX_AGE_DAYS, keep: Optional[str] = None) -> int:
+    """Remove float copies past the age limit, then the least recently used over the size limit.
+
+    Args:
+        float_dir (str): The directory of float copies.
+        max_megabytes (float): The total size kept.
+        max_age_days (float): Copies unused for longer are removed.
+        keep (Optional[str]): A copy never removed, normally the one just used.
+
+    Returns:
+        int: The number of files removed.
+    """
+    files = []
+    for name in os.listdir(float_dir):
+        path = os.path.join(float_dir, name)
+        if name.endswith(_FLOAT_SUFFIX) and path != keep:
+            stat = os.stat(path)
+            files.append((stat.st_mtime, stat.st_size, path))
+    # Most recently used first
+    files.sort(reverse=True)
+
+    removed = 0
+    cutoff = time.time() - max_age_days * 86400
+    kept = []
+    for last_used, size, path in files:
+        if last_used < cutoff:
+            removed += _remove(path)
+        else:
+            kept.append((size, path))
+
+    total = sum(size for size, _ in kept) + (os.path.getsize(keep) if keep and os.path.exists(keep) else 0)
+    while kept and total > max_megabytes * 1024 * 1024:
+        size, path = kept.pop()
+        total -= size
+        removed += _remove(path)
+    return removed
+
+
+def _remove(path: str) -> int:
+    # Open memory maps of a removed copy stay readable until they are closed
+    try:
+        os.remove(path)
+        return 1
+    except FileNotFoundError:
+        return 0
+
+
+def build_embedding_store(vectors: np.ndarray, storage: str = STORAGE_FP16, metric: str = 'l2',
+                          pq_m: Optional[int] = None, rescore_factor: int = DEFAULT_RESCORE_FACTOR,
+                          float_dir: Optional[str] = None,
+                          float_max_megabytes: float = DEFAULT_FLOAT_MAX_MEGABYTES,
+                          float_max_age_days: float = DEFAULT_FLOAT_MAX_AGE_DAYS,
+                          seed: int = 0) -> EmbeddingStore:
+    """Compress vectors into an embedding store.
+
+    With re-scoring enabled (``rescore_factor`` above 1 and a ``float_dir``), a float32
+    copy of the vectors, 4 * dim bytes each, is written to ``float_dir`` once per
+    distinct set of vectors. Copies over ``float_max_megabytes`` in total, least
+    recently used first, or unused for ``float_max_age_days`` are removed.
+
+    Args:
+        vectors (np.ndarray): The (n, dim) float vectors.
+        storage (str): 'float32', 'fp16', 'sq8' or 'pq'.
+        metric (str): 'l2' or 'ip'.
+        pq_m (Optional[int]): PQ sub-vectors, i.e. bytes per vector; must divide dim.
+        rescore_factor (int): Candidates re-scored per neighbour.
+        float_dir (Optional[str]): Where to keep the float32 copy used for re-scoring;
+            None searches the codes alone.
+        float_max_megabytes (float): The disk space kept for float copies.
+        float_max_age_days (float): Float copies unused for longer are removed.
+        seed (int): The training seed.
+
+    Returns:
+        EmbeddingStore: The store holding every vector, with ids in input order.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    store = EmbeddingStore(vectors.shape[1], storage, metric, pq_m, rescore_factor)
+    store.train(vectors, seed)
+    store.add(vectors)
+    if float_dir is not None and storage != STORAGE_FLOAT32 and rescore_factor > 1:
+        store.attach_floats(_float_file(vectors, float_dir, float_max_megabytes, float_max_age_days))
+    return store
+
+
+def recall_at_k(found: np.ndarray, expected: np.ndarray) -> float:
+    """The mean share of each query's expected neighbours among those found."""
+    k = expected.shape[1]
+    return float(np.mean([len(set(f) & set(e)) / k for f, e in zip(found.tolist(), expected.tolist())]))
+
+
+def evaluate_storage(vectors: np.ndarray, queries: Optional[np.ndarray] = None, k: int = 10,
+                     modes: Sequence[str] = STORAGE_MODES, metric: str = 'l2', n_queries: int = 100,
+                     rescore_factor: int = DEFAULT_RESCORE_FACTOR, pq_m: Optional[int] = None,
+                     seed: int = 0) -> List[Dict[str, Any]]:
+    """Measure the memory and recall@k of each storage mode against exact float32 search.
+
+    Args:
+        vectors (np.ndarray): The corpus vectors.
+        queries (Optional[np.ndarray]): The query vectors; by default n_queries vectors
+            sampled from the corpus.
+        k (int): The neighbours compared per query.
+        modes (Sequence[str]): The storage modes to measure.
+        metric (str): 'l2' or 'ip'.
+        n_queries (int): The number of sampled queries when none are given.
+        rescore_factor (int): Candidates re-scored per neighbour.
+        pq_m (Optional[int]): PQ sub-vectors.
+        seed (int): The sampling and training seed.
+
+    Returns:
+        List[Dict[str, Any]]: Per mode, "storage", "bytes", "bytes_per_vector",
+        "compression" (float32 bytes over the mode's bytes), "recall" from the codes
+        alone and "rescored_recall" after exact re-scoring.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if queries is None:
+        rows = np.random.default_rng(seed).choice(len(vectors), min(n_queries, len(vectors)), replace=False)
+        queries = vectors[rows]
+    exact = EmbeddingStore(vectors.shape[1], STORAGE_FLOAT32, metric)
+    exact.add(vectors)
+    _, expected = exact.search(queries, k)
+
+    report = []
+    for mode in modes:
+        store = build_embedding_store(vectors, mode, metric, pq_m, rescore_factor, seed=seed)
+        recall = recall_at_k(store.search(queries, k)[1], expected)
+        store.attach_floats(vectors)
+        report.append({
+            "storage": mode,
+            "bytes": store.nbytes,
+            "bytes_per_vector": store.nbytes / len(vectors),
+            "compression": exact.nbytes / store.nbytes,
+            "recall": recall,
+            "rescored_recall": recall_at_k(store.search(queries, k)[1], expected)
+        })
+    return report
+
+
+def get_storage_settings() -> Dict[str, Any]:
+    """The ``embedding_storage`` settings as keyword arguments for ``build_embedding_store``."""
+    from utils.config_manager import config
+    settings = dict(config.embedding_storage or {})
+    return {key: value for key, value in settings.items() if value is not None}
+
+
+def main(argv: Optional[List[str]] = None):
+    """Print the storage report for embeddings saved with ``np.save``."""
+    parser = argparse.ArgumentParser(description="Compare embedding storage modes against float32.")
+    parser.add_argument('embeddings', help="A .npy file of (n, dim) embeddings.")
+    parser.add_argument('--k', type=int, default=10, help="Neighbours compared per query.")
+    parser.add_argument('--queries', type=int, default=100, help="Queries sampled from the embeddings.")
+    parser.add_argument('--metric', choices=('l2', 'ip'), default='l2')
+    parser.add_argument('--pq-m', type=int, help="PQ sub-vectors (bytes per vector).")
+    args = parser.parse_args(argv)
+
+    vectors = np.load(args.embeddings, mmap_mode='r')
+    print(f"{len(vectors)} vectors of dimension {vectors.shape[1]}, recall@{args.k}")
+    print(f"{'storage':<8} {'MB':>9} {'B/vector':>9} {'ratio':>6} {'recall':>7} {'rescored':>9}")
+    for row in evaluate_storage(vectors, k=args.k, metric=args.metric, n_queries=args.queries, pq_m=args.pq_m):
+        print(f"{row['storage']:<8} {row['bytes'] / (1 << 20):>9.2f} {row['bytes_per_vector']:>9.1f} "
+              f"{row['compression']:>5.1f}x {row['recall']:>7.3f} {row['rescored_recall']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+import os
+import json
+import math
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+BACKEND_FLAT = 'flat'
+BACKEND_IVF_FLAT = 'ivf_flat'
+BACKEND_IVF_PQ = 'ivf_pq'
+BACKEND_HNSW = 'hnsw'
+
+# Query latency aimed for when choosing a backend automatically
+DEFAULT_LATENCY_TARGET_MS = 10.0
+
+# Multiply-adds a brute-force scan does per millisecond on one core; used to estimate
+# flat search latency.
+FLAT_MACS_PER_MS = 1e7
+
+# Above this many vectors, building an HNSW graph takes too long; IVF is used instead
+HNSW_MAX_VECTORS = 2_000_000
+
+# FAISS wants at least this many training points per IVF list or PQ centroid
+MIN_POINTS_PER_CENTROID = 39
+TRAINING_POINTS_PER_CENTROID = 64
+
+METRICS = {'l2': faiss.METRIC_L2, 'ip': faiss.METRIC_INNER_PRODUCT}
+
+
+def _as_float32(vectors: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+class VectorIndex:
+    """A nearest-neighbour index over float vectors, backed by FAISS.
+
+    Subclasses build the FAISS index in ``_create`` and apply their query-time knobs
+    in ``set_search_params``. Vectors get sequential ids in the order they are added.
+    """
+
+    backend = 'index'
+
+    def __init__(self, dim: int, metric: str = 'l2'):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        self.dim = dim
+        self.metric = metric
+        self.index = self._create()
+
+    def _create(self) -> "faiss.Index":
+        raise NotImplementedError
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    @property
+    def is_trained(self) -> bool:
+        return self.index.is_trained
+
+    def params(self) -> Dict[str, Any]:
+        """The construction and search settings, enough to recreate the index."""
+        return {}
+
+    def train(self, vectors: np.ndarray, seed: int = 0):
+        """Train the index on vectors; a no-op for backends that need no training."""
+
+    def add(self, vectors: np.ndarray):
+        """Add vectors, training the index on them first if it has not been trained."""
+        vectors = _as_float32(vectors)
+        if not self.is_trained:
+            self.train(vectors)
+        self.index.add(vectors)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the distances and ids of the k nearest vectors to each query; missing hits have id -1."""
+        return self.index.search(_as_float32(queries), k)
+
+    def set_search_params(self, **params):
+        """Change query-time settings such as ``nprobe`` or ``ef_search``."""
+        if params:
+            raise TypeError(f"{self.backend} index has no search parameters {sorted(params)}")
+
+    def save(self, path: str):
+        """Write the index to path, with its backend and settings in ``<path>.json``."""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        faiss.write_index(self.index, path)
+        with open(path + '.json', 'w') as f:
+            json.dump({"backend": self.backend, "dim": self.dim, "metric": self.metric, **self.params()}, f)
+
+
+class FlatIndex(VectorIndex):
+    """Exact brute-force search; best for small corpora."""
+
+    backend = BACKEND_FLAT
+
+    def _create(self) -> "faiss.Index":
+        return faiss.IndexFlat(self.dim, METRICS[self.metric])
+
+
+class IVFFlatIndex(VectorIndex):
+    """Inverted lists over k-means cells; a query scans only the ``nprobe`` nearest cells."""
+
+    backend = BACKEND_IVF_FLAT
+
+    def __init__(self, dim: int, metric: str = 'l2', nlist: int = 1024, nprobe: int = 16):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        super().__init__(dim, metric)
+
+    def _create(self) -> "faiss.Index":
+        # Keep the coarse quantizer referenced; FAISS does not own it
+        self.quantizer = faiss.IndexFlat(self.dim, METRICS[self.metric])
+        index = faiss.IndexIVFFlat(self.quantizer, self.dim, self.nlist, METRICS[self.metric])
+        index.nprobe = self.nprobe
+        return index
+
+    def params(self) -> Dict[str, Any]:
+        return {"nlist": self.nlist, "nprobe": self.nprobe}
+
+    def _training_points(self) -> int:
+        return self.nlist * TRAINING_POINTS_PER_CENTROID
+
+    def train(self, vectors: np.ndarray, seed: int = 0):
+        """Train the centroids on a random sample of the vectors.
+
+        Args:
+            vectors (np.ndarray): The vectors to sample from, usually the whole corpus.
+            seed (int): The sampling seed.
+        """
+        vectors = _as_float32(vectors)
+        if len(vectors) < self.nlist * MIN_POINTS_PER_CENTROID:
+            logger.warning(f"Training {self.backend} with {len(vectors)} vectors for {self.nlist} lists; "
+                           f"recall may suffer below {self.nlist * MIN_POINTS_PER_CENTROID}")
+        sample_size = self._training_points()
+        if len(vectors) > sample_size:
+            rows = np.random.default_rng(seed).choice(len(vectors), sample_size, replace=False)
+            vectors = vectors[np.sort(rows)]
+        self.index.train(vectors)
+
+    def set_search_params(self, nprobe: Optional[int] = None, **params):
+        super().set_search_params(**params)
+        if nprobe is not None:
+            self.nprobe = self.index.nprobe = nprobe
+
+
+class IVFPQIndex(IVFFlatIndex):
+    """IVF with product-quantized vectors: ``m`` bytes per vector at 8 bits, for corpora that outgrow memory."""
+
+    backend = BACKEND_IVF_PQ
+
+    def __init__(self, dim: int, metric: str = 'l2', nlist: int = 1024, nprobe: int = 16,
+                 m: Optional[int] = None, nbits: int = 8):
+        self.m = m or default_pq_subquantizers(dim)
+        self.nbits = nbits
+        if dim % self.m:
+            raise ValueError(f"PQ sub-quantizers ({self.m}) must divide the dimension ({dim})")
+        super().__init__(dim, metric, nlist, nprobe)
+
+    def _create(self) -> "faiss.Index":
+        self.quantizer = faiss.IndexFlat(self.dim, METRICS[self.metric])
+        index = faiss.IndexIVFPQ(self.quantizer, self.dim, self.nlist, self.m, self.nbits, METRICS[self.metric])
+        index.nprobe = self.nprobe
+        return index
+
+    def params(self) -> Dict[str, Any]:
+        return {**super().params(), "m": self.m, "nbits": self.nbits}
+
+    def _training_points(self) -> int:
+        # The PQ codebooks need samples for each of their 2**nbits centroids too
+        return max(self.nlist, 2 ** self.nbits) * TRAINING_POINTS_PER_CENTROID
+
+
+class HNSWIndex(VectorIndex):
+    """A hierarchical navigable small world graph: fast queries at high recall, no training."""
+
+    backend = BACKEND_HNSW
+
+    def __init__(self, dim: int, metric: str = 'l2', m: int = 32, ef_construction: int = 80, ef_search: int = 64):
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        super().__init__(dim, metric)
+
+    def _create(self) -> "faiss.Index":
+        index = faiss.IndexHNSWFlat(self.dim, self.m, METRICS[self.metric])
+        index.hnsw.efConstruction = self.ef_construction
+        index.hnsw.efSearch = self.ef_search
+        return index
+
+    def params(self) -> Dict[str, Any]:
+        return {"m": self.m, "ef_construction": self.ef_construction, "ef_search": self.ef_search}
+
+    def set_search_params(self, ef_search: Optional[int] = None, **params):
+        super().set_search_params(**params)
+        if ef_search is not None:
+            self.ef_search = self.index.hnsw.efSearch = ef_search
+
+
+_backends: Dict[str, Callable[..., VectorIndex]] = {
+    BACKEND_FLAT: FlatIndex,
+    BACKEND_IVF_FLAT: IVFFlatIndex,
+    BACKEND_IVF_PQ: IVFPQIndex,
+    BACKEND_HNSW: HNSWIndex,
+}
+
+
+def register_index_backend(name: str, factory: Callable[..., VectorIndex]):
+    """Make an index backend available under a name for the ``vector_index.backend`` setting.
+
+    Args:
+        name (str): The backend name.
+        factory (Callable[..., VectorIndex]): Called with the dimension, the metric and
+            the backend's keyword settings.
+    """
+    _backends[name] = factory
+
+
+def create_index(backend: str, dim: int, metric: str = 'l2', **settings) -> VectorIndex:
+    """Create an empty index of a registered backend.
+
+    Raises:
+        ValueError: If no backend is registered under the name.
+    """
+    if backend not in _backends:
+        raise ValueError(f"Unknown index backend: {backend}")
+    return _backends[backend](dim, metric, **settings)
+
+
+def default_pq_subquantizers(dim: int) -> int:
+    """The largest divisor of dim that gives sub-vectors of at least 8 dimensions, e.g. 48 for 384."""
+    return next((m for m in range(max(dim // 8, 1), 0, -1) if dim % m == 0), 1)
+
+
+def default_nlist(n_vectors: int) -> int:
+    """About 4 * sqrt(n) inverted lists, with enough training points for each."""
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def _fit_ivf_settings(backend: str, settings: Dict[str, Any], n_vectors: int) -> Dict[str, Any]:
+    """Size the IVF lists (and PQ codebooks) for the corpus when not set, capped at its size.
+
+    k-means cannot train more centroids than there are training vectors.
+    """
+    settings = dict(settings)
+    if settings.get('nlist') is None:
+        settings['nlist'] = default_nlist(n_vectors)
+    elif settings['nlist'] > n_vectors:
+        logger.warning(f"Capping nlist at {n_vectors} for {n_vectors} vectors (was {settings['nlist']})")
+        settings['nlist'] = max(1, n_vectors)
+    nbits = settings.get('nbits', 8)
+    if backend == BACKEND_IVF_PQ and 2 ** nbits > n_vectors:
+        settings['nbits'] = max(1, int(math.log2(max(n_vectors, 2))))
+        logger.warning(f"Using {settings['nbits']} PQ bits for {n_vectors} vectors (was {nbits})")
+    return settings
+
+
+def estimate_flat_latency_ms(n_vectors: int, dim: int) -> float:
+    """The estimated time of one brute-force query over n_vectors vectors."""
+    return n_vectors * dim / FLAT_MACS_PER_MS
+
+
+def choose_backend(n_vectors: int, dim: int, latency_target_ms: float = DEFAULT_LATENCY_TARGET_MS,
+                   memory_budget_mb: Optional[float] = None) -> Tuple[str, Dict[str, Any]]:
+    """Pick the index backend and settings for a corpus.
+
+    Exact flat search is kept while a scan fits the latency target. Beyond that, HNSW
+    is used while the full vectors fit the memory budget and the graph is quick to
+    build, IVF-Flat for larger corpora that still fit, and IVF-PQ once the full
+    vectors would not fit.
+
+    Args:
+        n_vectors (int): The number of vectors to index.
+        dim (int): Their dimension.
+        latency_target_ms (float): The query latency to stay under.
+        memory_budget_mb (Optional[float]): The memory the vectors may take; None for no limit.
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: The backend name and its settings.
+    """
+    if estimate_flat_latency_ms(n_vectors, dim) <= latency_target_ms:
+        return BACKEND_FLAT, {}
+    raw_mb = n_vectors * dim * 4 / (1 << 20)
+    if memory_budget_mb is None or raw_mb <= memory_budget_mb:
+        if n_vectors <= HNSW_MAX_VECTORS:
+            return BACKEND_HNSW, {}
+        return BACKEND_IVF_FLAT, {"nlist": default_nlist(n_vectors)}
+    return BACKEND_IVF_PQ, {"nlist": default_nlist(n_vectors)}
+
+
+def build_vector_index(vectors: np.ndarray, backend: str = 'auto', metric: str = 'l2',
+                       latency_target_ms: float = DEFAULT_LATENCY_TARGET_MS,
+                       memory_budget_mb: Optional[float] = None,
+                       backend_settings: Optional[Dict[str, Dict[str, Any]]] = None, **settings) -> VectorIndex:
+    """Build an index over vectors, training it first if the backend needs it.
+
+    Args:
+        vectors (np.ndarray): The (n, dim) vectors.
+        backend (str): A registered backend, or 'auto' to use ``choose_backend``.
+        metric (str): 'l2' or 'ip'.
+        latency_target_ms (float): The latency target for 'auto'.
+        memory_budget_mb (Optional[float]): The memory budget for 'auto'.
+        backend_settings (Optional[Dict[str, Dict[str, Any]]]): Settings for each
+            backend, by name; only those of the backend used are applied.
+        **settings: Settings for the backend used, such as ``nlist``, ``nprobe`` or
+            ``ef_search``; they override the automatic choice and backend_settings.
+            IVF backends without ``nlist`` get ``default_nlist`` lists, and ``nlist``
+            is capped at the number of vectors.
+
+    Returns:
+        VectorIndex: The index holding every vector, with ids in input order.
+    """
+    vectors = _as_float32(vectors)
+    n_vectors, dim = vectors.shape
+    if backend == 'auto':
+        backend, chosen = choose_backend(n_vectors, dim, latency_target_ms, memory_budget_mb)
+        settings = {**chosen, **(backend_settings or {}).get(backend, {}), **settings}
+        logger.info(f"Indexing {n_vectors} vectors with the {backend} backend")
+    else:
+        settings = {**(backend_settings or {}).get(backend, {}), **settings}
+    if backend in (BACKEND_IVF_FLAT, BACKEND_IVF_PQ):
+        settings = _fit_ivf_settings(backend, settings, n_vectors)
+    index = create_index(backend, dim, metric, **settings)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def load_vector_index(path: str) -> VectorIndex:
+    """Load an index written by ``VectorIndex.save``."""
+    with open(path + '.json', 'r') as f:
+        settings = json.load(f)
+    index = create_index(settings.pop("backend"), settings.pop("dim"), settings.pop("metric"), **settings)
+    index.index = faiss.read_index(path)
+    if isinstance(index, IVFFlatIndex):
+        index.index.nprobe = index.nprobe
+    return index
+
+
+def get_index_settings() -> Dict[str, Any]:
+    """The ``vector_index`` settings as keyword arguments for ``build_vector_index``."""
+    from utils.config_manager import config
+    settings = dict(config.vector_index or {})
+    settings['backend_settings'] = settings.pop('backends', None) or {}
+    return {key: value for key, value in settings.items() if value is not None}
@@ -1,43 +1,102 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from faiss import IndexFlatL2
 import logging
+from utils.resources import get_sentence_transformer
+from .embedding_store import STORAGE_FLOAT32, build_embedding_store, get_storage_settings
+from .indexer import BACKEND_FLAT, DEFAULT_LATENCY_TARGET_MS, build_vector_index, choose_backend, get_index_settings
 
 logger = logging.getLogger(__name__)
 
 class RAGBuilder:
     def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.model = get_sentence_transformer('all-MiniLM-L6-v2')
         self.index = None
+        self.embeddings = None
 
     def build_rag_system(self, processed_document: Dict[str, Any]) -> Dict[str, Any]:
-        chunks = processed_document['segments']
-        embeddings = self.create_embeddings(chunks)
-        self.build_index(embeddings)
-        
+        rag_system = self.build_rag_system_streaming(processed_document['segments'],
+                                                     processed_document.get('file_path', 'Unknown'))
         return {
-            "file_path": processed_document.get('file_path', 'Unknown'),
-            "chunks": chunks,
-            "embeddings": embeddings,
-            "index": self.index,
+            **rag_system,
             "metadata": processed_document.get('metadata', {}),
             "toc": processed_document.get('toc', {}),
             "semantic_data": processed_document.get('semantic_data', {})
         }
 
+    def build_rag_system_streaming(self, segments: Iterable[Any], file_path: str = 'Unknown',
+                                   batch_size: int = 64) -> Dict[str, Any]:
+        """Embed and index segments as they arrive, e.g. from ``content_segmenter.iter_segments``.
+
+        Segments are embedded in batches of ``batch_size``, so embedding starts while
+        later pages are still being parsed. The index is built once every segment is
+        embedded, since backends such as IVF are trained on the whole corpus. Both
+        segment dicts and llama_index Documents are accepted.
+        """
+        self.index = None
+        chunks = []
+        embedded = []
+        batch = []
+        for segment in segments:
+            batch.append(self._as_chunk(segment))
+            if len(batch) >= batch_size:
+                embedded.append(self.create_embeddings(batch))
+                chunks.extend(batch)
+                batch = []
+        if batch:
+            embedded.append(self.create_embeddings(batch))
+            chunks.extend(batch)
+
+        self.embeddings = np.vstack(embedded) if embedded else np.empty((0, 0), dtype=np.float32)
+        if embedded:
+            self.build_index(self.embeddings)
+        return {
+            "file_path": file_path,
+            "chunks": chunks,
+            "embeddings": self.embeddings,
+            "index": self.index
+        }
+
+    def _as_chunk(self, segment: Any) -> Dict[str, Any]:
+        if isinstance(segment, dict):
+            return segment
+        return {"title": segment.doc_id, "content": segment.text, **(segment.extra_info or {})}
+
     def create_embeddings(self, chunks: List[Dict[str, Any]]) -> np.ndarray:
         texts = [chunk['content'] for chunk in chunks]
         return self.model.encode(texts)
 
-    def build_index(self, embeddings: np.ndarray):
-        self.index = IndexFlatL2(embeddings.shape[1])
-        self.index.add(embeddings)
+    def build_index(self, embeddings: np.ndarray, **settings):
+        """Index the embeddings with the backend set in ``vector_index``.
+
+        With the default 'auto' backend, small corpora get exact flat search and larger
+        ones an HNSW or IVF index chosen from ``latency_target_ms`` and
+        ``memory_budget_mb``. Keyword settings override the configured ones.
+
+        Unless ``embedding_storage.storage`` is float32, ``self.embeddings`` becomes a
+        compressed ``EmbeddingStore``. Where flat search would be used, the store also
+        serves queries in place of a float32 flat index, re-scoring its best candidates
+        from the float copy kept on disk.
+        """
+        settings = {**get_index_settings(), **settings}
+        storage = get_storage_settings()
+        self.embeddings = embeddings
+        if storage.get('storage', STORAGE_FLOAT32) != STORAGE_FLOAT32:
+            self.embeddings = build_embedding_store(embeddings, metric=settings.get('metric', 'l2'), **storage)
+            backend = settings.get('backend', 'auto')
+            if backend == 'auto':
+                backend, _ = choose_backend(*embeddings.shape,
+                                            settings.get('latency_target_ms', DEFAULT_LATENCY_TARGET_MS),
+                                            settings.get('memory_budget_mb'))
+            if backend == BACKEND_FLAT:
+                self.index = self.embeddings
+                return
+        self.index = build_vector_index(embeddings, **settings)
 
     def retrieve(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
         query_embedding = self.model.encode([query])
         distances, indices = self.index.search(query_embedding, k)
-        return [{"chunk_id": int(i), "distance": float(d)} for i, d in zip(indices[0], distances[0])]
+        # Approximate backends return -1 when fewer than k neighbours were found
+        return [{"chunk_id": int(i), "distance": float(d)} for i, d in zip(indices[0], distances[0]) if i >= 0]
 
     def get_relevant_chunks(self, query: str, chunks: List[Dict[str, Any]], k: int = 5) -> List[Dict[str, Any]]:
         retrieved = self.retrieve(query, k)
@@ -10,7 +10,7 @@ sys.path.append(project_root)
 
 from utils.config_manager import config
 from src.document_processing.document_processor import DocumentProcessor
-from src.document_processing.content_segmenter import segment_pdf, post_process_segments
+from src.document_processing.content_segmenter import get_processed_segments
 from src.rag_system.rag_builder import RAGBuilder
 from src.data_generation.synthetic_data_generator import generate_synthetic_data, analyze_dataset
 from src.model_management.fine_tuner import fine_tune_model
@@ -39,6 +39,38 @@ def upload_documents():
             st.session_state.current_stage = "process_documents"
             st.rerun()
 
+def show_processed_document(processed_document):
+    st.success(f"Document processed successfully: {os.path.basename(processed_document['file_path'])}")
+    
+    # Display metadata
+    st.subheader("Metadata")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Word Count", processed_document['metadata'].get('word_count', 'N/A'))
+        st.metric("Character Count", processed_document['metadata'].get('character_count', 'N/A'))
+    with col2:
+        st.metric("Average Word Length", f"{processed_document['metadata'].get('average_word_length', 'N/A'):.2f}")
+        st.metric("Page Count", processed_document['metadata'].get('page_count', 'N/A'))
+
+    # Display image information
+    st.subheader("Image Information")
+    for img in processed_document['metadata'].get('image_info', []):
+        with st.expander(f"Image on page {img['page_number']}"):
+            st.json(img)
+
+    # Display semantic data
+    st.subheader("Semantic Analysis")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("Main Topics")
+        st.write(processed_document['semantic_data'].get('main_topics', []))
+    with col2:
+        st.write("Key Entities")
+        st.write(processed_document['semantic_data'].get('key_entities', []))
+    
+    st.write("Summary")
+    st.write(processed_document['semantic_data'].get('summary', 'No summary available'))
+
 def process_documents():
     st.header("Step 2: Process Documents")
     if 'uploaded_documents' not in st.session_state or not st.session_state.uploaded_documents:
@@ -50,43 +82,21 @@ def process_documents():
     if 'processed_documents' not in st.session_state:
         st.session_state.processed_documents = []
 
-    for doc_path in st.session_state.uploaded_documents:
-        if doc_path not in [doc.get('file_path') for doc in st.session_state.processed_documents]:
-            try:
-                processed_document = processor.process_document(doc_path)
-                st.session_state.processed_documents.append(processed_document)
-                
-                st.success(f"Document processed successfully: {os.path.basename(doc_path)}")
-                
-                # Display metadata
-                st.subheader("Metadata")
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.metric("Word Count", processed_document['metadata'].get('word_count', 'N/A'))
-                    st.metric("Character Count", processed_document['metadata'].get('character_count', 'N/A'))
-                with col2:
-                    st.metric("Average Word Length", f"{processed_document['metadata'].get('average_word_length', 'N/A'):.2f}")
-                    st.metric("Page Count", processed_document['metadata'].get('page_count', 'N/A'))
-
-                # Display image information
-                st.subheader("Image Information")
-                for img in processed_document['metadata'].get('image_info', []):
-                    with st.expander(f"Image on page {img['page_number']}"):
-                        st.json(img)
-
-                # Display semantic data
-                st.subheader("Semantic Analysis")
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.write("Main Topics")
-                    st.write(processed_document['semantic_data'].get('main_topics', []))
-                with col2:
-                    st.write("Key Entities")
-                    st.write(processed_document['semantic_data'].get('key_entities', []))
-                
-                st.write("Summary")
-                st.write(processed_document['semantic_data'].get('summary', 'No summary available'))
+    processed_paths = {doc.get('file_path') for doc in st.session_state.processed_documents}
+    pending = [doc_path for doc_path in st.session_state.uploaded_documents if doc_path not in processed_paths]
+    if pending:
+        progress = st.progress(0.0, text=f"Processing {len(pending)} documents...")
 
+        def report_progress(done, total, result):
+            progress.progress(done / total, text=f"Processed {os.path.basename(result['file_path'])} ({done}/{total})")
+
+        for doc_path, processed_document in zip(pending, processor.process_batch(pending, progress_callback=report_progress)):
+            if 'error' in processed_document:
+                st.error(f"Error processing document {os.path.basename(doc_path)}: {processed_document['error']}")
+                continue
+            st.session_state.processed_documents.append(processed_document)
+            try:
+                show_processed_document(processed_document)
             except Exception as e:
                 st.error(f"Error processing document {os.path.basename(doc_path)}: {str(e)}")
 
@@ -106,8 +116,7 @@ def segment_documents():
     for doc in st.session_state.processed_documents:
         if doc['file_path'] not in [seg_doc.get('file_path') for seg_doc in st.session_state.segmented_documents]:
             try:
-                raw_segments = segment_pdf(doc['file_path'], doc.get('toc', {}))
-                processed_segments = post_process_segments(raw_segments)
+                processed_segments = get_processed_segments(doc['file_path'], doc.get('toc', {}))
                 
                 segmented_doc = doc.copy()
                 segmented_doc['segments'] = processed_segments
@@ -158,6 +167,7 @@ def build_rag():
                 st.subheader("RAG System Information")
                 st.write(f"Number of chunks: {len(rag_system['chunks'])}")
                 st.write(f"Embedding dimension: {rag_system['embeddings'].shape[1]}")
+                st.write(f"Embedding memory: {rag_system['embeddings'].nbytes / (1 << 20):.2f} MB")
                 
                 # Display a sample query and retrieval
                 sample_query = "What is the main topic of this document?"
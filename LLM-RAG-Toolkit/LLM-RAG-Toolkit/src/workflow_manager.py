@@ -1,11 +1,12 @@
 import os
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from src.document_processing.document_loader import DocumentLoader
-from src.document_processing.structure_analyzer import extract_toc, save_toc_to_json
-from src.document_processing.content_segmenter import segment_pdf, save_segments_to_json
+from src.document_processing.structure_analyzer import extract_toc, extract_tocs, save_toc_to_json
+from src.document_processing.content_segmenter import SEGMENTER_VERSION, get_processed_segments, save_segments_to_json
 from src.document_processing.metadata_extractor import extract_metadata, save_metadata_to_json
 from src.data_generation.synthetic_data_generator import QAGenerator, process_segment, analyze_dataset
+from src.ingestion_manifest import STATUS_CHANGED, STATUS_UNCHANGED, IngestionManifest
 from src.model_management.fine_tuner import estimate_cost, create_fine_tuning_job, monitor_fine_tuning
 from utils.config_manager import config
 from utils.logging_config import logger
@@ -13,67 +14,195 @@ import concurrent.futures
 
 logger = logging.getLogger(__name__)
 
+# Bump an artifact's version when a change alters it, so every document is processed again
+ARTIFACT_VERSIONS = {
+    "toc": 1,
+    "segments": SEGMENTER_VERSION,
+    "metadata": 1,
+    "qa": 1
+}
+
+# The key under which process_single_document returns each artifact's path
+ARTIFACT_KEYS = {
+    "toc": "toc_file",
+    "segments": "segments_file",
+    "metadata": "metadata_file",
+    "qa": "qa_file"
+}
+
 class WorkflowManager:
     def __init__(self):
         self.document_loader = DocumentLoader()
         self.qa_generator = QAGenerator()
+        self.manifest = IngestionManifest(config.file_paths.get(
+            'ingestion_manifest', os.path.join(config.file_paths['output_folder'], 'ingestion_manifest.json')))
+        self.last_run: Dict[str, List[str]] = {"processed": [], "skipped": [], "removed": [], "failed": []}
+        self.input_directory = config.file_paths['input_directory']
         logger.info("WorkflowManager initialized")
 
-    def process_documents(self, input_directory: str) -> List[Dict[str, Any]]:
+    def process_documents(self, input_directory: str, force: bool = False) -> List[Dict[str, Any]]:
+        """Process the new and changed documents in the input directory.
+
+        Unchanged documents are skipped and their recorded outputs returned, and the
+        outputs of documents removed since the last run are deleted; see
+        ``plan_documents``. The outcome of the run is kept in ``last_run``.
+
+        Args:
+            input_directory (str): The directory holding the source documents.
+            force (bool): Whether to process every document regardless of the manifest.
+
+        Returns:
+            List[Dict[str, Any]]: The outputs of every current document, processed or skipped.
+        """
         logger.info(f"Processing documents in {input_directory}")
-        processed_documents = []
-        for filename in os.listdir(input_directory):
-            file_path = os.path.join(input_directory, filename)
+        to_process, processed_documents = self.plan_documents(input_directory, force)
+        # Structure every PDF up front so their LLM requests overlap
+        tocs = extract_tocs([file_path for file_path in to_process if file_path.lower().endswith('.pdf')])
+        for file_path in to_process:
             try:
-                document = self.document_loader.load_document(file_path)
-                processed_document = self.process_single_document(document)
+                processed_document = self.process_single_document(file_path, tocs.get(file_path))
+                self._record_processed(file_path, processed_document)
                 processed_documents.append(processed_document)
                 logger.info(f"Successfully processed {file_path}")
             except Exception as e:
+                self.last_run["failed"].append(file_path)
                 logger.error(f"Failed to process {file_path}: {e}", exc_info=True)
+        self._finish_run()
         return processed_documents
 
-    def process_documents_parallel(self, input_directory: str, max_workers: int = 4) -> List[Dict[str, Any]]:
-        """Process all documents in the input directory in parallel."""
-        processed_documents = []
+    def process_documents_parallel(self, input_directory: str, max_workers: int = 4,
+                                   force: bool = False) -> List[Dict[str, Any]]:
+        """Process the new and changed documents in the input directory in parallel."""
+        to_process, processed_documents = self.plan_documents(input_directory, force)
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_file = {executor.submit(self.process_single_document, os.path.join(input_directory, filename)): filename 
-                              for filename in os.listdir(input_directory)}
+            future_to_file = {executor.submit(self.process_single_document, file_path): file_path
+                              for file_path in to_process}
             for future in concurrent.futures.as_completed(future_to_file):
-                filename = future_to_file[future]
+                file_path = future_to_file[future]
                 try:
                     processed_document = future.result()
+                    self._record_processed(file_path, processed_document)
                     processed_documents.append(processed_document)
                 except Exception as e:
-                    logger.error(f"Failed to process {filename}: {e}", exc_info=True)
+                    self.last_run["failed"].append(file_path)
+                    logger.error(f"Failed to process {os.path.basename(file_path)}: {e}", exc_info=True)
+        self._finish_run()
         return processed_documents
 
-    def process_single_document(self, document: Dict[str, Any]) -> Dict[str, Any]:
-        """Process a single document through all stages."""
-        file_path = document['file_path']
+    def plan_documents(self, input_directory: str, force: bool = False) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Compare the input directory with the ingestion manifest and start a run.
+
+        Documents removed since the last run lose their manifest entry and output files.
+        Changed documents keep theirs until they are processed again successfully.
+
+        Args:
+            input_directory (str): The directory holding the source documents.
+            force (bool): Whether to treat every document as changed.
+
+        Returns:
+            Tuple[List[str], List[Dict[str, Any]]]: The new or changed files to process,
+            and the recorded outputs of the unchanged ones.
+        """
+        file_paths = sorted(
+            os.path.join(input_directory, filename) for filename in os.listdir(input_directory)
+            if os.path.isfile(os.path.join(input_directory, filename))
+        )
+        self.input_directory = input_directory
+        self.last_run = {"processed": [], "skipped": [], "removed": [], "failed": []}
+
+        for file_path in self.manifest.removed(file_paths):
+            deleted = self.manifest.forget(file_path)
+            self.last_run["removed"].append(file_path)
+            logger.info(f"{os.path.basename(file_path)} was removed; deleted {len(deleted)} outputs")
+
+        to_process, skipped_documents = [], []
+        for file_path in file_paths:
+            status = STATUS_CHANGED if force else self.manifest.status(file_path, ARTIFACT_VERSIONS)
+            if status == STATUS_UNCHANGED:
+                artifacts = self.manifest.artifacts(file_path)
+                skipped_documents.append({
+                    "file_name": os.path.basename(file_path),
+                    **{ARTIFACT_KEYS[name]: path for name, path in artifacts.items()}
+                })
+                self.last_run["skipped"].append(file_path)
+                continue
+            # A changed document keeps its previous outputs until the new ones are recorded
+            to_process.append(file_path)
+        logger.info(f"{len(to_process)} new or changed documents to process, "
+                    f"{len(skipped_documents)} unchanged skipped, {len(self.last_run['removed'])} removed")
+        return to_process, skipped_documents
+
+    def _record_processed(self, file_path: str, processed_document: Dict[str, Any]):
+        artifacts = {name: processed_document[key] for name, key in ARTIFACT_KEYS.items() if key in processed_document}
+        # Deletes the previous outputs the new ones no longer use, now that those exist
+        self.manifest.record(file_path, artifacts, ARTIFACT_VERSIONS)
+        self.last_run["processed"].append(file_path)
+
+    def output_name(self, file_path: str) -> str:
+        """The name a source's output files start with: its path relative to the input directory.
+
+        The extension is kept, so ``x.pdf`` and ``x.png`` do not share outputs.
+        """
+        relative = os.path.relpath(os.path.abspath(file_path), os.path.abspath(self.input_directory))
+        if relative.startswith(os.pardir):
+            relative = os.path.basename(file_path)
+        return relative.replace(os.sep, '__')
+
+    def _finish_run(self):
+        self.manifest.save()
+        logger.info(f"Ingestion run: {len(self.last_run['processed'])} processed, "
+                    f"{len(self.last_run['skipped'])} skipped as unchanged, "
+                    f"{len(self.last_run['removed'])} removed, {len(self.last_run['failed'])} failed")
+        for file_path in self.last_run["skipped"]:
+            logger.debug(f"Skipped unchanged {os.path.basename(file_path)}")
+
+    def process_single_document(self, file_path: str, toc_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Process a single document through all stages.
+
+        toc_data is the document's structure if it was already extracted, e.g. by
+        ``extract_tocs`` for a whole batch. Every output is written to a temporary file
+        first and they replace the previous outputs together once all stages are done,
+        so a failure leaves the previous outputs as they were.
+        """
         file_name = os.path.basename(file_path)
-        base_name = os.path.splitext(file_name)[0]
-
-        # Extract TOC and structure
-        toc_data = extract_toc(file_path)
-        toc_output_file = os.path.join(config.file_paths['output_folder'], f"{base_name}_toc.json")
-        save_toc_to_json(toc_data, toc_output_file)
-
-        # Segment the document
-        segments = segment_pdf(file_path, toc_output_file)
-        segments_output_file = os.path.join(config.file_paths['output_folder'], f"{base_name}_segments.json")
-        save_segments_to_json(segments, segments_output_file)
-
-        # Extract metadata
-        metadata = extract_metadata(file_path)
-        metadata_output_file = os.path.join(config.file_paths['output_folder'], f"{base_name}_metadata.json")
-        save_metadata_to_json(metadata, metadata_output_file)
-
-        # Generate synthetic Q&A data
-        qa_output_file = os.path.join(config.file_paths['output_folder'], f"{base_name}_qa_data.jsonl")
-        for segment in segments:
-            process_segment(self.qa_generator, segment['title'], segment['content'], 
-                            config.generation_parameters['n_questions'], qa_output_file)
+        base_name = self.output_name(file_path)
+        output_folder = config.file_paths['output_folder']
+        toc_output_file = os.path.join(output_folder, f"{base_name}_toc.json")
+        segments_output_file = os.path.join(output_folder, f"{base_name}_segments.json")
+        metadata_output_file = os.path.join(output_folder, f"{base_name}_metadata.json")
+        qa_output_file = os.path.join(output_folder, f"{base_name}_qa_data.jsonl")
+        output_files = [toc_output_file, segments_output_file, metadata_output_file, qa_output_file]
+
+        try:
+            # Extract TOC and structure
+            if toc_data is None:
+                toc_data = extract_toc(file_path)
+            save_toc_to_json(toc_data, toc_output_file + '.tmp')
+
+            # Segment the document, reusing cached segments for unchanged files
+            segments = get_processed_segments(file_path, toc_data.get("toc"))
+            save_segments_to_json(segments, segments_output_file + '.tmp')
+
+            # Extract metadata
+            metadata = extract_metadata(file_path)
+            save_metadata_to_json(metadata, metadata_output_file + '.tmp')
+
+            # Generate synthetic Q&A data; process_segment appends, so start from an empty file
+            open(qa_output_file + '.tmp', 'w').close()
+            for segment in segments:
+                process_segment(self.qa_generator, segment['title'], segment['content'], 
+                                config.generation_parameters['n_questions'], qa_output_file + '.tmp')
+
+            # The save functions log rather than raise, so check every output was written
+            missing = [path for path in output_files if not os.path.exists(path + '.tmp')]
+            if missing:
+                raise IOError(f"Outputs not written: {', '.join(missing)}")
+            for path in output_files:
+                os.replace(path + '.tmp', path)
+        finally:
+            for path in output_files:
+                if os.path.exists(path + '.tmp'):
+                    os.remove(path + '.tmp')
 
         return {
             "file_name": file_name,
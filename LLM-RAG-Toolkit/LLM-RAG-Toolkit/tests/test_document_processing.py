@@ -0,0 +1,647 @@
+import os
+import time
+import numpy as np
+import pytest
+from PIL import Image
+from src.document_processing.directory_watcher import DirectoryWatcher
+from src.document_processing.image_store import ImageStore
+from src.document_processing.ocr import OcrCache, OcrEngine, OcrStage, strip_bounds
+from src.document_processing.segment_cache import SegmentCache, make_cache_key
+from src.document_processing.semantic_boundaries import adjacent_window_similarities, segment_by_similarity
+from src.document_processing.sentence_packer import pack_sentences
+from src.document_processing.span_table import BOLD_FLAG, SpanTable, StyleProfile, classify_headings
+from src.document_processing.text_stream import iter_text_chunks, iter_text_file
+from src.document_processing.toc_resolver import parse_printed_toc, resolve_toc
+from src.document_processing.token_counter import TOKEN_CACHE_SIZE, TokenCounter, get_encoding
+
+@pytest.fixture
+def image_store(tmp_path):
+    return ImageStore(str(tmp_path / "images"))
+
+def test_put_and_get_roundtrip(image_store):
+    digest = image_store.put(b"\x89PNG fake image", "png")
+    assert image_store.get(digest, "png") == b"\x89PNG fake image"
+    assert os.path.exists(image_store.path(digest, "png"))
+    assert digest in image_store
+
+def test_identical_content_is_stored_once(image_store):
+    first = image_store.put(b"logo", "png")
+    second = image_store.put(b"logo", "png")
+    assert first == second
+    stored = os.listdir(os.path.dirname(image_store.path(first, "png")))
+    assert stored == [os.path.basename(image_store.path(first, "png"))]
+
+def test_missing_digest(image_store):
+    assert image_store.get("0" * 64) is None
+    assert "0" * 64 not in image_store
+
+def test_pack_sentences_without_overlap():
+    assert pack_sentences([3, 3, 3, 3], max_tokens=6) == [(0, 2, 6), (2, 4, 6)]
+
+def test_pack_sentences_carries_overlap():
+    assert pack_sentences([2, 2, 2, 2, 2], max_tokens=6, overlap=1) == [(0, 3, 6), (2, 5, 6)]
+
+def test_pack_sentences_drops_overlap_that_does_not_fit():
+    # Keeping sentence 1 would push sentence 2 over the limit, so the next chunk starts fresh
+    assert pack_sentences([1, 4, 5], max_tokens=6, overlap=1) == [(0, 2, 5), (2, 3, 5)]
+
+def test_pack_sentences_oversized_sentence_stands_alone():
+    assert pack_sentences([2, 10, 2], max_tokens=5, overlap=1) == [(0, 1, 2), (1, 2, 10), (2, 3, 2)]
+
+def test_pack_sentences_empty():
+    assert pack_sentences([], max_tokens=5, overlap=2) == []
+
+def _two_topic_embeddings():
+    topic_a = np.array([1.0, 0.0, 0.0])
+    topic_b = np.array([0.0, 1.0, 0.0])
+    return np.array([topic_a] * 4 + [topic_b] * 4)
+
+def test_adjacent_window_similarities_dip_at_topic_change():
+    similarities = adjacent_window_similarities(_two_topic_embeddings(), window=2)
+    assert similarities.shape == (7,)
+    assert int(np.argmin(similarities)) == 3
+    assert similarities[0] == pytest.approx(1.0)
+
+def test_segment_by_similarity_cuts_at_valley():
+    similarities = adjacent_window_similarities(_two_topic_embeddings(), window=2)
+    assert segment_by_similarity(similarities, [10] * 8, max_tokens=100) == [(0, 4, 40), (4, 8, 40)]
+
+def test_segment_by_similarity_respects_max_tokens():
+    similarities = adjacent_window_similarities(_two_topic_embeddings(), window=2)
+    segments = segment_by_similarity(similarities, [10] * 8, max_tokens=25)
+    assert all(tokens <= 25 for _, _, tokens in segments)
+    assert segments[0][0] == 0
+    assert segments[-1][1] == 8
+
+def test_segment_cache_roundtrip(tmp_path):
+    cache = SegmentCache(str(tmp_path / "segments"))
+    key = make_cache_key("abc", 1, {"max_segment_tokens": 500})
+    assert cache.get(key) is None
+    segments = [{"title": "Intro", "content": "Hello.", "tokens": 2, "level": 1, "path": ["Intro"]}]
+    cache.put(key, segments, source="handbook.pdf")
+    assert cache.get(key) == segments
+    assert cache.describe(key)["source"] == "handbook.pdf"
+
+def test_segment_cache_key_tracks_inputs():
+    base = make_cache_key("abc", 1, {"max_segment_tokens": 500})
+    assert make_cache_key("abc", 1, {"max_segment_tokens": 500}) == base
+    assert make_cache_key("abd", 1, {"max_segment_tokens": 500}) != base
+    assert make_cache_key("abc", 2, {"max_segment_tokens": 500}) != base
+    assert make_cache_key("abc", 1, {"max_segment_tokens": 400}) != base
+    assert make_cache_key("abc", 1, {"max_segment_tokens": 500}, {"Intro": {}}) != base
+
+def test_segment_cache_evicts_least_recently_used(tmp_path):
+    cache = SegmentCache(str(tmp_path / "segments"))
+    now = time.time()
+    for age, key in ((20, "a"), (10, "b")):
+        cache.put(key, [{"content": key * 1000}])
+        os.utime(cache._path(key), (now - age, now - age))
+    cache.max_bytes = cache.entries()[0]["size"]
+    cache.max_age_days = float("inf")
+    assert cache.evict() == 1
+    assert [entry["key"] for entry in cache.entries()] == ["b"]
+
+def test_segment_cache_purge(tmp_path):
+    cache = SegmentCache(str(tmp_path / "segments"))
+    cache.put("a", [])
+    assert cache.purge() == 1
+    assert cache.entries() == []
+
+def make_span(text, size, page, flags=0, font="Body"):
+    return {"text": text, "font_size": size, "font_flags": flags, "font": font, "page_num": page}
+
+@pytest.fixture
+def manual_spans():
+    body = "Employees must submit the form before the end of the month."
+    return SpanTable.from_spans([
+        make_span("Benefits", 18, 0, font="Title"),
+        make_span(body, 10, 0),
+        make_span("Eligibility", 14, 0, font="Title"),
+        make_span(body, 10, 0),
+        make_span("Deadlines", 10, 1, flags=BOLD_FLAG),
+        make_span(body, 10, 1),
+        make_span(body, 10, 1),
+    ])
+
+def test_span_table_roundtrip_and_slicing(manual_spans):
+    assert len(manual_spans) == 7
+    assert manual_spans[2]["text"] == "Eligibility"
+    assert manual_spans[2]["font"] == "Title"
+    page_offsets = manual_spans.page_offsets(2)
+    page_one = manual_spans[page_offsets[1]:page_offsets[2]]
+    assert page_one.texts()[0] == "Deadlines"
+    assert manual_spans.font_counts() == {"Title": 2, "Body": 5}
+
+def test_span_table_concat_remaps_fonts(manual_spans):
+    other = SpanTable.from_spans([make_span("Appendix", 18, 2, font="Title")])
+    joined = SpanTable.concat([manual_spans, other])
+    assert len(joined) == 8
+    assert joined[7] == {**other[0]}
+    assert joined.font_counts() == {"Title": 3, "Body": 5}
+
+def test_style_profile_and_heading_levels(manual_spans):
+    profile = StyleProfile.learn(manual_spans)
+    assert profile.body_size == 10
+    assert profile.heading_sizes == [18, 14]
+    headings, levels = classify_headings(manual_spans, 2, profile)
+    assert headings.tolist() == [True, False, True, False, True, False, False]
+    assert levels.tolist() == [1, 0, 2, 0, 3, 0, 0]
+
+class FakeOcrEngine(OcrEngine):
+    cache_id = "fake"
+
+    def __init__(self):
+        self.calls = []
+
+    def recognize(self, image):
+        self.calls.append(image.size)
+        return f"text {image.size[0]}x{image.size[1]}\n"
+
+def test_ocr_stage_caches_by_content(tmp_path):
+    image_path = tmp_path / "scan.png"
+    Image.new("RGB", (200, 100), "white").save(image_path, dpi=(300, 300))
+    engine = FakeOcrEngine()
+    stage = OcrStage(engine, OcrCache(str(tmp_path / "ocr")))
+    assert stage.recognize_file(str(image_path)) == "text 200x100\n"
+    assert stage.recognize_file(str(image_path)) == "text 200x100\n"
+    assert len(engine.calls) == 1
+
+def test_ocr_stage_downscales_to_target_dpi():
+    engine = FakeOcrEngine()
+    stage = OcrStage(engine, target_dpi=300)
+    image = Image.new("L", (1200, 600), 255)
+    image.info["dpi"] = (600, 600)
+    stage.recognize(image)
+    assert engine.calls == [(600, 300)]
+
+def test_ocr_stage_splits_large_scans_between_lines():
+    image = Image.new("L", (100, 400), 255)
+    pixels = np.asarray(image).copy()
+    # Dark text lines every 40 rows, 20 rows tall
+    for top in range(10, 400, 40):
+        pixels[top:top + 20] = 0
+    image = Image.fromarray(pixels)
+    bounds = strip_bounds(image, max_pixels=100 * 100)
+    assert bounds[0][0] == 0 and bounds[-1][1] == 400
+    for _, bottom in bounds[:-1]:
+        assert pixels[bottom].mean() == 255
+    engine = FakeOcrEngine()
+    OcrStage(engine, tile_pixels=100 * 100, workers=2).recognize(image)
+    assert len(engine.calls) == len(bounds) == 4
+
+PRINTED_TOC_PAGES = [
+    "Annual Handbook\n",
+    "Table of Contents\nPreface ........ ii\n1 Introduction ........ 1\n1.1 Background ....... 3\n"
+    "1.2 Scope\n5\n2 Methods 9\n",
+    "1 Introduction\nThe handbook describes the process.\n",
+] + ["Body text.\n"] * 10
+
+def test_parse_printed_toc_levels_and_pages():
+    entries, confidence = parse_printed_toc(PRINTED_TOC_PAGES)
+    assert entries == [
+        (1, "Preface", 0),
+        (1, "1 Introduction", 1),
+        (2, "1.1 Background", 3),
+        (2, "1.2 Scope", 5),
+        (1, "2 Methods", 9),
+    ]
+    assert confidence == 1.0
+
+def test_resolve_toc_prefers_outline_and_skips_llm():
+    def llm_fallback():
+        raise AssertionError("the LLM must not be asked")
+
+    outline = [[1, "Introduction", 1], [2, "Background", 3]]
+    result = resolve_toc(outline, PRINTED_TOC_PAGES, llm_fallback=llm_fallback)
+    assert result["source"] == "outline"
+    assert result["toc"] == {"Introduction": {"Background": {}}}
+
+    result = resolve_toc([], PRINTED_TOC_PAGES, llm_fallback=llm_fallback)
+    assert result["source"] == "printed"
+    assert list(result["toc"]) == ["Preface", "1 Introduction", "2 Methods"]
+
+def test_resolve_toc_falls_back_to_llm_when_unsure():
+    pages = ["Contents\nIntroduction 40\nMethods 2\nResults 90\n"] + ["Body text.\n"] * 5
+    assert parse_printed_toc(pages)[1] < 0.6
+    result = resolve_toc([], pages, llm_fallback=lambda: {"Overview": {}})
+    assert result == {"toc": {"Overview": {}}, "entries": [], "source": "llm", "confidence": None}
+    assert resolve_toc([], ["No contents here.\n"])["source"] == "none"
+
+STREAM_TEXT = "First paragraph.\nIt has two lines.\n\nSecond paragraph é.\r\n\r\n" + "ü" * 40 + "\n\nLast."
+
+def test_text_chunks_end_at_paragraphs_and_rejoin():
+    chunks = list(iter_text_chunks(STREAM_TEXT.encode("utf-8"), chunk_bytes=48))
+    assert chunks[0] == (0, "First paragraph.\nIt has two lines.\n\n")
+    for chunk_bytes in range(1, 64):
+        assert "".join(text for _, text in iter_text_chunks(STREAM_TEXT.encode("utf-8"), chunk_bytes)) == STREAM_TEXT
+
+def test_text_file_streams_through_mmap(tmp_path):
+    path = tmp_path / "export.txt"
+    path.write_bytes(STREAM_TEXT.encode("utf-8") * 200)
+    mapped = list(iter_text_file(str(path), chunk_bytes=1024, mmap_threshold=0))
+    read = list(iter_text_file(str(path), chunk_bytes=1024))
+    assert mapped == read
+    assert len(mapped) > 1
+    assert "".join(text for _, text in mapped) == STREAM_TEXT * 200
+
+def test_directory_watcher_debounces_changes(tmp_path):
+    changed, removed = [], []
+    watcher = DirectoryWatcher(str(tmp_path), changed.append, removed.append, debounce=3.0)
+    watcher.seed()
+    handbook = tmp_path / "handbook.pdf"
+    handbook.write_bytes(b"%PDF partial")
+    (tmp_path / "notes.txt").write_text("not watched")
+
+    watcher.run_once(now=100.0)
+    handbook.write_bytes(b"%PDF partial, still copying")
+    watcher.run_once(now=102.0)
+    watcher.run_once(now=104.0)
+    assert changed == []
+    watcher.run_once(now=105.0)
+    assert changed == [str(handbook)]
+    watcher.run_once(now=110.0)
+    assert changed == [str(handbook)]
+
+def test_directory_watcher_reports_removals(tmp_path):
+    handbook = tmp_path / "handbook.pdf"
+    handbook.write_bytes(b"%PDF")
+    removed = []
+    watcher = DirectoryWatcher(str(tmp_path), lambda path: None, removed.append, debounce=1.0)
+    watcher.seed()
+    handbook.unlink()
+    watcher.run_once(now=10.0)
+    watcher.run_once(now=11.0)
+    assert removed == [str(handbook)]
+
+def _outlined_pdf(path):
+    import fitz
+    doc = fitz.open()
+    titles = ["Chapter One", "Chapter Two", "Chapter Three"]
+    for number, title in enumerate(titles, 1):
+        page = doc.new_page()
+        page.insert_text((72, 72), title, fontsize=18)
+        for line in range(5):
+            page.insert_text((72, 120 + 20 * line), f"Sentence {line} of the {title.lower()} body text.", fontsize=11)
+    doc.set_toc([[1, title, number] for number, title in enumerate(titles, 1)])
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+def test_iter_segments_streams_without_parse_cache(tmp_path):
+    from src.document_processing import parsed_document
+    from src.document_processing.content_segmenter import (
+        create_toc_matcher, iter_segments, segment_pdf_using_toc
+    )
+    pdf_path = _outlined_pdf(tmp_path / "outlined.pdf")
+    parsed_document.clear_parse_cache()
+
+    streamed = list(iter_segments(pdf_path))
+    assert len(parsed_document._parse_cache) == 0
+
+    parsed = parsed_document.get_parsed_document(pdf_path)
+    batch = segment_pdf_using_toc(pdf_path, create_toc_matcher(resolve_toc(parsed.outline, parsed.pages)["toc"]))
+    parsed_document.clear_parse_cache()
+    assert [doc.doc_id for doc in streamed] == ["Chapter One", "Chapter Two", "Chapter Three"]
+    assert [(doc.doc_id, doc.text, doc.extra_info) for doc in streamed] == \
+        [(doc.doc_id, doc.text, doc.extra_info) for doc in batch]
+
+def test_metadata_collector_streams_and_counts_tokens_in_batches(tmp_path):
+    from src.document_processing import parsed_document
+    from src.document_processing.metadata_extractor import (
+        MetadataCollector, collect_metadata, extract_text_statistics
+    )
+    from src.document_processing.token_counter import TokenCounter
+
+    class BatchRecordingCounter(TokenCounter):
+        def __init__(self):
+            super().__init__()
+            self.batches = []
+
+        def count_batch(self, texts):
+            texts = list(texts)
+            self.batches.append(len(texts))
+            return super().count_batch(texts)
+
+    counter = BatchRecordingCounter()
+    collector = MetadataCollector(token_counter=counter, token_batch_pages=2)
+    for page_num, text in enumerate(["one two", "three four five", "six"]):
+        collector.add_page(page_num, text, [])
+    assert collector.text_statistics()["word_count"] == 6
+    assert counter.batches == [2, 1]
+    assert [stats["token_count"] for stats in collector.page_stats] == counter.count_batch(
+        ["one two", "three four five", "six"])
+
+    pdf_path = _outlined_pdf(tmp_path / "outlined.pdf")
+    parsed_document.clear_parse_cache()
+    basic_metadata, streamed = collect_metadata(pdf_path)
+    assert len(parsed_document._parse_cache) == 0
+    assert basic_metadata["page_count"] == 3
+    statistics = streamed.text_statistics()
+    assert {key: statistics[key] for key in ("word_count", "character_count")} == \
+        {key: value for key, value in extract_text_statistics(pdf_path).items() if key != "average_word_length"}
+    parsed_document.clear_parse_cache()
+
+def test_iter_semantic_segments_matches_batch_across_windows():
+    from src.document_processing.content_segmenter import iter_semantic_segments, semantic_segmentation
+    sentences = [f"Sentence {i} describes how topic {i % 7} relates to clause {i * 3} of the policy."
+                 for i in range(400)]
+    text = " ".join(sentences)
+    # Cut at arbitrary character offsets, so some sentences span two chunks
+    chunks = [text[start:start + 997] for start in range(0, len(text), 997)]
+
+    streamed = list(iter_semantic_segments(chunks, window_segments=1))
+    batch = semantic_segmentation("\n".join(chunks))
+    assert len(batch) > 4
+    assert streamed == batch
+
+def test_semantic_pdf_segments_stream_through_document_loader(tmp_path):
+    import fitz
+    from src.document_processing import parsed_document
+    from src.document_processing.content_segmenter import iter_segments_with_semantics, semantic_segmentation
+    pdf_path = str(tmp_path / "plain.pdf")
+    doc = fitz.open()
+    for page_number in range(3):
+        doc.new_page().insert_text((72, 72), f"Page {page_number} opens here. It closes here.", fontsize=11)
+    doc.save(pdf_path)
+    doc.close()
+    parsed_document.clear_parse_cache()
+
+    streamed = list(iter_segments_with_semantics(pdf_path))
+    assert len(parsed_document._parse_cache) == 0
+    pages = [text for text in parsed_document.get_parsed_document(pdf_path).pages if text]
+    parsed_document.clear_parse_cache()
+    assert [document.text for document in streamed] == \
+        [segment["content"] for segment in semantic_segmentation("\n".join(pages))]
+
+def _fail_after_first_page(read_pages):
+    def failing(pdf_path):
+        pages = read_pages(pdf_path)
+        yield next(pages)
+        raise OSError("page 2 could not be read")
+    return failing
+
+def test_segment_pdf_raises_when_a_page_fails(tmp_path, monkeypatch):
+    from src.document_processing import content_segmenter, document_loader
+    pdf_path = _outlined_pdf(tmp_path / "outlined.pdf")
+    monkeypatch.setattr(content_segmenter, "iter_pages", _fail_after_first_page(content_segmenter.iter_pages))
+    with pytest.raises(OSError):
+        content_segmenter.segment_pdf(pdf_path)
+
+    monkeypatch.setattr(document_loader, "iter_page_contents",
+                        _fail_after_first_page(document_loader.iter_page_contents))
+    with pytest.raises(OSError):
+        content_segmenter.segment_pdf_with_semantics(pdf_path)
+
+def test_failed_segmentation_is_not_cached(tmp_path, monkeypatch):
+    from src.document_processing import content_segmenter
+    pdf_path = _outlined_pdf(tmp_path / "outlined.pdf")
+    cache = SegmentCache(str(tmp_path / "segments"))
+    monkeypatch.setattr(content_segmenter, "_segment_cache", cache)
+    read_pages = content_segmenter.iter_pages
+    monkeypatch.setattr(content_segmenter, "iter_pages", _fail_after_first_page(read_pages))
+    with pytest.raises(OSError):
+        content_segmenter.get_processed_segments(pdf_path)
+    assert cache.entries() == []
+
+    def unreadable_outline(pdf_path, opening_pages):
+        raise OSError("outline could not be read")
+    monkeypatch.setattr(content_segmenter, "read_outline", unreadable_outline)
+    with pytest.raises(OSError):
+        content_segmenter.get_processed_segments(pdf_path)
+    assert cache.entries() == []
+
+    monkeypatch.undo()
+    monkeypatch.setattr(content_segmenter, "_segment_cache", cache)
+    segments = content_segmenter.get_processed_segments(pdf_path)
+    assert [segment["title"] for segment in segments] == ["Chapter One", "Chapter Two", "Chapter Three"]
+    assert len(cache.entries()) == 1
+
+def _parsed_state(parsed):
+    return parsed.page_count, parsed.outline, parsed.pages, parsed.images, list(parsed.spans)
+
+def test_parallel_parse_equals_serial_parse(tmp_path, monkeypatch):
+    import threading
+    import fitz
+    from src.document_processing import parsed_document
+    pdf_path = str(tmp_path / "long.pdf")
+    doc = fitz.open()
+    for page_number in range(12):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Part {page_number}", fontsize=18)
+        page.insert_text((72, 120), f"Body text of page {page_number}.", fontsize=11)
+        if page_number % 4 == 0:
+            page.insert_image(fitz.Rect(72, 200, 136, 264), pixmap=fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 8, 8), 0))
+    doc.set_toc([[1, f"Part {page_number}", page_number + 1] for page_number in range(0, 12, 4)])
+    doc.save(pdf_path)
+    doc.close()
+    monkeypatch.setattr(parsed_document, "PARALLEL_PARSE_MIN_PAGES", 4)
+
+    serial = parsed_document.ParsedDocument.from_file(pdf_path, workers=1)
+    parallel = parsed_document.ParsedDocument.from_file(pdf_path, workers=3)
+    assert len(serial.images) == 3
+    assert _parsed_state(parallel) == _parsed_state(serial)
+
+    # Off the main thread the parse stays in the calling process
+    def no_pool(*args, **kwargs):
+        raise AssertionError("process pool started off the main thread")
+    monkeypatch.setattr(parsed_document, "ProcessPoolExecutor", no_pool)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(
+        parsed_document.ParsedDocument.from_file(pdf_path, workers=3)))
+    thread.start()
+    thread.join()
+    assert _parsed_state(results[0]) == _parsed_state(serial)
+
+def test_structure_extraction_reads_only_the_opening_pages(tmp_path):
+    from src.document_processing import parsed_document
+    from src.document_processing.structure_analyzer import extract_tocs
+    pdf_path = _outlined_pdf(tmp_path / "outlined.pdf")
+    parsed_document.clear_parse_cache()
+
+    opening = parsed_document.read_opening_pages(pdf_path, 2)
+    result = extract_tocs([pdf_path])[pdf_path]
+    assert len(parsed_document._parse_cache) == 0
+    assert result["toc_source"] == "outline"
+    assert list(result["toc"]) == ["Chapter One", "Chapter Two", "Chapter Three"]
+
+    parsed_document.get_parsed_document(pdf_path)
+    assert parsed_document.read_opening_pages(pdf_path, 2) == opening
+    assert len(opening["pages"]) == 2 and opening["page_count"] == 3
+    parsed_document.clear_parse_cache()
+
+def test_structure_and_semantic_metadata_share_one_request(tmp_path):
+    import json
+    from types import SimpleNamespace
+    from utils.llm_cache import LLMCache
+    from utils.resources import clear_resources, get_resource
+    from src.document_processing.document_analysis import DEFAULT_STRUCTURE_MODEL, clear_analyses, make_sample
+    from src.document_processing.metadata_extractor import extract_semantic_metadata
+    from src.document_processing.structure_analyzer import extract_structure_llm
+
+    class CountingClient:
+        def __init__(self, reply):
+            self.reply = reply
+            self.models = []
+            self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+        def create(self, model, **request):
+            self.models.append(model)
+            message = SimpleNamespace(content=self.reply)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")])
+
+    clear_resources()
+    clear_analyses()
+    get_resource(('llm_cache',), lambda: LLMCache(str(tmp_path / "llm.sqlite3")))
+    client = CountingClient(json.dumps({
+        "document_type": "manual", "structure": ["Intro"], "toc": {"Intro": {}}, "notable_features": [],
+        "summary": "A manual.", "main_topics": ["setup"], "entities": ["Acme"]
+    }))
+    text, images = "Intro\nThe Acme manual explains setup.", []
+    try:
+        structure = extract_structure_llm(client, make_sample(text, images))
+        semantic = extract_semantic_metadata(client, text, images)
+    finally:
+        clear_analyses()
+        clear_resources()
+    assert client.models == [DEFAULT_STRUCTURE_MODEL]
+    assert structure["toc"] == {"Intro": {}} and semantic["entities"] == ["Acme"]
+
+class _RecordingCounter(TokenCounter):
+    """A TokenCounter that records the texts each batch sends to the encoder."""
+
+    def __init__(self, cache_size=TOKEN_CACHE_SIZE):
+        super().__init__(cache_size=cache_size)
+        self.encoded = []
+
+    @property
+    def encoding(self):
+        encoding = get_encoding(self.encoding_name)
+        counter = self
+
+        class Recording:
+            def encode_ordinary_batch(self, texts):
+                counter.encoded.append(list(texts))
+                return encoding.encode_ordinary_batch(texts)
+        return Recording()
+
+def test_token_counter_batch_matches_single_counts():
+    texts = ["Policy 4.2 applies to all staff.", "", "Überstunden werden vergütet.", "<|endoftext|> marker"]
+    counter = TokenCounter()
+    encoding = get_encoding()
+    assert counter.count_batch(texts) == [counter.count(text) for text in texts] == \
+        [len(encoding.encode_ordinary(text)) for text in texts]
+
+def test_token_counter_memoizes_repeated_texts():
+    counter = _RecordingCounter()
+    counts = counter.count_batch(["alpha beta", "gamma", "alpha beta"])
+    assert counts[0] == counts[2]
+    assert counter.encoded == [["alpha beta", "gamma"]]
+    counter.count_batch(["gamma", "alpha beta"])
+    counter.count("gamma")
+    assert counter.encoded == [["alpha beta", "gamma"]]
+
+def test_token_counter_cache_stays_within_its_size():
+    counter = _RecordingCounter(cache_size=3)
+    counter.count_batch(["one", "two", "three"])
+    counter.count("one")  # now the most recently used
+    counter.count_batch(["four", "five"])
+    assert len(counter._cache) == 3
+    counter.encoded.clear()
+    counter.count_batch(["one", "four", "five"])
+    assert counter.encoded == []
+    counter.count("two")
+    assert counter.encoded == [["two"]] and len(counter._cache) == 3
+
+def test_semantic_analyzer_matches_joined_document_analysis():
+    spacy = pytest.importorskip("spacy")
+    from utils.resources import clear_resources, get_resource
+    from src.document_processing.semantic_analyzer import SemanticAnalyzer
+
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    ruler = nlp.add_pipe("entity_ruler")
+    names = ["Acme", "Berlin", "Payroll", "HR", "Oslo", "Lima", "Quito", "Rome", "Paris", "Cairo", "Delhi", "Tokyo"]
+    ruler.add_patterns([{"label": "ORG", "pattern": name} for name in names])
+    segments = [f"{name} handles case {i}. The HR team in {names[(i + 3) % len(names)]} reviews it."
+                for i, name in enumerate(names * 2)]
+
+    # The analysis before the single pass: the whole document joined, run once per question
+    joined = nlp(" ".join(segments))
+    expected_entities = list(dict.fromkeys(ent.text for ent in joined.ents))[:10]
+    expected_summary = " ".join([sent.text for sent in joined.sents][:5])
+
+    clear_resources()
+    get_resource(('spacy_analysis', 'blank_en'), lambda: nlp)
+    analyzer = SemanticAnalyzer('blank_en', batch_size=4)
+    piped = []
+    pipe = nlp.pipe
+    nlp.pipe = lambda texts, **kwargs: pipe([piped.append(text) or text for text in texts], **kwargs)
+    try:
+        assert analyzer.analyze(segments) == (expected_entities, expected_summary)
+        # It stopped once enough entities and sentences were found
+        assert 0 < len(piped) < len(segments)
+        piped.clear()
+        assert analyzer.analyze(segments) == (expected_entities, expected_summary)
+        assert piped == []
+    finally:
+        clear_resources()
+
+def _stub_embedder():
+    from llama_index.embeddings.base import BaseEmbedding
+
+    class StubEmbedding(BaseEmbedding):
+        """Embeds every text as the same small vector and counts the texts embedded."""
+        embedded: int = 0
+
+        def _get_query_embedding(self, query):
+            return [1.0, 0.0, 0.0]
+
+        async def _aget_query_embedding(self, query):
+            return self._get_query_embedding(query)
+
+        def _get_text_embedding(self, text):
+            self.embedded += 1
+            return [1.0, 0.0, 0.0]
+
+    return StubEmbedding()
+
+def test_document_index_reindexes_only_changed_files(tmp_path, monkeypatch):
+    import llama_index
+    from llama_index import ServiceContext
+    from src.document_processing.document_index import DocumentIndex, segments_to_documents
+
+    embedder = _stub_embedder()
+    monkeypatch.setattr(llama_index, "global_service_context",
+                        ServiceContext.from_defaults(embed_model=embedder, llm=None))
+    persist_dir = str(tmp_path / "index")
+    source = str(tmp_path / "manual.pdf")
+    old = segments_to_documents([{"title": "A", "content": "first"}, {"title": "B", "content": "second"}],
+                                source, "old")
+
+    index = DocumentIndex(persist_dir)
+    assert not index.is_current(source, "old")
+    assert index.upsert(source, "old", old)
+    assert index.is_current(source, "old")
+    index.persist()
+    assert embedder.embedded == 2
+
+    # An unchanged file: nothing is embedded, inserted or written
+    index = DocumentIndex(persist_dir)
+    assert index.is_current(source, "old")
+    sources_mtime = os.path.getmtime(os.path.join(persist_dir, "sources.json"))
+    assert not index.upsert(source, "old", old)
+    index.persist()
+    assert embedder.embedded == 2
+    assert os.path.getmtime(os.path.join(persist_dir, "sources.json")) == sources_mtime
+    assert set(index.index.ref_doc_info) == {"old:0", "old:1"}
+
+    # A changed file: its new nodes replace the old ones, also after a reload
+    new = segments_to_documents([{"title": "A", "content": "rewritten"}], source, "new")
+    assert index.upsert(source, "new", new)
+    assert not index.is_current(source, "old") and index.is_current(source, "new")
+    index.persist()
+    assert embedder.embedded == 3
+    reloaded = DocumentIndex(persist_dir)
+    assert reloaded.sources() == [os.path.abspath(source)]
+    assert set(reloaded.index.ref_doc_info) == {"new:0"}
+    assert [node.get_content() for node in reloaded.index.docstore.docs.values()] == ["rewritten"]
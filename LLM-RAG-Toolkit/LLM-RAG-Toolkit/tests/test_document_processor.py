@@ -129,5 +129,17 @@ class TestDocumentProcessor(unittest.TestCase):
         else:
             print("Warning: No image file found for testing. Skipping image document processing test.")
 
+    def test_process_batch(self):
+        paths = [self.sample_pdf_path, "invalid_file.txt"]
+        results = self.processor.process_batch(paths, workers=2)
+        self.assertEqual([result['file_path'] for result in results], paths)
+        self.assertIn('error', results[1])
+        for result in results:
+            self.assertIn('processing_time', result)
+
+        print("\n--- Batch Processing Timings ---")
+        for result in results:
+            print(f"{os.path.basename(result['file_path'])}: {result['processing_time']:.2f}s")
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
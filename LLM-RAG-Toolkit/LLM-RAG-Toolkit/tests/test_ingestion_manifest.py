@@ -0,0 +1,152 @@
+import os
+import pytest
+from src import workflow_manager
+from src.ingestion_manifest import STATUS_CHANGED, STATUS_NEW, STATUS_UNCHANGED, IngestionManifest
+from src.workflow_manager import ARTIFACT_KEYS, ARTIFACT_VERSIONS, WorkflowManager
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(workflow_manager, "QAGenerator", lambda: None)
+    monkeypatch.setattr(workflow_manager, "extract_tocs", lambda pdf_paths: {})
+    manager = WorkflowManager()
+    manager.manifest = IngestionManifest(str(tmp_path / "out" / "manifest.json"))
+    manager.failing = set()
+    output_folder = tmp_path / "out"
+    output_folder.mkdir(exist_ok=True)
+
+    def process_single_document(file_path, toc_data=None):
+        # Writes every output from the source content, like the real pipeline but without models
+        if os.path.basename(file_path) in manager.failing:
+            raise RuntimeError("processing failed")
+        with open(file_path) as f:
+            content = f.read()
+        outputs = {"file_name": os.path.basename(file_path)}
+        for name, key in ARTIFACT_KEYS.items():
+            outputs[key] = str(output_folder / f"{manager.output_name(file_path)}_{name}.json")
+            with open(outputs[key], 'w') as f:
+                f.write(content)
+        return outputs
+
+    manager.process_single_document = process_single_document
+    return manager
+
+
+def _write(path, content, mtime=None):
+    path.write_text(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def _run(manager, input_directory):
+    return {document["file_name"]: document for document in manager.process_documents(str(input_directory))}
+
+
+def test_only_new_and_changed_documents_are_processed(manager, tmp_path):
+    source = tmp_path / "raw"
+    source.mkdir()
+    _write(source / "a.txt", "first", mtime=1000)
+    _write(source / "b.txt", "second", mtime=1000)
+
+    _run(manager, source)
+    assert sorted(manager.last_run["processed"]) == [str(source / "a.txt"), str(source / "b.txt")]
+
+    documents = _run(manager, source)
+    assert manager.last_run["processed"] == [] and len(manager.last_run["skipped"]) == 2
+    assert open(documents["a.txt"]["toc_file"]).read() == "first"
+
+    _write(source / "b.txt", "changed", mtime=2000)
+    # Touched without a content change
+    os.utime(source / "a.txt", (3000, 3000))
+    assert manager.manifest.status(str(source / "a.txt"), ARTIFACT_VERSIONS) == STATUS_UNCHANGED
+    documents = _run(manager, source)
+    assert manager.last_run["processed"] == [str(source / "b.txt")]
+    assert manager.last_run["skipped"] == [str(source / "a.txt")]
+    assert open(documents["b.txt"]["qa_file"]).read() == "changed"
+
+
+def test_artifact_version_bump_reprocesses_everything(manager, tmp_path, monkeypatch):
+    source = tmp_path / "raw"
+    source.mkdir()
+    _write(source / "a.txt", "first")
+    _run(manager, source)
+
+    monkeypatch.setitem(ARTIFACT_VERSIONS, "segments", ARTIFACT_VERSIONS["segments"] + 1)
+    assert manager.manifest.status(str(source / "a.txt"), ARTIFACT_VERSIONS) == STATUS_CHANGED
+    _run(manager, source)
+    assert manager.last_run["processed"] == [str(source / "a.txt")]
+
+
+def test_removed_document_loses_only_its_own_outputs(manager, tmp_path):
+    source = tmp_path / "raw"
+    source.mkdir()
+    _write(source / "x.pdf", "pdf")
+    _write(source / "x.png", "png")
+    documents = _run(manager, source)
+    pdf_outputs = [documents["x.pdf"][key] for key in ARTIFACT_KEYS.values()]
+    png_outputs = [documents["x.png"][key] for key in ARTIFACT_KEYS.values()]
+    assert not set(pdf_outputs) & set(png_outputs)
+
+    os.remove(source / "x.png")
+    _run(manager, source)
+    assert manager.last_run["removed"] == [os.path.abspath(source / "x.png")]
+    assert not any(os.path.exists(path) for path in png_outputs)
+    assert all(open(path).read() == "pdf" for path in pdf_outputs)
+
+
+def test_failed_reprocessing_keeps_the_previous_outputs(manager, tmp_path):
+    source = tmp_path / "raw"
+    source.mkdir()
+    _write(source / "a.txt", "first", mtime=1000)
+    documents = _run(manager, source)
+
+    _write(source / "a.txt", "second", mtime=2000)
+    manager.failing.add("a.txt")
+    _run(manager, source)
+    assert manager.last_run["failed"] == [str(source / "a.txt")]
+    assert all(open(documents["a.txt"][key]).read() == "first" for key in ARTIFACT_KEYS.values())
+    # Still changed, so the next run tries again
+    assert manager.manifest.status(str(source / "a.txt"), ARTIFACT_VERSIONS) == STATUS_CHANGED
+
+    manager.failing.clear()
+    _run(manager, source)
+    assert manager.last_run["processed"] == [str(source / "a.txt")]
+
+
+def test_manifest_deletes_artifacts_no_entry_records(tmp_path):
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    first, second = _write(tmp_path / "first.txt", "1"), _write(tmp_path / "second.txt", "2")
+    shared, old, new = (_write(tmp_path / name, name) for name in ("shared.json", "old.json", "new.json"))
+    assert manifest.status(first, {"out": 1}) == STATUS_NEW
+
+    manifest.record(first, {"out": old, "shared": shared}, {"out": 1})
+    manifest.record(second, {"shared": shared}, {})
+    assert manifest.record(first, {"out": new, "shared": shared}, {"out": 1}) == [old]
+    assert manifest.forget(first) == [new]
+    assert os.path.exists(shared)
+    assert manifest.forget(second) == [shared]
+
+    manifest.record(first, {"out": _write(tmp_path / "kept.json", "kept")}, {"out": 1})
+    manifest.save()
+    assert IngestionManifest(manifest.path).status(first, {"out": 1}) == STATUS_UNCHANGED
+
+
+def test_failing_stage_leaves_every_previous_output(manager, tmp_path, monkeypatch):
+    from utils.config_manager import config
+    output_folder = tmp_path / "out"
+    monkeypatch.setitem(config.file_paths, "output_folder", str(output_folder))
+    source = tmp_path / "raw"
+    source.mkdir()
+    file_path = _write(source / "a.pdf", "pdf")
+    manager.input_directory = str(source)
+    previous = [_write(output_folder / f"a.pdf_{name}", "previous")
+                for name in ("toc.json", "segments.json", "metadata.json", "qa_data.jsonl")]
+
+    def failing_segmentation(file_path, toc):
+        raise RuntimeError("page 2 could not be read")
+    monkeypatch.setattr(workflow_manager, "get_processed_segments", failing_segmentation)
+    with pytest.raises(RuntimeError):
+        WorkflowManager.process_single_document(manager, file_path, {"toc": {}})
+    assert all(open(path).read() == "previous" for path in previous)
+    assert sorted(os.listdir(output_folder)) == sorted(os.path.basename(path) for path in previous)
@@ -0,0 +1,118 @@
+import os
+import numpy as np
+import pytest
+from src.rag_system import embedding_store
+from src.rag_system.embedding_store import (
+    STORAGE_FP16, STORAGE_PQ, STORAGE_SQ8, build_embedding_store, evaluate_storage
+)
+from src.rag_system.indexer import (
+    BACKEND_FLAT, BACKEND_HNSW, BACKEND_IVF_FLAT, BACKEND_IVF_PQ,
+    build_vector_index, choose_backend, default_nlist, default_pq_subquantizers, load_vector_index
+)
+
+
+def _clustered_vectors(n, dim=32, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)) * 5
+    return (centers[rng.integers(clusters, size=n)] + rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def test_choose_backend_by_size_and_memory():
+    assert choose_backend(1000, 384)[0] == BACKEND_FLAT
+    assert choose_backend(500_000, 384)[0] == BACKEND_HNSW
+    assert choose_backend(5_000_000, 384)[0] == BACKEND_IVF_FLAT
+    backend, settings = choose_backend(5_000_000, 384, memory_budget_mb=1024)
+    assert backend == BACKEND_IVF_PQ and settings["nlist"] == int(4 * 5_000_000 ** 0.5)
+    assert default_pq_subquantizers(384) == 48
+
+
+@pytest.mark.parametrize("backend,settings", [
+    (BACKEND_IVF_FLAT, {"nlist": 20, "nprobe": 4}),
+    (BACKEND_IVF_PQ, {"nlist": 20, "nprobe": 4, "m": 8, "nbits": 6}),
+    (BACKEND_HNSW, {"ef_search": 32}),
+])
+def test_approximate_backends_find_exact_neighbours(backend, settings):
+    vectors = _clustered_vectors(3000)
+    exact = build_vector_index(vectors, backend=BACKEND_FLAT)
+    index = build_vector_index(vectors, backend=backend, **settings)
+    assert index.ntotal == len(vectors)
+
+    queries = vectors[:50]
+    _, expected = exact.search(queries, 1)
+    _, found = index.search(queries, 10)
+    recall = np.mean([expected[i, 0] in found[i] for i in range(len(queries))])
+    assert recall >= 0.9
+
+
+@pytest.mark.parametrize("backend", [BACKEND_IVF_FLAT, BACKEND_IVF_PQ])
+def test_explicit_ivf_backend_fits_small_corpus(backend):
+    vectors = _clustered_vectors(200, dim=32)
+    index = build_vector_index(vectors, backend=backend, backend_settings={backend: {"nprobe": 4}})
+    assert index.nlist == default_nlist(200) and index.ntotal == 200
+    assert build_vector_index(vectors, backend=backend, nlist=1024).nlist == 200
+    assert index.search(vectors[:5], 3)[1].shape == (5, 3)
+
+
+def test_search_params_and_save_load(tmp_path):
+    vectors = _clustered_vectors(2000)
+    index = build_vector_index(vectors, backend=BACKEND_IVF_FLAT, nlist=16)
+    index.set_search_params(nprobe=16)
+    with pytest.raises(TypeError):
+        index.set_search_params(ef_search=10)
+
+    path = str(tmp_path / "index.faiss")
+    index.save(path)
+    loaded = load_vector_index(path)
+    assert loaded.backend == BACKEND_IVF_FLAT and loaded.nprobe == 16
+    assert np.array_equal(loaded.search(vectors[:5], 3)[1], index.search(vectors[:5], 3)[1])
+
+
+def test_embedding_store_compresses_and_rescores(tmp_path):
+    vectors = _clustered_vectors(2000, dim=64)
+    store = build_embedding_store(vectors, STORAGE_SQ8, float_dir=str(tmp_path))
+    assert store.shape == vectors.shape and store.nbytes < vectors.nbytes / 3.5
+    assert isinstance(store.floats, np.memmap)
+
+    exact = build_vector_index(vectors, backend=BACKEND_FLAT)
+    expected_distances, expected = exact.search(vectors[:20], 5)
+    distances, found = store.search(vectors[:20], 5)
+    assert np.array_equal(found, expected)
+    assert np.allclose(distances, expected_distances, rtol=1e-4, atol=1e-3)
+    assert np.all(store.search(vectors[:1], 2500)[1][0, 2000:] == -1)
+
+
+def test_embedding_store_keeps_top_candidates_across_scan_blocks(monkeypatch):
+    vectors = _clustered_vectors(1000, dim=32)
+    store = build_embedding_store(vectors, STORAGE_FP16)
+    expected = store.search(vectors[:20], 5)
+    monkeypatch.setattr(embedding_store, "SCAN_BLOCK_ROWS", 64)
+    distances, found = store.search(vectors[:20], 5)
+    assert np.array_equal(found, expected[1]) and np.allclose(distances, expected[0])
+    assert np.array_equal(found[:, 0], np.arange(20))
+
+
+def test_float_copies_are_written_for_rescoring_and_evicted(tmp_path):
+    float_dir = str(tmp_path)
+    build_embedding_store(_clustered_vectors(500), STORAGE_SQ8, rescore_factor=1, float_dir=float_dir)
+    assert os.listdir(float_dir) == []
+
+    stale = build_embedding_store(_clustered_vectors(500, seed=1), STORAGE_SQ8, float_dir=float_dir)
+    os.utime(stale.floats.filename, (0, 0))
+    old = build_embedding_store(_clustered_vectors(500, seed=2), STORAGE_SQ8, float_dir=float_dir)
+    assert sorted(os.listdir(float_dir)) == [os.path.basename(old.floats.filename)]
+
+    # Each copy is 500 * 32 * 4 bytes, so 0.1 MB keeps only the newest
+    new = build_embedding_store(_clustered_vectors(500, seed=3), STORAGE_SQ8, float_dir=float_dir,
+                                float_max_megabytes=0.1)
+    assert os.listdir(float_dir) == [os.path.basename(new.floats.filename)]
+    assert old.search(old.floats[:3], 1)[1][:, 0].tolist() == [0, 1, 2]
+
+
+def test_evaluate_storage_reports_memory_and_recall():
+    vectors = _clustered_vectors(3000, dim=64)
+    report = {row["storage"]: row for row in evaluate_storage(vectors, k=10, n_queries=30, pq_m=16)}
+    assert report["float32"]["recall"] == 1.0 and report["float32"]["compression"] == 1.0
+    assert report[STORAGE_FP16]["compression"] == 2.0 and report[STORAGE_FP16]["rescored_recall"] == 1.0
+    assert report[STORAGE_SQ8]["rescored_recall"] >= 0.95
+    assert report[STORAGE_PQ]["bytes_per_vector"] < 64
+    assert report[STORAGE_PQ]["rescored_recall"] >= report[STORAGE_PQ]["recall"]
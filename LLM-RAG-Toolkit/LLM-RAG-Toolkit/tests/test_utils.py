@@ -0,0 +1,98 @@
+import json
+from types import SimpleNamespace
+import pytest
+from utils.import_benchmark import parse_importtime
+from utils.llm_cache import LLMCache, cached_chat_completion, make_cache_key
+from utils.resources import clear_resources, get_resource
+
+IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _json
+import time:       800 |        920 | json
+import time:      5000 |       5920 | app
+"""
+
+@pytest.fixture(autouse=True)
+def fresh_resources():
+    clear_resources()
+    yield
+    clear_resources()
+
+def test_get_resource_loads_once():
+    calls = []
+    def loader():
+        calls.append(1)
+        return object()
+    first = get_resource('model', loader)
+    assert get_resource('model', loader) is first
+    assert len(calls) == 1
+
+def test_clear_resources_reloads():
+    first = get_resource('model', object)
+    clear_resources()
+    assert get_resource('model', object) is not first
+
+def test_parse_importtime():
+    records = parse_importtime(IMPORTTIME_OUTPUT)
+    assert [record["module"] for record in records] == ["_json", "json", "app"]
+    assert [record["depth"] for record in records] == [1, 0, 0]
+    assert records[2]["self_us"] == 5000
+    assert records[2]["cumulative_us"] == 5920
+
+def test_llm_cache_key_covers_request():
+    messages = [{"role": "user", "content": "Summarize the policy."}]
+    key = make_cache_key("gpt-4", messages, temperature=0.2)
+    assert make_cache_key("gpt-4", messages, temperature=0.2) == key
+    assert make_cache_key("gpt-4o", messages, temperature=0.2) != key
+    assert make_cache_key("gpt-4", messages, temperature=0.7) != key
+    assert make_cache_key("gpt-4", [{"role": "user", "content": "Other."}], temperature=0.2) != key
+
+def test_llm_cache_hits_and_misses(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"))
+    assert cache.get("a") is None
+    cache.put("a", "gpt-4", "answer")
+    assert cache.get("a") == "answer"
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+
+def test_llm_cache_evicts_least_recently_used(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite3"), max_bytes=10)
+    cache.put("a", "gpt-4", "x" * 6)
+    cache.put("b", "gpt-4", "y" * 6)
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 6
+
+class ScriptedClient:
+    """Answers chat completions with the given replies, in order."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.requests = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **request):
+        self.requests += 1
+        content, finish_reason = self.replies.pop(0)
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=finish_reason)])
+
+def test_cached_chat_completion_skips_invalid_and_truncated_replies(tmp_path):
+    cache = get_resource(('llm_cache',), lambda: LLMCache(str(tmp_path / "llm.sqlite3")))
+    messages = [{"role": "user", "content": "Analyze."}]
+    client = ScriptedClient(('{"broken', 'stop'), ('{"cut": ', 'length'), ('{"ok": true}', 'stop'))
+
+    with pytest.raises(json.JSONDecodeError):
+        cached_chat_completion(client, "gpt-4", messages, validate=json.loads)
+    assert cache.stats()["entries"] == 0
+    assert cached_chat_completion(client, "gpt-4", messages) == '{"cut": '
+    assert cache.stats()["entries"] == 0
+    assert cached_chat_completion(client, "gpt-4", messages, validate=json.loads) == '{"ok": true}'
+    assert cached_chat_completion(client, "gpt-4", messages, validate=json.loads) == '{"ok": true}'
+    assert client.requests == 3
+
+def test_cached_chat_completion_drops_invalid_cached_reply(tmp_path):
+    cache = get_resource(('llm_cache',), lambda: LLMCache(str(tmp_path / "llm.sqlite3")))
+    messages = [{"role": "user", "content": "Analyze."}]
+    cache.put(make_cache_key("gpt-4", messages), "gpt-4", "not json")
+    client = ScriptedClient(('{"ok": true}', 'stop'))
+    assert cached_chat_completion(client, "gpt-4", messages, validate=json.loads) == '{"ok": true}'
+    assert cache.get(make_cache_key("gpt-4", messages)) == '{"ok": true}'
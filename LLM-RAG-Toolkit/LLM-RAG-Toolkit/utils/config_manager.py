@@ -1,11 +1,9 @@
 import os
 import logging
+import threading
 from dotenv import load_dotenv
 import yaml
 
-# Load environment variables from .env file
-load_dotenv()
-
 class Config:
     def __init__(self, config_path):
         with open(config_path, "r") as f:
@@ -33,6 +31,8 @@ class Config:
         return self.config.get(name)
 
 def load_config(config_path="config/config.yaml"):
+    # Load environment variables from .env file
+    load_dotenv()
     config = Config(config_path)
     
     # Ensure the logging directory exists
@@ -51,5 +51,23 @@ def load_config(config_path="config/config.yaml"):
 
     return config
 
-# Create a global config object
-config = load_config()
+class LazyConfig:
+    """Stands in for the global Config, loading it (and setting up logging) on first attribute access."""
+
+    def __init__(self, config_path="config/config.yaml"):
+        self._config_path = config_path
+        self._config = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._config is None:
+                self._config = load_config(self._config_path)
+            return self._config
+
+    def __getattr__(self, name):
+        config = self._config if self._config is not None else self._load()
+        return getattr(config, name)
+
+# The global config object; the YAML file is read when the first setting is used
+config = LazyConfig()
@@ -0,0 +1,139 @@
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, List, Any, Optional
+
+# Entry points whose cold-start cost is tracked by default
+DEFAULT_MODULES = [
+    'src.web_interface.app',
+    'src.workflow_manager',
+    'src.document_processing.document_processor',
+    'src.data_generation.synthetic_data_generator',
+    'src.model_management.fine_tuner',
+]
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+
+def parse_importtime(output: str) -> List[Dict[str, Any]]:
+    """Parse the stderr of ``python -X importtime`` into one record per imported module.
+
+    Args:
+        output (str): The raw ``-X importtime`` output.
+
+    Returns:
+        List[Dict[str, Any]]: The module name, nesting depth, and self and cumulative
+            import time in microseconds of every import, in the order they finished.
+    """
+    records = []
+    for line in output.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            records.append({
+                "module": module,
+                # The first level is indented by one space, each nested level by two more
+                "depth": (len(indent) - 1) // 2,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us)
+            })
+    return records
+
+
+def measure_import(module: str, python: str = sys.executable, cwd: str = PROJECT_ROOT) -> Dict[str, Any]:
+    """Import a module in a fresh interpreter and report where the time went.
+
+    Args:
+        module (str): The dotted module name to import.
+        python (str): The interpreter to run.
+        cwd (str): The directory the import runs from.
+
+    Returns:
+        Dict[str, Any]: The total import time, the imports ordered by the time spent in
+            their own module body, and any error raised by the import.
+    """
+    result = subprocess.run(
+        [python, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=cwd, capture_output=True, text=True
+    )
+    records = parse_importtime(result.stderr)
+    top_level = [record for record in records if record["depth"] == 0]
+    error = None
+    if result.returncode != 0:
+        error = next((line for line in reversed(result.stderr.splitlines())
+                      if line and not line.startswith('import time:')), 'import failed')
+    return {
+        "module": module,
+        "total_us": sum(record["cumulative_us"] for record in top_level),
+        "modules_imported": len(records),
+        # Self time points at module bodies doing work at import, e.g. loading a model
+        "slowest": sorted(records, key=lambda record: record["self_us"], reverse=True),
+        "error": error
+    }
+
+
+def benchmark_imports(modules: List[str], repeat: int = 3) -> List[Dict[str, Any]]:
+    """Measure each module's cold import, keeping the fastest of several runs.
+
+    Args:
+        modules (List[str]): The dotted module names to import.
+        repeat (int): The number of fresh interpreters to time per module.
+
+    Returns:
+        List[Dict[str, Any]]: One ``measure_import`` report per module.
+    """
+    reports = []
+    for module in modules:
+        runs = [measure_import(module) for _ in range(max(repeat, 1))]
+        reports.append(min(runs, key=lambda report: report["total_us"]))
+    return reports
+
+
+def format_report(reports: List[Dict[str, Any]], top: int = 10,
+                  baseline: Optional[Dict[str, int]] = None) -> str:
+    """Render import reports as text, with the change against a baseline when one is given."""
+    lines = []
+    for report in reports:
+        header = f"{report['module']}: {report['total_us'] / 1e6:.2f}s, {report['modules_imported']} modules"
+        if baseline and report['module'] in baseline:
+            delta = report['total_us'] - baseline[report['module']]
+            header += f" ({delta / 1e6:+.2f}s vs baseline)"
+        lines.append(header)
+        if report["error"]:
+            lines.append(f"  error: {report['error']}")
+        for record in report["slowest"][:top]:
+            lines.append(f"  {record['self_us'] / 1e3:9.1f} ms self  {record['cumulative_us'] / 1e3:9.1f} ms total  "
+                         f"{record['module']}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Report the cold-start import cost of the toolkit's entry points."""
+    parser = argparse.ArgumentParser(description="Measure module import times with python -X importtime.")
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES, help="The modules to import.")
+    parser.add_argument('--repeat', type=int, default=3, help="Fresh interpreters per module; the fastest run is kept.")
+    parser.add_argument('--top', type=int, default=10, help="The number of slowest module bodies to list.")
+    parser.add_argument('--output', help="Write the totals to this JSON file, to use as a later baseline.")
+    parser.add_argument('--baseline', help="A JSON file written by --output to compare against.")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+    reports = benchmark_imports(args.modules, args.repeat)
+    print(format_report(reports, args.top, baseline))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({report["module"]: report["total_us"] for report in reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = 'cache/llm_cache.sqlite3'
+DEFAULT_MAX_MEGABYTES = 256
+DEFAULT_TTL_DAYS = 90
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+def make_cache_key(model: str, messages: List[Dict[str, Any]], **params) -> str:
+    """Build the cache key of a chat completion request.
+
+    Args:
+        model (str): The model name.
+        messages (List[Dict[str, Any]]): The chat messages.
+        **params: The sampling parameters, e.g. temperature, top_p and max_tokens.
+
+    Returns:
+        str: The SHA-256 hex digest of the canonical JSON request.
+    """
+    request = {"model": model, "messages": messages, "params": params}
+    return hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """A single-file SQLite cache of LLM responses with TTL and LRU size eviction.
+
+    Several processes can share the file; SQLite serializes their writes. Hit and
+    miss counts are kept per process and reported by ``stats``.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_bytes: int = DEFAULT_MAX_MEGABYTES * 1024 * 1024,
+                 ttl_days: Optional[float] = DEFAULT_TTL_DAYS):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.ttl_days = ttl_days
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _expired_before(self) -> float:
+        return time.time() - self.ttl_days * 86400 if self.ttl_days else float('-inf')
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None on a miss or an expired entry."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created >= ?",
+                (key, self._expired_before())
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self._conn:
+                self._conn.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                                   (time.time(), key))
+            return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        """Store a response, then evict expired and least recently used entries over the size cap."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_used, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, model, response, len(response.encode('utf-8')), now, now)
+            )
+            self._evict()
+
+    def delete(self, key: str) -> bool:
+        """Remove one entry. Returns whether it existed."""
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM responses WHERE key = ?", (key,)).rowcount > 0
+
+    def _evict(self):
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (self._expired_before(),))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk entries from least recently used until enough bytes are freed
+        excess, doomed = total - self.max_bytes, []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the entry count, stored bytes and this process's hits, misses and hit rate."""
+        with self._lock:
+            entries, size, stored_hits = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM responses"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "bytes": size,
+                "stored_hits": stored_hits,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def clear(self) -> int:
+        """Remove every entry. Returns the number removed."""
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM responses").rowcount
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Return the shared LLM cache configured under ``llm_cache``, or None if it is disabled."""
+    from utils.config_manager import config
+    from utils.resources import get_resource
+    settings = config.llm_cache or {}
+    if not settings.get('enabled', True):
+        return None
+    return get_resource(('llm_cache',), lambda: LLMCache(
+        settings.get('db_path', DEFAULT_DB_PATH),
+        max_bytes=settings.get('max_megabytes', DEFAULT_MAX_MEGABYTES) * 1024 * 1024,
+        ttl_days=settings.get('ttl_days', DEFAULT_TTL_DAYS)
+    ))
+
+
+def _cached_response(cache: Optional[LLMCache], key: str,
+                     validate: Optional[Callable[[str], Any]]) -> Optional[str]:
+    # The cached content, or None on a miss; entries that fail validation are dropped
+    if cache is None:
+        return None
+    cached = cache.get(key)
+    if cached is not None and validate is not None:
+        try:
+            validate(cached)
+        except Exception as e:
+            logger.warning(f"Dropping cached LLM response that fails validation: {e}")
+            cache.delete(key)
+            return None
+    return cached
+
+
+def _store_response(cache: Optional[LLMCache], key: str, model: str, response,
+                    validate: Optional[Callable[[str], Any]]) -> str:
+    # Validates the reply before caching it; invalid and truncated replies are never stored
+    choice = response.choices[0]
+    content = choice.message.content
+    if validate is not None:
+        validate(content)
+    if cache is not None and content is not None:
+        if getattr(choice, 'finish_reason', None) == 'length':
+            logger.warning(f"Not caching a {model} response cut off at max_tokens")
+        else:
+            cache.put(key, model, content)
+    return content
+
+
+def cached_chat_completion(client, model: str, messages: List[Dict[str, Any]],
+                           validate: Optional[Callable[[str], Any]] = None, **params) -> str:
+    """Return the content of a chat completion, calling the API only on a cache miss.
+
+    Errors are raised to the caller and never cached. Neither are replies cut off at
+    ``max_tokens``, nor replies that ``validate`` rejects; a cached reply that fails
+    ``validate`` is deleted and requested again.
+
+    Args:
+        client (OpenAI): The OpenAI client.
+        model (str): The model name.
+        messages (List[Dict[str, Any]]): The chat messages.
+        validate (Optional[Callable[[str], Any]]): Raises if the content is unusable,
+            e.g. ``json.loads`` for JSON replies; its exception reaches the caller.
+        **params: The sampling parameters passed to ``chat.completions.create``.
+
+    Returns:
+        str: The response message content.
+    """
+    cache = get_llm_cache()
+    key = make_cache_key(model, messages, **params)
+    cached = _cached_response(cache, key, validate)
+    if cached is not None:
+        return cached
+
+    response = client.chat.completions.create(model=model, messages=messages, **params)
+    return _store_response(cache, key, model, response, validate)
+
+
+async def cached_chat_completion_async(client, model: str, messages: List[Dict[str, Any]],
+                                       validate: Optional[Callable[[str], Any]] = None, **params) -> str:
+    """Async counterpart of ``cached_chat_completion`` for an AsyncOpenAI client.
+
+    Cache lookups stay synchronous; they are local SQLite reads, far shorter than
+    the request they save.
+    """
+    cache = get_llm_cache()
+    key = make_cache_key(model, messages, **params)
+    cached = _cached_response(cache, key, validate)
+    if cached is not None:
+        return cached
+
+    response = await client.chat.completions.create(model=model, messages=messages, **params)
+    return _store_response(cache, key, model, response, validate)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Inspect or clear the LLM response cache from the command line."""
+    parser = argparse.ArgumentParser(description="Inspect or clear the LLM response cache.")
+    parser.add_argument('--db-path', default=DEFAULT_DB_PATH, help="The cache database file.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help="Show the number of entries, their size and their hits.")
+    subparsers.add_parser('clear', help="Remove every entry.")
+    args = parser.parse_args(argv)
+
+    cache = LLMCache(args.db_path, max_bytes=float('inf'), ttl_days=None)
+    if args.command == 'stats':
+        stats = cache.stats()
+        print(f"{stats['entries']} entries, {stats['bytes'] / 1024:.1f} KiB, "
+              f"{stats['stored_hits']} hits served in {args.db_path}")
+    elif args.command == 'clear':
+        print(f"Removed {cache.clear()} entries from {args.db_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPACY_MODEL = 'en_core_web_sm'
+
+# NLTK resource ids and the path nltk.data.find looks them up under
+NLTK_RESOURCE_PATHS = {
+    'punkt': 'tokenizers/punkt',
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+    'averaged_perceptron_tagger': 'taggers/averaged_perceptron_tagger',
+}
+
+_resources: Dict[Hashable, Any] = {}
+_resources_lock = threading.Lock()
+_key_locks: Dict[Hashable, threading.Lock] = {}
+
+
+def get_resource(key: Hashable, loader: Callable[[], Any]) -> Any:
+    """Return the process-wide resource for a key, calling loader on first use.
+
+    Each key has its own lock, so a slow load (a model download, say) only blocks
+    callers waiting for that same resource.
+
+    Args:
+        key (Hashable): Identifies the resource, e.g. ``('spacy', 'en_core_web_sm')``.
+        loader (Callable[[], Any]): Builds the resource; called at most once per key.
+
+    Returns:
+        Any: The shared resource.
+    """
+    with _resources_lock:
+        if key in _resources:
+            return _resources[key]
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+
+    with key_lock:
+        with _resources_lock:
+            if key in _resources:
+                return _resources[key]
+        logger.debug(f"Loading resource {key}")
+        resource = loader()
+        with _resources_lock:
+            _resources[key] = resource
+        return resource
+
+
+def clear_resources():
+    """Drop every loaded resource, so the next use loads it again."""
+    with _resources_lock:
+        _resources.clear()
+        _key_locks.clear()
+
+
+def _load_spacy_model(model_name: str, exclude: Sequence[str] = ()):
+    import spacy
+    try:
+        return spacy.load(model_name, exclude=list(exclude))
+    except OSError:
+        # Download the model if not present
+        from spacy.cli import download
+        download(model_name)
+        return spacy.load(model_name, exclude=list(exclude))
+
+
+def get_spacy_model(model_name: str = DEFAULT_SPACY_MODEL, exclude: Sequence[str] = ()):
+    """Return the shared spaCy pipeline, downloading the model the first time if needed.
+
+    Args:
+        model_name (str): The spaCy model package name.
+        exclude (Sequence[str]): Pipeline components not to load; each distinct set is
+            a separate shared pipeline.
+    """
+    exclude = tuple(sorted(exclude))
+    return get_resource(('spacy', model_name, exclude), lambda: _load_spacy_model(model_name, exclude))
+
+
+def _ensure_nltk_resource(resource: str) -> bool:
+    import nltk
+    try:
+        nltk.data.find(NLTK_RESOURCE_PATHS.get(resource, resource))
+    except LookupError:
+        logger.info(f"Downloading NLTK resource {resource}")
+        nltk.download(resource, quiet=True)
+    return True
+
+
+def ensure_nltk_data(*resources: str):
+    """Make sure the NLTK resources are installed, downloading only the missing ones.
+
+    The check runs once per resource and process; later calls return immediately.
+
+    Args:
+        *resources (str): NLTK resource ids such as ``'punkt'`` or ``'wordnet'``.
+    """
+    for resource in resources:
+        get_resource(('nltk', resource), lambda resource=resource: _ensure_nltk_resource(resource))
+
+
+def get_sentence_transformer(model_name: str):
+    """Return the shared SentenceTransformer for a model name."""
+    def load():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    return get_resource(('sentence_transformer', model_name), load)
+
+
+def get_hf_pipeline(task: str, model_name: str):
+    """Return the shared transformers pipeline for a task and model."""
+    def load():
+        from transformers import pipeline
+        return pipeline(task, model=model_name)
+    return get_resource(('hf_pipeline', task, model_name), load)
+
+
+def get_openai_client():
+    """Return the shared OpenAI client, created with the configured API key."""
+    def load():
+        from openai import OpenAI
+        from utils.config_manager import config
+        return OpenAI(api_key=config.OPENAI_API_KEY)
+    return get_resource(('openai',), load)
+
+
+def create_async_openai_client():
+    """Create an AsyncOpenAI client with the configured API key.
+
+    Not shared: an async client's connections belong to the event loop it first ran
+    on, so each ``asyncio.run`` needs its own. Close it with ``async with``.
+    """
+    from openai import AsyncOpenAI
+    from utils.config_manager import config
+    return AsyncOpenAI(api_key=config.OPENAI_API_KEY)
+
+
+def loaded_resources() -> Iterable[Hashable]:
+    """Return the keys of the resources loaded so far."""
+    with _resources_lock:
+        return list(_resources)